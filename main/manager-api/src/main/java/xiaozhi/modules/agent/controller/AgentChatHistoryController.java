@@ -1,19 +1,28 @@
 package xiaozhi.modules.agent.controller;
 
+import java.io.IOException;
+import java.util.List;
+
+import org.springframework.http.MediaType;
 import org.springframework.web.bind.annotation.PostMapping;
 import org.springframework.web.bind.annotation.RequestBody;
 import org.springframework.web.bind.annotation.RequestMapping;
+import org.springframework.web.bind.annotation.RequestPart;
 import org.springframework.web.bind.annotation.RestController;
+import org.springframework.web.multipart.MultipartFile;
+import org.springframework.web.multipart.MultipartHttpServletRequest;
 
 import io.swagger.v3.oas.annotations.Operation;
 import io.swagger.v3.oas.annotations.tags.Tag;
 import jakarta.validation.Valid;
 import lombok.RequiredArgsConstructor;
+import lombok.extern.slf4j.Slf4j;
 import xiaozhi.common.utils.Result;
 import xiaozhi.modules.agent.dto.AgentChatHistoryReportDTO;
 import xiaozhi.modules.agent.service.biz.AgentChatHistoryBizService;
 
 @Tag(name = "智能体聊天历史管理")
+@Slf4j
 @RequiredArgsConstructor
 @RestController
 @RequestMapping("/agent/chat-history")
@@ -33,4 +42,57 @@ public class AgentChatHistoryController {
         Boolean result = agentChatHistoryBizService.report(request);
         return new Result<Boolean>().ok(result);
     }
+
+    /**
+     * 小智服务聊天批量上报请求
+     * <p>
+     * 小智服务把多条聊天记录合并成一次请求上报，每条记录单独保存，某条失败不影响其他记录。
+     *
+     * @param requests 聊天上报请求列表
+     * @return 保存成功的条数
+     */
+    @Operation(summary = "小智服务聊天批量上报请求")
+    @PostMapping(value = "/report/batch", consumes = MediaType.APPLICATION_JSON_VALUE)
+    public Result<Integer> uploadBatch(@RequestBody List<AgentChatHistoryReportDTO> requests) {
+        return new Result<Integer>().ok(reportAll(requests));
+    }
+
+    /**
+     * 小智服务聊天批量上报请求（multipart）
+     * <p>
+     * 聊天记录列表放在reports字段，音频以二进制文件字段上传，由记录的audioPart指定字段名，不需要base64编码。
+     *
+     * @param requests 聊天上报请求列表
+     * @param multipartRequest 包含音频文件的请求
+     * @return 保存成功的条数
+     */
+    @Operation(summary = "小智服务聊天批量上报请求（multipart）")
+    @PostMapping(value = "/report/batch", consumes = MediaType.MULTIPART_FORM_DATA_VALUE)
+    public Result<Integer> uploadBatchMultipart(@RequestPart("reports") List<AgentChatHistoryReportDTO> requests,
+            MultipartHttpServletRequest multipartRequest) throws IOException {
+        for (AgentChatHistoryReportDTO request : requests) {
+            if (request.getAudioPart() == null) {
+                continue;
+            }
+            MultipartFile file = multipartRequest.getFile(request.getAudioPart());
+            if (file != null && !file.isEmpty()) {
+                request.setAudioData(file.getBytes());
+            }
+        }
+        return new Result<Integer>().ok(reportAll(requests));
+    }
+
+    private int reportAll(List<AgentChatHistoryReportDTO> requests) {
+        int success = 0;
+        for (AgentChatHistoryReportDTO request : requests) {
+            try {
+                if (Boolean.TRUE.equals(agentChatHistoryBizService.report(request))) {
+                    success++;
+                }
+            } catch (Exception e) {
+                log.error("聊天记录上报失败: macAddress={}", request.getMacAddress(), e);
+            }
+        }
+        return success;
+    }
 }
@@ -269,9 +269,13 @@ public class AgentController {
             return ResponseEntity.notFound().build();
         }
         redisUtils.delete(RedisKeys.getAgentAudioIdKey(uuid));
+        // 小智服务可以上报WAV或Ogg/Opus音频，按文件头区分
+        boolean isOgg = audioData.length >= 4 && audioData[0] == 'O' && audioData[1] == 'g'
+                && audioData[2] == 'g' && audioData[3] == 'S';
         return ResponseEntity.ok()
-                .contentType(MediaType.APPLICATION_OCTET_STREAM)
-                .header(HttpHeaders.CONTENT_DISPOSITION, "attachment; filename=\"play.wav\"")
+                .contentType(isOgg ? MediaType.parseMediaType("audio/ogg") : MediaType.APPLICATION_OCTET_STREAM)
+                .header(HttpHeaders.CONTENT_DISPOSITION,
+                        "attachment; filename=\"" + (isOgg ? "play.ogg" : "play.wav") + "\"")
                 .body(audioData);
     }
 
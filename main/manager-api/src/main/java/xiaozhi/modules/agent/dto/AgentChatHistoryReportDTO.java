@@ -1,5 +1,7 @@
 package xiaozhi.modules.agent.dto;
 
+import com.fasterxml.jackson.annotation.JsonIgnore;
+
 import io.swagger.v3.oas.annotations.media.Schema;
 import jakarta.validation.constraints.NotBlank;
 import jakarta.validation.constraints.NotNull;
@@ -28,4 +30,9 @@ public class AgentChatHistoryReportDTO {
     private String content;
     @Schema(description = "base64编码的opus音频数据", example = "")
     private String audioBase64;
+    @Schema(description = "multipart上报时音频所在的文件字段名", example = "audio0")
+    private String audioPart;
+    @Schema(hidden = true)
+    @JsonIgnore
+    private byte[] audioData;
 }
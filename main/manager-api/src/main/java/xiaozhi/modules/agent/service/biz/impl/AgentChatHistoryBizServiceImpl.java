@@ -47,11 +47,19 @@ public class AgentChatHistoryBizServiceImpl implements AgentChatHistoryBizServic
         Byte chatType = report.getChatType();
         log.info("小智设备聊天上报请求: macAddress={}, type={}", macAddress, chatType);
 
-        // 1. base64解码report.getOpusDataBase64(),存入ai_agent_chat_audio表
+        // 1. 音频存入ai_agent_chat_audio表，multipart上报时已是二进制，否则base64解码report.getAudioBase64()
         String audioId = null;
-        if (report.getAudioBase64() != null && !report.getAudioBase64().isEmpty()) {
+        byte[] audioData = report.getAudioData();
+        if (audioData == null && report.getAudioBase64() != null && !report.getAudioBase64().isEmpty()) {
+            try {
+                audioData = Base64.getDecoder().decode(report.getAudioBase64());
+            } catch (Exception e) {
+                log.error("音频数据解码失败", e);
+                return false;
+            }
+        }
+        if (audioData != null && audioData.length > 0) {
             try {
-                byte[] audioData = Base64.getDecoder().decode(report.getAudioBase64());
                 audioId = agentChatAudioService.saveAudio(audioData);
                 log.info("音频数据保存成功，audioId={}", audioId);
             } catch (Exception e) {
@@ -7,6 +7,12 @@ from core.ota_server import SimpleOtaServer
 from core.utils.util import check_ffmpeg_installed
 from config.logger import setup_logging
 from core.utils.util import get_local_ip
+from core.utils.http_pool import close_all as close_http_pool
+from core.utils.report_uploader import close_chat_history_uploader
+from core.utils.memory_summarizer import close_memory_summarizer
+from config.private_config import close_private_config_client
+from core.utils.metrics import metrics_path, metrics_port, start_metrics_server
+from core.utils.tracing import close_tracer
 from aioconsole import ainput
 
 TAG = __name__
@@ -65,6 +71,17 @@ async def main():
             config["server"]["ota_port"],
         )
 
+    # 配置了单独的指标端口时启动指标服务
+    metrics_task = None
+    if metrics_port(config):
+        metrics_task = asyncio.create_task(start_metrics_server(config))
+        logger.bind(tag=TAG).info(
+            "指标接口是\t\thttp://{}:{}{}",
+            get_local_ip(),
+            metrics_port(config),
+            metrics_path(config),
+        )
+
     # 获取WebSocket配置，使用安全的默认值
     websocket_port = 8000
     server_config = config.get("server", {})
@@ -97,13 +114,21 @@ async def main():
         ws_task.cancel()
         if ota_task:
             ota_task.cancel()
+        if metrics_task:
+            metrics_task.cancel()
 
         # 等待任务终止（必须加超时）
         await asyncio.wait(
-            [stdin_task, ws_task, ota_task] if ota_task else [stdin_task, ws_task],
+            [t for t in (stdin_task, ws_task, ota_task, metrics_task) if t],
             timeout=3.0,
             return_when=asyncio.ALL_COMPLETED
         )
+        # 记忆总结还要调用LLM，先于关闭HTTP连接池
+        close_memory_summarizer()
+        close_http_pool()
+        close_chat_history_uploader()
+        await close_private_config_client()
+        close_tracer()
         print("服务器已关闭，程序退出。")
 
 
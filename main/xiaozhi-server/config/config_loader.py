@@ -55,10 +55,14 @@ def get_config_from_api(config):
         raise Exception("Failed to fetch server config from API")
 
     config_data["read_config_from_api"] = True
-    config_data["manager-api"] = {
-        "url": config["manager-api"].get("url", ""),
-        "secret": config["manager-api"].get("secret", ""),
-    }
+    # 保留本地manager-api配置中的超时、重试、缓存等参数
+    config_data["manager-api"] = dict(config["manager-api"])
+    config_data["manager-api"]["url"] = config["manager-api"].get("url", "")
+    config_data["manager-api"]["secret"] = config["manager-api"].get("secret", "")
+    # 指标接口、追踪和聊天记录上报在本地配置
+    for key in ("metrics", "tracing", "chat_history_report"):
+        if config.get(key):
+            config_data[key] = config[key]
     if config.get("server"):
         config_data["server"] = {
             "ip": config["server"].get("ip", ""),
@@ -1,5 +1,8 @@
 import os
 import sys
+import time
+import random
+import threading
 from loguru import logger
 from config.config_loader import load_config
 from config.settings import check_config_file
@@ -32,13 +35,79 @@ def build_module_string(selected_module):
     )
 
 
+class DebugLimiter:
+    """按标签限制DEBUG及以下级别的日志
+
+    逐帧、逐token的调试日志每个标签每秒最多输出rate条，超出的丢弃，下一条输出时附上丢弃的条数；
+    sample小于1时先按比例采样。在调用日志的线程中执行，丢弃的日志不会被格式化。
+    """
+
+    def __init__(self, log_config):
+        self.rate = int(log_config.get("debug_rate_limit", 50))
+        self.sample = float(log_config.get("debug_sample_rate", 1.0))
+        # 按标签单独设置，例如 {"core.handle.receiveAudioHandle": {"rate": 5, "sample": 0.1}}
+        self.tag_limits = log_config.get("debug_tag_limits") or {}
+        self.lock = threading.Lock()
+        # 标签 -> [当前秒, 当前秒已输出条数, 已丢弃条数]
+        self.windows = {}
+
+    def allow(self, tag):
+        limits = self.tag_limits.get(tag) or {}
+        rate = int(limits.get("rate", self.rate))
+        sample = float(limits.get("sample", self.sample))
+        with self.lock:
+            window = self.windows.setdefault(tag, [0, 0, 0])
+            if sample < 1.0 and random.random() >= sample:
+                window[2] += 1
+                return False, 0
+            second = int(time.monotonic())
+            if window[0] != second:
+                window[0], window[1] = second, 0
+            if rate > 0 and window[1] >= rate:
+                window[2] += 1
+                return False, 0
+            window[1] += 1
+            dropped, window[2] = window[2], 0
+            return True, dropped
+
+
+_limiter = None
+
+
 def formatter(record):
-    """为没有 tag 的日志添加默认值"""
-    record["extra"].setdefault("tag", record["name"])
-    return record["message"]
+    """为没有 tag 的日志添加默认值，并限制DEBUG日志的条数"""
+    extra = record["extra"]
+    extra.setdefault("tag", record["name"])
+    # 每个输出都会调用一次，只在第一次时做出决定
+    keep = extra.get("_keep")
+    if keep is None:
+        keep = True
+        if _limiter is not None and record["level"].no < 20:
+            keep, dropped = _limiter.allow(extra["tag"])
+            if dropped:
+                record["message"] += f"（已省略 {dropped} 条同类日志）"
+        extra["_keep"] = keep
+    return keep
+
+
+_configured = False
+_setup_lock = threading.Lock()
 
 
 def setup_logging():
+    """返回配置好的日志对象，日志输出只在第一次调用时配置"""
+    global _configured
+    if _configured:
+        return logger
+    with _setup_lock:
+        if not _configured:
+            _configure()
+            _configured = True
+    return logger
+
+
+def _configure():
+    global _limiter
     check_config_file()
     """从配置文件中读取日志配置，并设置日志输出格式和级别"""
     config = load_config()
@@ -49,7 +118,7 @@ def setup_logging():
     )
     log_format_file = log_config.get(
         "log_format_file",
-        "{time:YYYY-MM-DD HH:mm:ss} - {version_{selected_module}} - {name} - {level} - {extra[tag]} - {message}",
+        "{time:YYYY-MM-DD HH:mm:ss} - {version}_{selected_module} - {name} - {level} - {extra[tag]} - {message}",
     )
     selected_module_str = build_module_string(config.get("selected_module", {}))
 
@@ -63,14 +132,21 @@ def setup_logging():
     log_file = log_config.get("log_file", "server.log")
     data_dir = log_config.get("data_dir", "data")
 
+    # 日志在后台线程写出，不阻塞调用日志的线程
+    enqueue = bool(log_config.get("enqueue", True))
+
     os.makedirs(log_dir, exist_ok=True)
     os.makedirs(data_dir, exist_ok=True)
 
+    _limiter = DebugLimiter(log_config)
+
     # 配置日志输出
     logger.remove()
 
     # 输出到控制台
-    logger.add(sys.stdout, format=log_format, level=log_level, filter=formatter)
+    logger.add(
+        sys.stdout, format=log_format, level=log_level, filter=formatter, enqueue=enqueue
+    )
 
     # 输出到文件
     logger.add(
@@ -78,6 +154,5 @@ def setup_logging():
         format=log_format_file,
         level=log_level,
         filter=formatter,
+        enqueue=enqueue,
     )
-
-    return logger
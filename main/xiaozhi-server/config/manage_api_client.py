@@ -18,6 +18,33 @@ class DeviceBindException(Exception):
         super().__init__(f"设备绑定异常，绑定码: {bind_code}")
 
 
+def parse_result(result: Dict) -> Optional[Dict]:
+    """处理API返回的业务错误，返回成功数据"""
+    if result.get("code") == 10041:
+        raise DeviceNotFoundException(result.get("msg"))
+    elif result.get("code") == 10042:
+        raise DeviceBindException(result.get("msg"))
+    elif result.get("code") != 0:
+        raise Exception(f"API返回错误: {result.get('msg', '未知错误')}")
+    return result.get("data")
+
+
+def should_retry(exception: Exception) -> bool:
+    """判断异常是否应该重试"""
+    # 网络连接相关错误
+    if isinstance(
+        exception, (httpx.ConnectError, httpx.TimeoutException, httpx.NetworkError)
+    ):
+        return True
+
+    # HTTP状态码错误
+    if isinstance(exception, httpx.HTTPStatusError):
+        status_code = exception.response.status_code
+        return status_code in [408, 429, 500, 502, 503, 504]
+
+    return False
+
+
 class ManageApiClient:
     _instance = None
     _client = None
@@ -66,34 +93,12 @@ class ManageApiClient:
         response = cls._client.request(method, endpoint, **kwargs)
         response.raise_for_status()
 
-        result = response.json()
-
-        # 处理API返回的业务错误
-        if result.get("code") == 10041:
-            raise DeviceNotFoundException(result.get("msg"))
-        elif result.get("code") == 10042:
-            raise DeviceBindException(result.get("msg"))
-        elif result.get("code") != 0:
-            raise Exception(f"API返回错误: {result.get('msg', '未知错误')}")
-
-        # 返回成功数据
-        return result.get("data") if result.get("code") == 0 else None
+        return parse_result(response.json())
 
     @classmethod
     def _should_retry(cls, exception: Exception) -> bool:
         """判断异常是否应该重试"""
-        # 网络连接相关错误
-        if isinstance(
-            exception, (httpx.ConnectError, httpx.TimeoutException, httpx.NetworkError)
-        ):
-            return True
-
-        # HTTP状态码错误
-        if isinstance(exception, httpx.HTTPStatusError):
-            status_code = exception.response.status_code
-            return status_code in [408, 429, 500, 502, 503, 504]
-
-        return False
+        return should_retry(exception)
 
     @classmethod
     def _execute_request(cls, method: str, endpoint: str, **kwargs) -> Dict:
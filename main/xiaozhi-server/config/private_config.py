@@ -0,0 +1,222 @@
+"""
+设备差异化配置的异步获取
+
+连接建立时从manager-api获取设备的差异化配置，不阻塞事件循环：
+- 按设备缓存配置，cache_ttl内直接使用；过期但未超过stale_ttl时先返回旧配置，后台刷新
+- 同一设备同时建立的多个连接只发起一次请求
+- manager-api连续失败breaker_failures次后熔断breaker_cooldown秒，期间不再请求，
+  有旧配置时使用旧配置，没有时立即失败，之后放行一次请求试探是否恢复
+"""
+
+import os
+import time
+import copy
+import asyncio
+from collections import OrderedDict
+import httpx
+from config.logger import setup_logging
+from core.utils.metrics import record_cache
+from config.manage_api_client import (
+    DeviceBindException,
+    DeviceNotFoundException,
+    parse_result,
+    should_retry,
+)
+
+TAG = __name__
+logger = setup_logging()
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failures, cooldown):
+        self.max_failures = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def allow(self):
+        """熔断期间拒绝请求；冷却结束后只放行一次试探请求"""
+        if self.opened_at is None:
+            return True
+        if self.probing or time.monotonic() - self.opened_at < self.cooldown:
+            return False
+        self.probing = True
+        return True
+
+    def success(self):
+        if self.opened_at is not None:
+            logger.bind(tag=TAG).info("manager-api已恢复，解除熔断")
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.failures >= self.max_failures:
+            if self.opened_at is None:
+                logger.bind(tag=TAG).error(
+                    f"manager-api连续失败 {self.failures} 次，熔断 {self.cooldown} 秒"
+                )
+            self.opened_at = time.monotonic()
+
+
+class CachedConfig:
+    __slots__ = ("data", "fetched_at")
+
+    def __init__(self, data):
+        self.data = data
+        self.fetched_at = time.monotonic()
+
+
+class PrivateConfigClient:
+    def __init__(self, config):
+        api_config = config.get("manager-api") or {}
+        cache_config = api_config.get("private_config") or {}
+        self.base_url = api_config.get("url", "")
+        self.secret = api_config.get("secret", "")
+        self.timeout = float(cache_config.get("timeout", 10))
+        self.cache_ttl = float(cache_config.get("cache_ttl", 60))
+        self.stale_ttl = float(cache_config.get("stale_ttl", 3600))
+        self.max_devices = int(cache_config.get("max_devices", 10000))
+        self.max_retries = int(cache_config.get("max_retries", 1))
+        self.retry_delay = float(cache_config.get("retry_delay", 1))
+        self.breaker = CircuitBreaker(
+            int(cache_config.get("breaker_failures", 5)),
+            float(cache_config.get("breaker_cooldown", 30)),
+        )
+        self.cache = OrderedDict()
+        # 进行中的请求，同一设备的并发连接共用
+        self.inflight = {}
+        self.client = None
+
+    def _client(self):
+        # 在事件循环中第一次使用时创建，绑定服务所在的事件循环
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "User-Agent": f"PythonClient/2.0 (PID:{os.getpid()})",
+                    "Accept": "application/json",
+                    "Authorization": "Bearer " + self.secret,
+                },
+                timeout=self.timeout,
+            )
+        return self.client
+
+    async def _request(self, device_id, client_id, selected_module):
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("manager-api熔断中")
+            try:
+                response = await self._client().post(
+                    "config/agent-models",
+                    json={
+                        "macAddress": device_id,
+                        "clientId": client_id,
+                        "selectedModule": selected_module,
+                    },
+                )
+                response.raise_for_status()
+                data = parse_result(response.json())
+                self.breaker.success()
+                return data
+            except (DeviceNotFoundException, DeviceBindException):
+                # 设备未绑定说明manager-api是正常的
+                self.breaker.success()
+                raise
+            except Exception as e:
+                if not should_retry(e):
+                    self.breaker.success()
+                    raise
+                self.breaker.failure()
+                if attempt >= self.max_retries:
+                    raise
+                logger.bind(tag=TAG).warning(
+                    f"获取差异化配置失败，{self.retry_delay} 秒后重试: {e}"
+                )
+                await asyncio.sleep(self.retry_delay)
+
+    async def _fetch(self, key, selected_module):
+        try:
+            data = await self._request(key[0], key[1], selected_module)
+        except (DeviceNotFoundException, DeviceBindException):
+            # 绑定状态随时可能变化，不缓存，并丢弃旧配置
+            self.cache.pop(key, None)
+            raise
+        self.cache[key] = CachedConfig(data)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.max_devices:
+            self.cache.popitem(last=False)
+        return data
+
+    def _singleflight(self, key, selected_module):
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(key, selected_module))
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    def _done(self, key, task):
+        self.inflight.pop(key, None)
+        # 所有等待的连接都已断开时，避免“异常未被获取”的告警
+        if not task.cancelled():
+            task.exception()
+
+    async def _revalidate(self, key, selected_module):
+        try:
+            await self._singleflight(key, selected_module)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"后台刷新差异化配置失败: {e}")
+
+    async def get(self, device_id, client_id, selected_module):
+        """获取设备的差异化配置，返回的是副本，调用方可以修改"""
+        key = (device_id, client_id)
+        cached = self.cache.get(key)
+        age = time.monotonic() - cached.fetched_at if cached else None
+        if cached is not None and age < self.cache_ttl:
+            record_cache("private_config", True)
+            return copy.deepcopy(cached.data)
+        record_cache("private_config", cached is not None and age < self.stale_ttl)
+        if cached is not None and age < self.stale_ttl:
+            if key not in self.inflight:
+                asyncio.ensure_future(self._revalidate(key, selected_module))
+            return copy.deepcopy(cached.data)
+        try:
+            # shield保证某个连接断开时不会取消其他连接共用的请求
+            data = await asyncio.shield(self._singleflight(key, selected_module))
+        except (DeviceNotFoundException, DeviceBindException):
+            raise
+        except Exception as e:
+            if cached is None:
+                raise
+            logger.bind(tag=TAG).warning(f"获取差异化配置失败，使用 {age:.0f} 秒前的配置: {e}")
+            data = cached.data
+        return copy.deepcopy(data)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+_client = None
+
+
+def get_private_config_client(config):
+    """获取所有连接共用的差异化配置客户端"""
+    global _client
+    if _client is None:
+        _client = PrivateConfigClient(config)
+    return _client
+
+
+async def close_private_config_client():
+    if _client is not None:
+        await _client.close()
@@ -0,0 +1,33 @@
+"""
+连接的配置
+
+服务配置在所有连接间共用，视为只读。每个连接持有一层轻量的覆盖：
+- 创建时只复制最外层的键（几十个引用），不复制各模块的配置
+- 替换最外层的键直接赋值；修改嵌套的值通过override()，只复制路径上的字典
+不能直接修改从配置中取出的字典，否则会影响所有连接。
+"""
+
+
+class SessionConfig(dict):
+    def __init__(self, base):
+        super().__init__(base)
+        self.base = base
+        # 已经复制过、可以直接修改的嵌套路径
+        self.owned = set()
+
+    def override(self, path, value):
+        """修改嵌套的值，例如 override(("selected_module", "TTS"), "EdgeTTS")"""
+        target = self
+        for depth, key in enumerate(path[:-1]):
+            owned_path = tuple(path[: depth + 1])
+            child = target.get(key)
+            if owned_path not in self.owned:
+                child = dict(child or {})
+                target[key] = child
+                self.owned.add(owned_path)
+            target = child
+        target[path[-1]] = value
+
+    def overridden(self):
+        """与服务配置不同的最外层键"""
+        return [k for k, v in self.items() if self.base.get(k) is not v]
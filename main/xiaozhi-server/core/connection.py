@@ -1,5 +1,4 @@
 import os
-import copy
 import json
 import subprocess
 import sys
@@ -16,6 +15,14 @@ from typing import Dict, Any
 from plugins_func.loadplugins import auto_import_modules
 from config.logger import setup_logging
 from core.utils.dialogue import Message, Dialogue
+from core.utils.context_window import ContextWindow
+from core.utils.model_router import ModelRouter
+from core.utils.semantic_cache import get_semantic_cache
+from core.utils.speculative import prefetch
+from core.utils.memory_summarizer import get_memory_summarizer
+from core.utils.provider_pool import get_provider_pool, provider_key
+from core.utils.metrics import observe_first, observe_stage, record_provider
+from core.utils.tracing import finish_turn, trace_span, trace_stream
 from core.handle.textHandle import handleTextMessage
 from core.utils.util import (
     get_string_no_punctuation_or_emoji,
@@ -31,10 +38,11 @@ from core.handle.functionHandler import FunctionHandler
 from plugins_func.register import Action, ActionResponse
 from core.auth import AuthMiddleware, AuthenticationError
 from core.mcp.manager import MCPManager
-from config.config_loader import get_private_config_from_api
+from config.private_config import get_private_config_client
+from config.session_config import SessionConfig
 from config.manage_api_client import DeviceNotFoundException, DeviceBindException
 from core.utils.output_counter import add_device_output
-from core.handle.ttsReportHandle import enqueue_tts_report, report_tts
+from core.handle.ttsReportHandle import enqueue_tts_report
 
 TAG = __name__
 
@@ -58,7 +66,7 @@ class ConnectionHandler:
         server=None,
     ):
         self.common_config = config
-        self.config = copy.deepcopy(config)
+        self.config = SessionConfig(config)
         self.session_id = str(uuid.uuid4())
         self.logger = setup_logging()
         self.server = server  # 保存server实例的引用
@@ -88,10 +96,6 @@ class ConnectionHandler:
         self.audio_play_queue = queue.Queue()
         self.executor = ThreadPoolExecutor(max_workers=10)
 
-        # 上报线程
-        self.tts_report_queue = queue.Queue()
-        self.tts_report_thread = None
-
         # 用于暂存从LLM回复前缀提取的motion/expression JSON字符串
         self.pending_expandmotion = None
 
@@ -104,6 +108,8 @@ class ConnectionHandler:
         self.tts = _tts
         self.memory = _memory
         self.intent = _intent
+        # 从模块实例池借用的实例，连接关闭时归还
+        self.provider_lease = get_provider_pool(config).lease()
 
         # vad相关变量
         self.client_audio_buffer = bytearray()
@@ -111,6 +117,8 @@ class ConnectionHandler:
         self.client_have_voice_last_time = 0.0
         self.client_no_voice_last_time = 0.0
         self.client_voice_stop = False
+        # VAD实例可能由多个连接共用，opus解码器有状态，每个连接单独一个，由VAD模块创建
+        self.vad_decoder = None
 
         # asr相关变量
         self.asr_audio = []
@@ -123,10 +131,20 @@ class ConnectionHandler:
         # tts相关变量
         self.tts_first_text_index = -1
         self.tts_last_text_index = -1
+        # 本轮开始的时间，发出第一帧音频后清空
+        self.turn_started_at = None
+        # 本轮的追踪，未采样时为None
+        self.trace = None
 
         # iot相关变量
         self.iot_descriptors = {}
         self.func_handler = None
+        # 按问题复杂度在大小模型之间选择，未开启时为None
+        self.model_router = None
+        # 跨设备共用的语义回复缓存，未开启时为None
+        self.semantic_cache = None
+        # 本轮等待写入语义缓存的回答
+        self.cache_pending = None
 
         self.cmd_exit = self.config["exit_commands"]
         self.max_cmd_length = 0
@@ -138,6 +156,13 @@ class ConnectionHandler:
         self.close_after_chat = False
         self.load_function_plugin = False
         self.intent_type = "nointent"
+        # 乐观聊天：意图识别与聊天回复同时开始，chat_gate控制本轮聊天输出是否放行
+        self.optimistic_chat = False
+        self.optimistic_chat_timeout = 30
+        self.chat_gate = None
+        # 本轮提前开始的记忆查询 (问题, future, 开始时间)，以及记忆查询耗时
+        self.memory_query = None
+        self.memory_timing = None
 
         self.timeout_task = None
         self.timeout_seconds = (
@@ -172,8 +197,9 @@ class ConnectionHandler:
             # 获取客户端ip地址
             self.client_ip = ws.remote_address[0]
             self.logger.bind(tag=TAG).info(
-                f"{self.client_ip} conn - Headers: {self.headers}"
+                "{} conn - device-id: {}", self.client_ip, self.headers.get("device-id")
             )
+            self.logger.bind(tag=TAG).debug("Headers: {}", self.headers)
 
             # 进行认证
             await self.auth.authenticate(self.headers)
@@ -185,12 +211,12 @@ class ConnectionHandler:
             # 启动超时检查任务
             self.timeout_task = asyncio.create_task(self._check_timeout())
 
-            self.welcome_msg = self.config["xiaozhi"]
+            self.welcome_msg = dict(self.config["xiaozhi"])
             self.welcome_msg["session_id"] = self.session_id
             await self.websocket.send(json.dumps(self.welcome_msg))
 
             # 获取差异化配置
-            self._initialize_private_config()
+            await self._initialize_private_config()
             # 异步初始化
             self.executor.submit(self._initialize_components)
             # tts 消化线程
@@ -225,7 +251,14 @@ class ConnectionHandler:
         """保存记忆并关闭连接"""
         try:
             if self.memory:
-                await self.memory.save_memory(self.dialogue.dialogue)
+                summarizer = get_memory_summarizer(self.config)
+                if summarizer is not None:
+                    # 放入后台总结队列，不等待LLM总结完成就关闭连接
+                    summarizer.submit(
+                        self.memory, self.device_id, self.llm, self.dialogue.dialogue
+                    )
+                else:
+                    await self.memory.save_memory(self.dialogue.dialogue)
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"保存记忆失败: {e}")
         finally:
@@ -294,6 +327,9 @@ class ConnectionHandler:
                 f"初始化组件: prompt成功 {self.prompt[:50]}..."
             )
 
+        """本地模型保持系统提示词前缀不变，以复用KV缓存"""
+        self.dialogue.stable_prefix = bool(getattr(self.llm, "stable_prefix", False))
+
         """初始化本地组件"""
         if self.vad is None:
             self.vad = self._vad
@@ -301,33 +337,26 @@ class ConnectionHandler:
             self.asr = self._asr
         """加载记忆"""
         self._initialize_memory()
+        """初始化上下文窗口"""
+        self._initialize_context_window()
+        """初始化模型路由"""
+        self._initialize_model_router()
+        """语义回复缓存"""
+        self.semantic_cache = get_semantic_cache(self.config)
         """加载意图识别"""
         self._initialize_intent()
-        """初始化上报线程"""
-        self._init_report_threads()
 
-    def _init_report_threads(self):
-        """初始化ASR和TTS上报线程"""
-        if not self.read_config_from_api or self.need_bind:
-            return
-        if self.tts_report_thread is None or not self.tts_report_thread.is_alive():
-            self.tts_report_thread = threading.Thread(
-                target=self._tts_report_worker, daemon=True
-            )
-            self.tts_report_thread.start()
-            self.logger.bind(tag=TAG).info("TTS上报线程已启动")
-
-    def _initialize_private_config(self):
+    async def _initialize_private_config(self):
         """如果是从配置文件获取，则进行二次实例化"""
         if not self.read_config_from_api:
             return
         """从接口获取差异化的配置进行二次实例化，非全量重新实例化"""
         try:
             begin_time = time.time()
-            private_config = get_private_config_from_api(
-                self.config,
+            private_config = await get_private_config_client(self.config).get(
                 self.headers.get("device-id"),
                 self.headers.get("client-id", self.headers.get("device-id")),
+                self.config["selected_module"],
             )
             private_config["delete_audio"] = bool(self.config.get("delete_audio", True))
             self.logger.bind(tag=TAG).info(
@@ -358,27 +387,27 @@ class ConnectionHandler:
         if private_config.get("TTS", None) is not None:
             init_tts = True
             self.config["TTS"] = private_config["TTS"]
-            self.config["selected_module"]["TTS"] = private_config["selected_module"][
-                "TTS"
-            ]
+            self.config.override(
+                ("selected_module", "TTS"), private_config["selected_module"]["TTS"]
+            )
         if private_config.get("LLM", None) is not None:
             init_llm = True
             self.config["LLM"] = private_config["LLM"]
-            self.config["selected_module"]["LLM"] = private_config["selected_module"][
-                "LLM"
-            ]
+            self.config.override(
+                ("selected_module", "LLM"), private_config["selected_module"]["LLM"]
+            )
         if private_config.get("Memory", None) is not None:
             init_memory = True
             self.config["Memory"] = private_config["Memory"]
-            self.config["selected_module"]["Memory"] = private_config[
-                "selected_module"
-            ]["Memory"]
+            self.config.override(
+                ("selected_module", "Memory"), private_config["selected_module"]["Memory"]
+            )
         if private_config.get("Intent", None) is not None:
             init_intent = True
             self.config["Intent"] = private_config["Intent"]
-            self.config["selected_module"]["Intent"] = private_config[
-                "selected_module"
-            ]["Intent"]
+            self.config.override(
+                ("selected_module", "Intent"), private_config["selected_module"]["Intent"]
+            )
         if private_config.get("prompt", None) is not None:
             self.config["prompt"] = private_config["prompt"]
         if private_config.get("device_max_output_size", None) is not None:
@@ -394,6 +423,7 @@ class ConnectionHandler:
                 init_tts,
                 init_memory,
                 init_intent,
+                lease=self.provider_lease,
             )
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"初始化组件失败: {e}")
@@ -415,12 +445,65 @@ class ConnectionHandler:
         """初始化记忆模块"""
         self.memory.init_memory(self.device_id, self.llm)
 
+    def _initialize_context_window(self):
+        """初始化上下文窗口，控制每轮发送给LLM的token数"""
+        window_config = self.config.get("context_window") or {}
+        if not window_config.get("enabled", False):
+            return
+        self.dialogue.context_window = ContextWindow(
+            window_config, self.llm, self.executor.submit
+        )
+
+    def _initialize_model_router(self):
+        """初始化模型路由，简单闲聊使用小模型"""
+        routing_config = self.config.get("model_routing") or {}
+        if not routing_config.get("enabled", False):
+            return
+        small_llm_name = routing_config.get("small_llm")
+        if not small_llm_name or small_llm_name not in self.config["LLM"]:
+            self.logger.bind(tag=TAG).warning(
+                f"模型路由的小模型不存在: {small_llm_name}，不启用模型路由"
+            )
+            return
+        from core.utils import llm as llm_utils
+
+        small_llm_config = self.config["LLM"][small_llm_name]
+        small_llm_type = small_llm_config.get("type", small_llm_name)
+        small_llm = self.provider_lease.acquire(
+            provider_key("LLM", small_llm_type, small_llm_config),
+            lambda: llm_utils.create_instance(small_llm_type, small_llm_config),
+        )
+        self.model_router = ModelRouter(
+            routing_config,
+            self.llm,
+            small_llm,
+            self.config["selected_module"]["LLM"],
+            small_llm_name,
+        )
+        self.logger.bind(tag=TAG).info(f"启用模型路由，小模型: {small_llm_name}")
+
+    def _select_llm(self, query, tool_call=False):
+        """返回本轮使用的 (路由名称, LLM实例)，未开启模型路由时路由名称为None"""
+        if self.model_router is None:
+            return None, self.llm
+        return self.model_router.select(query, tool_call)
+
     def _initialize_intent(self):
         self.intent_type = self.config["Intent"][
             self.config["selected_module"]["Intent"]
         ]["type"]
         if self.intent_type == "function_call" or self.intent_type == "intent_llm":
             self.load_function_plugin = True
+        self.optimistic_chat = bool(
+            self.config["Intent"][self.config["selected_module"]["Intent"]].get(
+                "optimistic_chat", False
+            )
+        )
+        self.optimistic_chat_timeout = float(
+            self.config["Intent"][self.config["selected_module"]["Intent"]].get(
+                "optimistic_chat_timeout", 30
+            )
+        )
         """初始化意图识别模块"""
         # 获取意图识别配置
         intent_config = self.config["Intent"]
@@ -443,11 +526,14 @@ class ConnectionHandler:
 
                 intent_llm_config = self.config["LLM"][intent_llm_name]
                 intent_llm_type = intent_llm_config.get("type", intent_llm_name)
-                intent_llm = llm_utils.create_instance(
-                    intent_llm_type, intent_llm_config
+                intent_llm = self.provider_lease.acquire(
+                    provider_key("LLM", intent_llm_type, intent_llm_config),
+                    lambda: llm_utils.create_instance(
+                        intent_llm_type, intent_llm_config
+                    ),
                 )
                 self.logger.bind(tag=TAG).info(
-                    f"为意图识别创建了专用LLM: {intent_llm_name}, 类型: {intent_llm_type}"
+                    f"意图识别使用专用LLM: {intent_llm_name}, 类型: {intent_llm_type}"
                 )
                 self.intent.set_llm(intent_llm)
             else:
@@ -469,29 +555,43 @@ class ConnectionHandler:
         # 更新系统prompt至上下文
         self.dialogue.update_system_message(self.prompt)
 
-    def chat(self, query):
-
-        self.dialogue.put(Message(role="user", content=query))
+    def chat(self, query, gate=None):
+        """gate不为None时为乐观聊天，意图识别确定继续聊天前输出先缓存，被取消时撤回本轮"""
+        turn_start = len(self.dialogue.dialogue)
+        user_message = Message(role="user", content=query)
+        self.dialogue.put(user_message)
 
         response_message = []
         processed_chars = 0  # 跟踪已处理的字符位置
         try:
             # 使用带记忆的对话
-            memory_str = None
-            if self.memory is not None:
-                future = asyncio.run_coroutine_threadsafe(
-                    self.memory.query_memory(query), self.loop
-                )
-                memory_str = future.result()
+            memory_str = self._join_memory_query(query)
 
             self.logger.bind(tag=TAG).debug(f"记忆内容: {memory_str}")
-            llm_responses = self.llm.response(
-                self.session_id, self.dialogue.get_llm_dialogue_with_memory(memory_str)
+            llm_dialogue = self.dialogue.get_llm_dialogue_with_memory(memory_str)
+            route, llm = self._select_llm(query)
+            llm_responses = observe_first(
+                trace_stream(self, "llm", llm.response(self.session_id, llm_dialogue)),
+                "llm_first_token",
+                "llm",
             )
+            if route is not None:
+                llm_responses = self.model_router.track(
+                    route, llm_responses, llm_dialogue
+                )
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
+            if gate is not None:
+                self.dialogue.remove(user_message)
             return None
 
+        if gate is not None:
+            llm_responses = prefetch(llm_responses, gate, llm_dialogue)
+            if not gate.wait(self.optimistic_chat_timeout):
+                # 意图已被函数处理，撤回本轮写入的用户消息
+                self.dialogue.remove(user_message)
+                return None
+
         self.llm_finish_task = False
         text_index = 0
         for content in llm_responses:
@@ -598,15 +698,15 @@ class ConnectionHandler:
                     self.pending_expandmotion = None
 
         self.llm_finish_task = True
+        self._finish_cache_pending()
         self.dialogue.put(Message(role="assistant", content="".join(response_message)))
-        self.logger.bind(tag=TAG).debug(
-            json.dumps(self.dialogue.get_llm_dialogue(), indent=4, ensure_ascii=False)
-        )
+        self._log_turn(turn_start)
         return True
 
     def chat_with_function_calling(self, query, tool_call=False):
         self.logger.bind(tag=TAG).debug(f"Chat with function calling start: {query}")
         """Chat with function calling for intent detection using streaming"""
+        turn_start = len(self.dialogue.dialogue)
 
         if not tool_call:
             self.dialogue.put(Message(role="user", content=query))
@@ -622,21 +722,31 @@ class ConnectionHandler:
             start_time = time.time()
 
             # 使用带记忆的对话
-            memory_str = None
-            if self.memory is not None:
-                future = asyncio.run_coroutine_threadsafe(
-                    self.memory.query_memory(query), self.loop
-                )
-                memory_str = future.result()
+            memory_str = self._join_memory_query(query)
 
             # self.logger.bind(tag=TAG).info(f"对话记录: {self.dialogue.get_llm_dialogue_with_memory(memory_str)}")
 
             # 使用支持functions的streaming接口
-            llm_responses = self.llm.response_with_functions(
-                self.session_id,
-                self.dialogue.get_llm_dialogue_with_memory(memory_str),
-                functions=functions,
+            llm_dialogue = self.dialogue.get_llm_dialogue_with_memory(memory_str)
+            route, llm = self._select_llm(query, tool_call)
+            llm_responses = observe_first(
+                trace_stream(
+                    self,
+                    "llm",
+                    llm.response_with_functions(
+                        self.session_id,
+                        llm_dialogue,
+                        functions=functions,
+                    ),
+                    **{"llm.tool_call": tool_call},
+                ),
+                "llm_first_token",
+                "llm",
             )
+            if route is not None:
+                llm_responses = self.model_router.track(
+                    route, llm_responses, llm_dialogue
+                )
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
             return None
@@ -836,12 +946,84 @@ class ConnectionHandler:
 
 
         self.llm_finish_task = True
-        self.logger.bind(tag=TAG).debug(
-            json.dumps(self.dialogue.get_llm_dialogue(), indent=4, ensure_ascii=False)
-        )
+        # 调用过工具的回答与具体情况有关，不写入语义缓存
+        self._finish_cache_pending(cacheable=not tool_call and not tool_call_flag)
+        self._log_turn(turn_start)
 
         return True
 
+    def _finish_cache_pending(self, cacheable=True):
+        """本轮回答生成完毕，语义缓存在TTS音频全部完成后写入"""
+        pending = self.cache_pending
+        if pending is None:
+            return
+        if (
+            not cacheable
+            or self.client_abort
+            or pending.finish(self.tts_first_text_index, self.tts_last_text_index)
+        ):
+            self.cache_pending = None
+
+    def _submit_memory_query(self, query):
+        """在事件循环中查询记忆，返回future和实际的开始、结束时间（结束时间在协程内记录，先于结果可读）"""
+        timing = {"start": time.monotonic(), "start_ns": time.time_ns()}
+
+        async def query_memory():
+            try:
+                return await self.memory.query_memory(query)
+            finally:
+                timing["end"] = time.monotonic()
+                timing["end_ns"] = time.time_ns()
+
+        return asyncio.run_coroutine_threadsafe(query_memory(), self.loop), timing
+
+    def start_memory_query(self, query):
+        """识别出文字后立即开始查询记忆，与意图识别同时进行，组装提示词前再取结果"""
+        self.memory_query = None
+        if self.memory is None:
+            return
+        future, timing = self._submit_memory_query(query)
+        self.memory_query = (query, future, timing)
+
+    def _join_memory_query(self, query):
+        """取本轮记忆查询的结果，没有提前开始的查询时现场查询"""
+        if self.memory is None:
+            return None
+        pending, self.memory_query = self.memory_query, None
+        join_start = time.monotonic()
+        if pending is not None and pending[0] == query:
+            _, future, timing = pending
+        else:
+            future, timing = self._submit_memory_query(query)
+        memory_str = future.result()
+        wait = time.monotonic() - join_start
+        total = timing["end"] - timing["start"]
+        observe_stage("memory", total)
+        if self.trace is not None:
+            # 使用查询实际的开始和结束时间，提前完成的查询不会被记成一直持续到组装提示词
+            self.trace.record(
+                "memory",
+                timing["start_ns"],
+                timing["end_ns"],
+                **{"memory.wait_ms": round(wait * 1000, 1)},
+            )
+        self.memory_timing = {
+            "query_ms": round(total * 1000, 1),
+            "wait_ms": round(wait * 1000, 1),
+            "saved_ms": round(max(0.0, total - wait) * 1000, 1),
+        }
+        self.logger.bind(tag=TAG).debug(f"记忆查询耗时: {self.memory_timing}")
+        return memory_str
+
+    def _log_turn(self, turn_start):
+        """调试日志只输出本轮新增的对话，且只在DEBUG级别时才序列化"""
+        self.logger.bind(tag=TAG).opt(lazy=True).debug(
+            "{}",
+            lambda: json.dumps(
+                self.dialogue.get_llm_dialogue(turn_start), indent=4, ensure_ascii=False
+            ),
+        )
+
     def _handle_mcp_tool_call(self, function_call_data):
         function_arguments = function_call_data["arguments"]
         function_name = function_call_data["name"]
@@ -977,6 +1159,11 @@ class ConnectionHandler:
                                 audio_datas, _ = self.tts.audio_to_opus_data(tts_file)
                             # 在这里上报TTS数据（使用文件路径）
                             enqueue_tts_report(self, 2, text, audio_datas)
+                            pending = self.cache_pending
+                            if pending is not None and pending.add_segment(
+                                text_index_of_segment, text, audio_datas
+                            ):
+                                self.cache_pending = None
                         else:
                             self.logger.bind(tag=TAG).error(
                                 f"TTS出错：文件不存在{tts_file}"
@@ -1033,33 +1220,6 @@ class ConnectionHandler:
                     f"audio_play_priority priority_thread: {text} {e}"
                 )
 
-    def _tts_report_worker(self):
-        """TTS上报工作线程"""
-
-        while not self.stop_event.is_set():
-            try:
-                # 从队列获取数据，设置超时以便定期检查停止事件
-                item = self.tts_report_queue.get(timeout=1)
-                if item is None:  # 检测毒丸对象
-                    break
-
-                type, text, audio_data = item
-
-                try:
-                    # 执行上报（传入二进制数据）
-                    report_tts(self, type, text, audio_data)
-                except Exception as e:
-                    self.logger.bind(tag=TAG).error(f"TTS上报线程异常: {e}")
-                finally:
-                    # 标记任务完成
-                    self.tts_report_queue.task_done()
-            except queue.Empty:
-                continue
-            except Exception as e:
-                    self.logger.bind(tag=TAG).error(f"TTS上报工作线程异常: {e}")
-
-        self.logger.bind(tag=TAG).info("TTS上报线程已退出")
-
     def speak_and_play(self, text, text_index=0, current_motion_json=None):
         if text is None or len(text) <= 0:
             self.logger.bind(tag=TAG).info(f"无需tts转换，query为空，{text}")
@@ -1088,7 +1248,20 @@ class ConnectionHandler:
              self.logger.bind(tag=TAG).info(f"speak_and_play: Skipping TTS for empty or JSON-only text. Original: '{original_text_for_return}'")
              return None, original_text_for_return, text_index, current_motion_json
 
-        tts_file = self.tts.to_tts(text_for_tts)
+        tts_start = time.monotonic()
+        with trace_span(
+            self, "tts", **{"tts.text_index": text_index, "tts.chars": len(text_for_tts)}
+        ) as span:
+            try:
+                tts_file = self.tts.to_tts(text_for_tts)
+            except Exception:
+                record_provider("tts", False)
+                raise
+            record_provider("tts", tts_file is not None)
+            if tts_file is None:
+                span.end(error="tts转换失败")
+        if tts_file is not None and text_index == self.tts_first_text_index:
+            observe_stage("tts_first_byte", time.monotonic() - tts_start)
 
         if tts_file is None:
             self.logger.bind(tag=TAG).error(f"tts转换失败，text for tts: '{text_for_tts}'")
@@ -1122,6 +1295,11 @@ class ConnectionHandler:
         if hasattr(self, "mcp_manager") and self.mcp_manager:
             await self.mcp_manager.cleanup_all()
 
+        # 释放等待意图识别结果的乐观聊天线程
+        gate, self.chat_gate = self.chat_gate, None
+        if gate is not None:
+            gate.cancel()
+
         # 触发停止事件并清理资源
         if self.stop_event:
             self.stop_event.set()
@@ -1131,12 +1309,15 @@ class ConnectionHandler:
             self.executor.shutdown(wait=False, cancel_futures=True)
             self.executor = None
 
-        # 添加毒丸对象到上报队列确保线程退出
-        self.tts_report_queue.put(None)
-
         # 清空任务队列
         self.clear_queues()
 
+        # 归还从模块实例池借用的实例
+        self.provider_lease.release()
+
+        # 连接关闭时还没有结束的轮次
+        finish_turn(self, unfinished=True)
+
         if ws:
             await ws.close()
         elif self.websocket:
@@ -1225,4 +1406,4 @@ def filter_sensitive_info(config: dict) -> dict:
                 filtered[k] = v
         return filtered
 
-    return _filter_dict(copy.deepcopy(config))
+    return _filter_dict(config)
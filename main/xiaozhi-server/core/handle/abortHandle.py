@@ -1,6 +1,7 @@
 import json
 import queue
 from config.logger import setup_logging
+from core.utils.tracing import finish_turn
 
 TAG = __name__
 
@@ -15,4 +16,5 @@ async def handleAbortMessage(conn):
         json.dumps({"type": "tts", "state": "stop", "session_id": conn.session_id})
     )
     conn.clearSpeakStatus()
+    finish_turn(conn, **{"turn.aborted": True})
     conn.logger.bind(tag=TAG).info("Abort message received-end")
@@ -25,12 +25,16 @@ async def handleHelloMessage(conn, msg_json):
     if audio_params:
         format = audio_params.get("format")
         conn.logger.bind(tag=TAG).info(f"客户端音频格式: {format}")
+        # ASR实例可能由多个连接共用，音频格式在识别时随连接传入
         conn.audio_format = format
-        conn.asr.set_audio_format(format)
         conn.welcome_msg["audio_params"] = audio_params
 
     await conn.websocket.send(json.dumps(conn.welcome_msg))
 
+    if conn.memory is not None:
+        # 预取设备记忆，第一轮对话查询记忆时不需要等待
+        asyncio.create_task(conn.memory.prefetch_memory(conn.device_id))
+
 
 async def checkWakeupWords(conn, text):
     enable_wakeup_words_response_cache = conn.config[
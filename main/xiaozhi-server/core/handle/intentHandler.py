@@ -5,6 +5,7 @@ from core.handle.sendAudioHandle import send_stt_message
 from core.handle.helloHandle import checkWakeupWords
 from core.utils.util import remove_punctuation_and_length
 from core.utils.dialogue import Message
+from core.utils.speculative import ChatGate
 from plugins_func.register import Action
 from loguru import logger
 
@@ -22,8 +23,15 @@ async def handle_user_intent(conn, text):
     if conn.intent_type == "function_call":
         # 使用支持function calling的聊天方法,不再进行意图分析
         return False
-    # 使用LLM进行意图分析
-    intent_result = await analyze_intent_with_llm(conn, text)
+    # 本地快速意图识别命中时直接处理，不需要提前开始聊天
+    fast_detect = getattr(conn.intent, "fast_detect", None)
+    intent_result = fast_detect(conn, text) if fast_detect is not None else None
+    if intent_result is None:
+        # 乐观聊天会提前写入本轮的用户消息，意图识别使用之前的对话历史
+        dialogue_history = list(conn.dialogue.dialogue)
+        start_optimistic_chat(conn, text)
+        # 使用LLM进行意图分析
+        intent_result = await analyze_intent_with_llm(conn, text, dialogue_history)
     if not intent_result:
         return False
     # 处理各种意图
@@ -43,16 +51,25 @@ async def check_direct_exit(conn, text):
     return False
 
 
-async def analyze_intent_with_llm(conn, text):
+def start_optimistic_chat(conn, text):
+    """乐观模式：意图识别的同时开始生成聊天回复，意图确定前输出先缓存在conn.chat_gate后"""
+    if not conn.optimistic_chat or conn.intent_type != "intent_llm":
+        return
+    conn.chat_gate = ChatGate()
+    conn.executor.submit(conn.chat, text, conn.chat_gate)
+
+
+async def analyze_intent_with_llm(conn, text, dialogue_history=None):
     """使用LLM分析用户意图"""
     if not hasattr(conn, "intent") or not conn.intent:
         conn.logger.bind(tag=TAG).warning("意图识别服务未初始化")
         return None
 
     # 对话历史记录
-    dialogue = conn.dialogue
+    if dialogue_history is None:
+        dialogue_history = conn.dialogue.dialogue
     try:
-        intent_result = await conn.intent.detect_intent(conn, dialogue.dialogue, text)
+        intent_result = await conn.intent.detect_intent(conn, dialogue_history, text)
         return intent_result
     except Exception as e:
         conn.logger.bind(tag=TAG).error(f"意图识别失败: {str(e)}")
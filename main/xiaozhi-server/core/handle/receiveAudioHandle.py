@@ -3,9 +3,12 @@ import copy
 from core.utils.util import remove_punctuation_and_length
 from core.handle.sendAudioHandle import send_stt_message
 from core.handle.intentHandler import handle_user_intent
+from core.handle.semanticCacheHandle import reply_from_semantic_cache
 from core.utils.output_counter import check_device_output_limit
 from core.handle.ttsReportHandle import enqueue_tts_report
 from core.utils.util import audio_to_data
+from core.utils.metrics import observe_stage, record_provider
+from core.utils.tracing import start_turn, discard_turn, trace_span
 
 TAG = __name__
 
@@ -33,27 +36,54 @@ async def handleAudioMessage(conn, audio):
     conn.asr_audio.append(audio)
     # 如果本段有声音，且已经停止了
     if conn.client_voice_stop:
+        voice_stop_at = time.monotonic()
+        voice_stop_ns = time.time_ns()
+        last_voice_ns = None
+        if conn.client_listen_mode in ("auto", "realtime") and conn.client_have_voice_last_time > 0:
+            last_voice_ns = int(conn.client_have_voice_last_time * 1_000_000)
+            observe_stage("vad_endpoint", (voice_stop_ns - last_voice_ns) / 1e9)
         conn.client_abort = False
         conn.asr_server_receive = False
         # 音频太短了，无法识别
         if len(conn.asr_audio) < 15:
             conn.asr_server_receive = True
         else:
-            text, _ = await conn.asr.speech_to_text(conn.asr_audio, conn.session_id)
+            trace = start_turn(conn, last_voice_ns or voice_stop_ns, **{"turn.source": "voice"})
+            if trace is not None and last_voice_ns is not None:
+                trace.record("vad_endpoint", last_voice_ns, voice_stop_ns)
+            with trace_span(conn, "asr", **{"asr.frames": len(conn.asr_audio)}) as span:
+                try:
+                    text, _ = await conn.asr.speech_to_text(
+                        conn.asr_audio, conn.session_id, conn.audio_format
+                    )
+                except Exception:
+                    record_provider("asr", False)
+                    raise
+                record_provider("asr", text is not None)
+                observe_stage("asr", time.monotonic() - voice_stop_at)
+                span.set("asr.text_chars", len(text or ""))
             conn.logger.bind(tag=TAG).info(f"识别文本: {text}")
             text_len, _ = remove_punctuation_and_length(text)
             if text_len > 0:
                 # 使用自定义模块进行上报
                 enqueue_tts_report(conn, 1, text, copy.deepcopy(conn.asr_audio))
 
-                await startToChat(conn, text)
+                await startToChat(conn, text, voice_stop_at)
             else:
+                discard_turn(conn)
                 conn.asr_server_receive = True
         conn.asr_audio.clear()
         conn.reset_vad_states()
 
 
-async def startToChat(conn, text):
+async def startToChat(conn, text, turn_started_at=None):
+    # 丢弃上一轮没有完成的语义缓存写入，避免混入本轮的音频
+    conn.cache_pending = None
+    # 本轮的开始时间，发出第一帧音频时统计首包耗时；文字输入的轮次在这里开始追踪
+    if turn_started_at is None:
+        start_turn(conn, **{"turn.source": "text"})
+    conn.turn_started_at = turn_started_at or time.monotonic()
+
     if conn.need_bind:
         await check_bind_device(conn)
         return
@@ -66,16 +96,39 @@ async def startToChat(conn, text):
             await max_out_size(conn)
             return
 
-    # 首先进行意图分析
-    intent_handled = await handle_user_intent(conn, text)
+    # 记忆查询与意图识别同时进行，聊天组装提示词时再取结果
+    conn.start_memory_query(text)
+
+    # 首先进行意图分析，开启乐观聊天时聊天回复会同时开始生成
+    conn.chat_gate = None
+    intent_start = time.monotonic()
+    with trace_span(conn, "intent", **{"intent.type": conn.intent_type}) as span:
+        try:
+            intent_handled = await handle_user_intent(conn, text)
+        except Exception:
+            cancel_optimistic_chat(conn)
+            raise
+        span.set("intent.handled", bool(intent_handled))
+    observe_stage("intent", time.monotonic() - intent_start)
 
     if intent_handled:
         # 如果意图已被处理，不再进行聊天
+        cancel_optimistic_chat(conn)
         conn.asr_server_receive = True
         return
 
+    # 白名单意图命中语义缓存时直接播放缓存的回答，跳过LLM和TTS
+    if await reply_from_semantic_cache(conn, text):
+        cancel_optimistic_chat(conn)
+        return
+
     # 意图未被处理，继续常规聊天流程
     await send_stt_message(conn, text)
+    gate, conn.chat_gate = conn.chat_gate, None
+    if gate is not None and gate.release():
+        # 乐观聊天已经在生成，放行缓存的输出
+        return
+    # 没有乐观聊天，或乐观聊天等待意图识别超时已被撤回
     if conn.intent_type == "function_call":
         # 使用支持function calling的聊天方法
         conn.executor.submit(conn.chat_with_function_calling, text)
@@ -83,6 +136,13 @@ async def startToChat(conn, text):
         conn.executor.submit(conn.chat, text)
 
 
+def cancel_optimistic_chat(conn):
+    """取消意图识别期间提前开始的聊天"""
+    gate, conn.chat_gate = conn.chat_gate, None
+    if gate is not None:
+        gate.cancel()
+
+
 async def no_voice_close_connect(conn):
     if conn.client_no_voice_last_time == 0.0:
         conn.client_no_voice_last_time = time.time() * 1000
@@ -0,0 +1,54 @@
+import asyncio
+from core.handle.sendAudioHandle import send_stt_message
+from core.utils.dialogue import Message
+from core.utils.util import remove_punctuation_and_length
+
+TAG = __name__
+
+
+def get_partition_key(conn):
+    """按角色提示词、TTS音色和音频格式分区"""
+    tts = conn.tts
+    return conn.semantic_cache.partition_key(
+        conn.prompt,
+        type(tts).__module__,
+        getattr(tts, "voice", None),
+        conn.audio_format,
+    )
+
+
+async def reply_from_semantic_cache(conn, text):
+    """白名单意图命中语义缓存时直接播放缓存的回答，返回是否已处理"""
+    if conn.semantic_cache is None:
+        return False
+    _, query = remove_punctuation_and_length(text)
+    if not query:
+        return False
+
+    partition_key = get_partition_key(conn)
+    loop = asyncio.get_running_loop()
+    try:
+        intent, vector, entry = await loop.run_in_executor(
+            conn.executor, conn.semantic_cache.lookup, partition_key, query
+        )
+    except Exception as e:
+        conn.logger.bind(tag=TAG).error(f"语义缓存查询失败: {e}")
+        return False
+    if intent is None:
+        return False
+    if entry is None:
+        # 未命中，本轮的回答和音频生成完后写入缓存
+        conn.cache_pending = conn.semantic_cache.pending(
+            partition_key, intent, query, vector
+        )
+        return False
+
+    await send_stt_message(conn, text)
+    conn.dialogue.put(Message(role="user", content=text))
+    conn.dialogue.put(Message(role="assistant", content=entry.answer))
+    for text_index, (segment_text, audio_datas) in enumerate(entry.segments, 1):
+        conn.recode_first_last_text(segment_text, text_index)
+    conn.llm_finish_task = True
+    for text_index, (segment_text, audio_datas) in enumerate(entry.segments, 1):
+        conn.audio_play_queue.put((audio_datas, segment_text, text_index, None))
+    return True
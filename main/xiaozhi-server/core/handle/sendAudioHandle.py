@@ -2,6 +2,8 @@ import json
 import asyncio
 import time
 from core.utils.util import get_string_no_punctuation_or_emoji, analyze_emotion
+from core.utils.metrics import observe_stage
+from core.utils.tracing import finish_turn, trace_span
 
 TAG = __name__
 
@@ -58,7 +60,10 @@ async def sendAudioMessage(conn, audios, text, text_index=0, motion_data_to_use=
 
 
         # 发送最终构建的消息
-        conn.logger.bind(tag=TAG).info(f"发送LLM消息到客户端: {json.dumps(llm_message_data, ensure_ascii=False)}")
+        conn.logger.bind(tag=TAG).opt(lazy=True).debug(
+            "发送LLM消息到客户端: {}",
+            lambda: json.dumps(llm_message_data, ensure_ascii=False),
+        )
         await conn.websocket.send(json.dumps(llm_message_data))
 
     if text_index == conn.tts_first_text_index:
@@ -66,7 +71,10 @@ async def sendAudioMessage(conn, audios, text, text_index=0, motion_data_to_use=
     await send_tts_message(conn, "sentence_start", text)
 
     is_first_audio = text_index == conn.tts_first_text_index
-    await sendAudio(conn, audios, pre_buffer=is_first_audio)
+    with trace_span(
+        conn, "send_audio", **{"audio.text_index": text_index, "audio.frames": len(audios)}
+    ):
+        await sendAudio(conn, audios, pre_buffer=is_first_audio)
 
     await send_tts_message(conn, "sentence_end", text)
 
@@ -90,6 +98,12 @@ async def sendAudio(conn, audios, pre_buffer=True):
         pre_buffer_frames = min(3, len(audios))
         for i in range(pre_buffer_frames):
             await conn.websocket.send(audios[i])
+        turn_started_at = conn.turn_started_at
+        if pre_buffer_frames and turn_started_at is not None:
+            conn.turn_started_at = None
+            observe_stage("first_audio_frame", time.monotonic() - turn_started_at)
+            if conn.trace is not None:
+                conn.trace.root.add_event("first_audio_frame")
         remaining_audios = audios[pre_buffer_frames:]
     else:
         remaining_audios = audios
@@ -134,6 +148,7 @@ async def send_tts_message(conn, state, text=None):
             await sendAudio(conn, audios)
         # 清除服务端讲话状态
         conn.clearSpeakStatus()
+        finish_turn(conn)
 
     # 发送消息到客户端
     await conn.websocket.send(json.dumps(message))
@@ -13,7 +13,9 @@ TAG = __name__
 
 async def handleTextMessage(conn, message):
     """处理文本消息"""
-    conn.logger.bind(tag=TAG).info(f"收到文本消息：{message}")
+    # 消息可能很长（例如物联网设备描述），INFO级别只输出开头部分
+    conn.logger.bind(tag=TAG).info("收到文本消息：{:.200}", message)
+    conn.logger.bind(tag=TAG).debug("完整文本消息：{}", message)
     try:
         msg_json = json.loads(message)
         if isinstance(msg_json, int):
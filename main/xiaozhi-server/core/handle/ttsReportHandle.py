@@ -1,52 +1,24 @@
 """
-TTS上报功能已集成到ConnectionHandler类中。
+ASR和TTS聊天记录上报
 
-上报功能包括：
-1. 每个连接对象拥有自己的上报队列和处理线程
-2. 上报线程的生命周期与连接对象绑定
-3. 使用ConnectionHandler.enqueue_tts_report方法进行上报
-
-具体实现请参考core/connection.py中的相关代码。
+所有连接共用core/utils/report_uploader.py中的上报器，在后台批量上报到manager-api，
+连接只把记录放入上报队列，音频在上报器的线程中转换为WAV，或原样封装为Ogg/Opus。
 """
 
 import opuslib_next
 
-from config.manage_api_client import report
+from config.logger import setup_logging
+from core.utils.ogg_opus import opus_to_ogg
+from core.utils.report_uploader import get_chat_history_uploader
 
 TAG = __name__
+logger = setup_logging()
 
 
-def report_tts(conn, type, text, opus_data):
-    """执行TTS上报操作
-
-    Args:
-        conn: 连接对象
-        type: 上报类型，1为用户，2为智能体
-        text: 合成文本
-        opus_data: opus音频数据
-    """
-    try:
-        if opus_data:
-            audio_data = opus_to_wav(conn, opus_data)
-        else:
-            audio_data = None
-        # 执行上报
-        report(
-            mac_address=conn.device_id,
-            session_id=conn.session_id,
-            chat_type=type,
-            content=text,
-            audio=audio_data,
-        )
-    except Exception as e:
-        conn.logger.bind(tag=TAG).error(f"TTS上报失败: {e}")
-
-
-def opus_to_wav(conn, opus_data):
+def opus_to_wav(opus_data):
     """将Opus数据转换为WAV格式的字节流
 
     Args:
-        output_dir: 输出目录（保留参数以保持接口兼容）
         opus_data: opus音频数据
 
     Returns:
@@ -60,7 +32,7 @@ def opus_to_wav(conn, opus_data):
             pcm_frame = decoder.decode(opus_packet, 960)  # 960 samples = 60ms
             pcm_data.append(pcm_frame)
         except opuslib_next.OpusError as e:
-            conn.logger.bind(tag=TAG).error(f"Opus解码错误: {e}", exc_info=True)
+            logger.bind(tag=TAG).error(f"Opus解码错误: {e}")
 
     if not pcm_data:
         raise ValueError("没有有效的PCM数据")
@@ -90,19 +62,24 @@ def opus_to_wav(conn, opus_data):
 
 
 def enqueue_tts_report(conn, type, text, opus_data):
-    if not conn.read_config_from_api or conn.need_bind:
-        return
-    """将TTS数据加入上报队列
+    """将聊天记录加入上报队列
 
     Args:
         conn: 连接对象
+        type: 上报类型，1为用户，2为智能体
         text: 合成文本
         opus_data: opus音频数据
     """
+    if not conn.read_config_from_api or conn.need_bind:
+        return
     try:
-        # 使用连接对象的队列，传入文本和二进制数据而非文件路径
-        conn.tts_report_queue.put((type, text, opus_data))
-
+        report_config = conn.config.get("chat_history_report") or {}
+        if report_config.get("audio_format") == "ogg":
+            encode_audio = opus_to_ogg
+        else:
+            encode_audio = opus_to_wav
+        uploader = get_chat_history_uploader(conn.config, encode_audio, opus_to_wav)
+        uploader.submit(conn.device_id, conn.session_id, type, text, opus_data)
         conn.logger.bind(tag=TAG).debug(
             f"TTS数据已加入上报队列: {conn.device_id}, 音频大小: {len(opus_data)} "
         )
@@ -5,6 +5,7 @@ from aiohttp import web
 from config.logger import setup_logging
 from core.connection import ConnectionHandler
 from core.utils.util import get_local_ip, initialize_modules
+from core.utils.metrics import handle_metrics, metrics_path, metrics_port
 
 TAG = __name__
 
@@ -47,6 +48,10 @@ class SimpleOtaServer:
                     web.options("/xiaozhi/ota/", self._handle_ota_request),
                 ]
             )
+            # 没有单独配置指标端口时，指标接口挂在OTA服务上
+            metrics_config = self.config.get("metrics") or {}
+            if metrics_config.get("enabled", True) and not metrics_port(self.config):
+                app.add_routes([web.get(metrics_path(self.config), handle_metrics)])
 
             # 运行服务
             runner = web.AppRunner(app)
@@ -62,9 +67,9 @@ class SimpleOtaServer:
         """处理 /xiaozhi/ota/ 的 POST 请求"""
         try:
             data = await request.text()
-            self.logger.bind(tag=TAG).debug(f"OTA请求方法: {request.method}")
-            self.logger.bind(tag=TAG).debug(f"OTA请求头: {request.headers}")
-            self.logger.bind(tag=TAG).debug(f"OTA请求数据: {data}")
+            self.logger.bind(tag=TAG).debug("OTA请求方法: {}", request.method)
+            self.logger.bind(tag=TAG).debug("OTA请求头: {}", request.headers)
+            self.logger.bind(tag=TAG).debug("OTA请求数据: {}", data)
 
             device_id = request.headers.get("device-id", "")
             if device_id:
@@ -18,9 +18,9 @@ class ASRProviderBase(ABC):
 
     @abstractmethod
     async def speech_to_text(
-        self, opus_data: List[bytes], session_id: str
+        self, opus_data: List[bytes], session_id: str, audio_format: Optional[str] = None
     ) -> Tuple[Optional[str], Optional[str]]:
-        """将语音数据转换为文本"""
+        """将语音数据转换为文本，audio_format为该连接的音频格式，未传入时使用set_audio_format设置的格式"""
         pass
 
     def set_audio_format(self, format: str) -> None:
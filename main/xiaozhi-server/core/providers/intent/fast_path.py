@@ -0,0 +1,238 @@
+"""
+本地快速意图识别
+
+在调用LLM做意图识别之前，先用本地规则和n-gram相似度判断用户意图：
+1. 预编译的关键词/正则规则，命中即得到函数名和参数
+2. 用户输入与已注册函数描述的字符二元组TF-IDF相似度，
+   高于阈值且函数不需要额外参数时直接调用该函数
+只返回高置信度的结果，不确定时返回None，由LLM继续识别。
+"""
+
+import re
+import json
+import math
+from collections import Counter
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 歌名不能是泛指的内容或形容词，例如“播放故事”“来一首好听的”，这类说法交给LLM
+NOT_SONG = (
+    r"(?!(今天的|最新的|一些|一点|点)?(新闻|故事|笑话|相声|评书|广播|节目|视频|电视|电影|儿歌|歌|音乐)$)"
+    r"(?!.*(怎么|什么|为什么|吗|呢|好听|好玩|有趣|轻松|欢快|安静|热门|流行|经典|随便|别的|其他|几首))"
+)
+
+# 地名：2到5个汉字，不能包含代词、动词、时间词和语气词，例如“我明天去北京”不是地名
+PLACE = r"(?:(?![我你他她它们去来在到从的了吗呢啊吧明今昨后现想要会说问看查帮给])[\u4e00-\u9fff]){2,5}?"
+
+# 默认规则：函数名、正则、参数。参数值中的{组名}会替换为正则中对应命名组匹配到的文字
+# 按顺序匹配，具体的意图（新闻）要放在宽泛的意图（播放歌曲）之前
+DEFAULT_RULES = [
+    {
+        "function": "get_time",
+        "pattern": r"^(请问)?(现在)?(几点了?|几点钟|什么时间|是什么时间)(了|啦)?$"
+        r"|^(今天|现在)(是)?(几号|几月几号|星期几|周几|礼拜几)(啊|呀)?$",
+    },
+    {
+        "function": "handle_device",
+        "pattern": r"^(把)?(音量|声音)(调到|调成|设置为|设为|设置成)(?P<value>\d{1,3})(%|的音量)?$",
+        "arguments": {"device_type": "Speaker", "action": "set", "value": "{value}"},
+    },
+    {
+        "function": "handle_device",
+        "pattern": r"^(大声(一)?点|声音(调)?大(一)?点|(调)?大点声|(把)?音量调(大|高)(一)?点?|调(大|高)音量|听不清(楚)?)(吧|啊)?$",
+        "arguments": {"device_type": "Speaker", "action": "raise"},
+    },
+    {
+        "function": "handle_device",
+        "pattern": r"^(小声(一)?点|声音(调)?小(一)?点|(调)?小点声|(把)?音量调(小|低)(一)?点?|调(小|低)音量|太吵了)(吧|啊)?$",
+        "arguments": {"device_type": "Speaker", "action": "lower"},
+    },
+    {
+        "function": "handle_device",
+        "pattern": r"^(屏幕)?(亮(一)?点|调亮(一)?点?|亮度调(高|大)(一)?点?|调(高|大)亮度)(吧|啊)?$",
+        "arguments": {"device_type": "Screen", "action": "raise"},
+    },
+    {
+        "function": "handle_device",
+        "pattern": r"^(屏幕)?(暗(一)?点|调暗(一)?点?|亮度调(低|小)(一)?点?|调(低|小)亮度|太亮了)(吧|啊)?$",
+        "arguments": {"device_type": "Screen", "action": "lower"},
+    },
+    {
+        "function": "handle_device",
+        "pattern": r"^(现在)?(的)?(音量|声音)(是)?多(少|大)$",
+        "arguments": {"device_type": "Speaker", "action": "get"},
+    },
+    {
+        "function": "get_news_from_newsnow",
+        "pattern": r"^(播报|讲讲|说说|来点|播放|看看)?(今天|最新)?(有什么|的)?新闻(吧|啊)?$",
+        "arguments": {"lang": "zh_CN"},
+    },
+    {
+        "function": "play_music",
+        "pattern": r"^(我想听|我要听|播放|放|来|唱)(一)?(首|个|点)?(歌|音乐|歌曲)(吧|啊)?$"
+        r"|^(听|放|播放)(歌|音乐)$|^随便(放|来)(一)?首(歌)?$",
+        "arguments": {"song_name": "random"},
+    },
+    {
+        "function": "play_music",
+        "pattern": r"^(播放(?!器|机)|放(一)?首|来(一)?首)(?P<song>" + NOT_SONG + r"[^，。？,?]{2,20}?)(这首歌|这首|的歌)?$",
+        "arguments": {"song_name": "{song}"},
+    },
+    {
+        "function": "handle_exit_intent",
+        "pattern": r"^(退下吧?|再见|拜拜|我要睡觉了|不聊了|我先走了|退出|关机)(了|吧|啦)?$",
+        "arguments": {"say_goodbye": "好的，再见啦，期待下次和你聊天！"},
+    },
+    {
+        "function": "get_weather",
+        "pattern": r"^(?P<location>" + PLACE + r")?(今天|明天|现在)?(的)?天气(怎么样|如何|好吗|好不好)?(啊|呀)?$",
+        "arguments": {"location": "{location}", "lang": "zh_CN"},
+    },
+]
+
+# 去除句尾语气词和标点后再匹配规则
+STRIP_PATTERN = re.compile(r"[\s，。！？、,.!?~～…]+")
+
+NAMED_GROUP_PATTERN = re.compile(r"\(\?P<\w+>")
+
+# 参数中只有这些字段时，n-gram命中的函数可以直接调用
+OPTIONAL_ARGUMENT_DEFAULTS = {"lang": "zh_CN"}
+
+
+def _bigrams(text):
+    chars = [c for c in text if not c.isspace()]
+    grams = chars + [a + b for a, b in zip(chars, chars[1:])]
+    return Counter(grams)
+
+
+class FunctionMatcher:
+    """已注册函数描述的字符二元组TF-IDF向量，计算用户输入与每个函数的余弦相似度"""
+
+    def __init__(self, functions):
+        docs = []
+        for func in functions:
+            info = func.get("function", {})
+            text = info.get("description", "")
+            for param in info.get("parameters", {}).get("properties", {}).values():
+                text += param.get("description", "")
+            docs.append((info.get("name", ""), _bigrams(text)))
+
+        df = Counter()
+        for _, grams in docs:
+            df.update(grams.keys())
+        total = len(docs) or 1
+        self.idf = {g: math.log((1 + total) / (1 + n)) + 1 for g, n in df.items()}
+        self.vectors = []
+        for name, grams in docs:
+            vector = {g: c * self.idf[g] for g, c in grams.items()}
+            norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+            self.vectors.append((name, {g: v / norm for g, v in vector.items()}))
+
+    def best(self, text):
+        """返回 (函数名, 相似度, 第二名相似度)"""
+        query = {g: c * self.idf[g] for g, c in _bigrams(text).items() if g in self.idf}
+        norm = math.sqrt(sum(v * v for v in query.values()))
+        if norm == 0:
+            return None, 0.0, 0.0
+        scores = sorted(
+            (
+                (sum(v * vector.get(g, 0.0) for g, v in query.items()) / norm, name)
+                for name, vector in self.vectors
+            ),
+            reverse=True,
+        )
+        second = scores[1][0] if len(scores) > 1 else 0.0
+        return scores[0][1], scores[0][0], second
+
+
+class IntentFastPath:
+    def __init__(self, config):
+        rules = list(config.get("rules") or []) + DEFAULT_RULES
+        self.rules = [
+            {
+                "function": rule["function"],
+                "regex": re.compile(rule["pattern"]),
+                "arguments": rule.get("arguments") or {},
+            }
+            for rule in rules
+        ]
+        # 所有规则合并成一个正则，一次扫描即可判断是否命中
+        self.automaton = re.compile(
+            "|".join(
+                f"(?P<r{i}>{NAMED_GROUP_PATTERN.sub('(?:', rule['pattern'])})"
+                for i, rule in enumerate(rules)
+            )
+        )
+        # n-gram相似度不低于该值，且领先第二名margin以上时直接调用函数
+        self.function_threshold = float(config.get("function_threshold", 0.45))
+        self.margin = float(config.get("margin", 0.1))
+        self.functions = None
+        self.function_names = ()
+        self.matcher = None
+
+    def _update_functions(self, functions):
+        names = tuple(f.get("function", {}).get("name") for f in functions)
+        if names == self.function_names:
+            return
+        self.function_names = names
+        self.functions = {
+            f.get("function", {}).get("name"): f.get("function", {}) for f in functions
+        }
+        self.matcher = FunctionMatcher(functions)
+
+    def _match_rules(self, text):
+        match = self.automaton.match(text)
+        if match is None or match.lastgroup is None:
+            return None
+        # 自动机只用于快速判断，参数从命中的规则中提取
+        first = int(match.lastgroup[1:])
+        for rule in self.rules[first:]:
+            if rule["function"] not in self.functions:
+                continue
+            rule_match = rule["regex"].match(text)
+            if rule_match is None:
+                continue
+            arguments = {}
+            for key, value in rule["arguments"].items():
+                if isinstance(value, str) and value.startswith("{") and value.endswith("}"):
+                    value = rule_match.groupdict().get(value[1:-1])
+                    if not value:
+                        continue
+                arguments[key] = value
+            properties = (
+                self.functions[rule["function"]].get("parameters", {}).get("properties", {})
+            )
+            for key, value in arguments.items():
+                if properties.get(key, {}).get("type") == "integer":
+                    arguments[key] = int(value)
+            return rule["function"], arguments
+        return None
+
+    def _match_functions(self, text):
+        name, score, second = self.matcher.best(text)
+        if name is None or score < self.function_threshold:
+            return None
+        if score - second < self.margin:
+            return None
+        required = self.functions[name].get("parameters", {}).get("required", [])
+        if any(r not in OPTIONAL_ARGUMENT_DEFAULTS for r in required):
+            # 需要提取参数的函数交给LLM
+            return None
+        return name, {r: OPTIONAL_ARGUMENT_DEFAULTS[r] for r in required}
+
+    def classify(self, text, functions):
+        """返回function_call格式的JSON字符串，不确定时返回None"""
+        self._update_functions(functions)
+        text = STRIP_PATTERN.sub("", text)
+        if not text:
+            return None
+        result = self._match_rules(text) or self._match_functions(text)
+        if result is None:
+            return None
+        name, arguments = result
+        function_call = {"name": name}
+        if arguments:
+            function_call["arguments"] = arguments
+        return json.dumps({"function_call": function_call}, ensure_ascii=False)
@@ -0,0 +1,210 @@
+"""
+意图识别结果缓存
+
+缓存键由三部分组成：去掉标点、统一大小写后的用户输入，当前可用函数集合的哈希，
+以及可选的最近几条对话历史。函数集合变化（例如加载了新插件）或上下文不同时不会误用旧结果。
+
+- 本地缓存：OrderedDict实现的TTL+LRU，查询、写入、淘汰都是O(1)
+- 共享缓存（可选）：SQLite文件，同一台机器上的多个工作进程共用识别结果
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from config.logger import setup_logging
+from core.utils.util import remove_punctuation_and_length
+from core.utils.metrics import record_cache
+
+TAG = __name__
+logger = setup_logging()
+
+
+def normalize_text(text):
+    _, text = remove_punctuation_and_length(text)
+    return text.strip().lower()
+
+
+def functions_fingerprint(functions):
+    """可用函数集合的哈希，与函数顺序无关
+
+    同名的IoT、MCP函数在不同设备、固件上的说明和参数可能不同，按每个函数完整的规范化JSON计算
+    """
+    schemas = sorted(
+        json.dumps(f, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+        for f in (functions or [])
+    )
+    return hashlib.md5("\x00".join(schemas).encode("utf-8")).hexdigest()[:12]
+
+
+class LRUCache:
+    """带TTL的LRU缓存，所有操作O(1)"""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, now):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            intent, expires_at = item
+            if expires_at <= now:
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return intent
+
+    def put(self, key, intent, now, expires_at=None):
+        with self.lock:
+            self.items[key] = (intent, expires_at or now + self.ttl)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class SQLiteBackend:
+    """多个工作进程共用的SQLite缓存，WAL模式下读写互不阻塞"""
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self.local = threading.local()
+        self.writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS intent_cache ("
+            "key TEXT PRIMARY KEY, intent TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_intent_cache_expires ON intent_cache(expires_at)"
+        )
+        db.commit()
+
+    def _db(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=1.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def get(self, key, now):
+        row = (
+            self._db()
+            .execute(
+                "SELECT intent, expires_at FROM intent_cache WHERE key = ? AND expires_at > ?",
+                (key, now),
+            )
+            .fetchone()
+        )
+        return row
+
+    def put(self, key, intent, expires_at):
+        db = self._db()
+        db.execute(
+            "INSERT OR REPLACE INTO intent_cache (key, intent, expires_at) VALUES (?, ?, ?)",
+            (key, intent, expires_at),
+        )
+        self.writes += 1
+        # 每写入一定次数清理一次过期和超出上限的条目，清理开销分摊到每次写入
+        if self.writes % 100 == 0:
+            db.execute("DELETE FROM intent_cache WHERE expires_at <= ?", (time.time(),))
+            db.execute(
+                "DELETE FROM intent_cache WHERE key NOT IN ("
+                "SELECT key FROM intent_cache ORDER BY expires_at DESC LIMIT ?)",
+                (self.max_size,),
+            )
+        db.commit()
+
+
+class IntentCache:
+    def __init__(self, config):
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        ttl = float(config.get("ttl", 600))
+        max_size = int(config.get("max_size", 1000))
+        # 缓存键包含的之前几轮用户输入，0表示只按用户输入和函数集合缓存。
+        # 助手的回复每次都不同，不放进缓存键，否则不同设备、不同进程之间几乎不会命中
+        self.context_turns = int(config.get("context_turns", 0))
+        self.local = LRUCache(max_size, ttl)
+        self.shared = None
+        shared_path = config.get("shared_path")
+        if self.enabled and shared_path:
+            try:
+                self.shared = SQLiteBackend(
+                    shared_path, int(config.get("shared_max_size", 10000))
+                )
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"共享意图缓存初始化失败，只使用本地缓存: {e}")
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def make_key(self, text, functions, dialogue_history=None):
+        parts = [normalize_text(text), functions_fingerprint(functions)]
+        if self.context_turns > 0 and dialogue_history:
+            user_turns = [m for m in dialogue_history if m.role == "user"]
+            for message in user_turns[-self.context_turns :]:
+                parts.append(normalize_text(message.content or ""))
+        return hashlib.md5("\x00".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.time()
+        intent = self.local.get(key, now)
+        if intent is None and self.shared is not None:
+            try:
+                row = self.shared.get(key, now)
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"读取共享意图缓存失败: {e}")
+                row = None
+            if row is not None:
+                intent = row[0]
+                self.local.put(key, intent, now, row[1])
+                with self.lock:
+                    self.shared_hits += 1
+        with self.lock:
+            if intent is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        record_cache("intent", intent is not None)
+        return intent
+
+    def put(self, key, intent):
+        if not self.enabled:
+            return
+        now = time.time()
+        self.local.put(key, intent, now)
+        if self.shared is not None:
+            try:
+                self.shared.put(key, intent, now + self.local.ttl)
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"写入共享意图缓存失败: {e}")
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.local),
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
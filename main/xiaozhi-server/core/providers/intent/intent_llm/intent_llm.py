@@ -1,10 +1,12 @@
 from typing import List, Dict
 from ..base import IntentProviderBase
+from ..fast_path import IntentFastPath
+from ..intent_cache import IntentCache
+from ..prompt_compiler import IntentPromptCompiler
 from plugins_func.functions.play_music import initialize_music_handler
 from config.logger import setup_logging
 import re
 import json
-import hashlib
 import time
 
 TAG = __name__
@@ -15,12 +17,19 @@ class IntentProvider(IntentProviderBase):
     def __init__(self, config):
         super().__init__(config)
         self.llm = None
-        self.promot = ""
+        # 按函数集合、音乐库版本和设备列表缓存编译好的系统提示词
+        self.prompt_compiler = IntentPromptCompiler(
+            self.get_intent_system_prompt, config.get("prompt")
+        )
         # 添加缓存管理
-        self.intent_cache = {}  # 缓存意图识别结果
-        self.cache_expiry = 600  # 缓存有效期10分钟
-        self.cache_max_size = 100  # 最多缓存100个意图
+        # 意图识别结果缓存，按用户输入、可用函数集合和最近对话区分
+        self.intent_cache = IntentCache(config.get("cache"))
         self.history_count = 4  # 默认使用最近4条对话记录
+        # 本地快速意图识别，高置信度的意图不再调用LLM
+        fast_path_config = config.get("fast_path") or {}
+        self.fast_path = None
+        if fast_path_config.get("enabled", False):
+            self.fast_path = IntentFastPath(fast_path_config)
 
     def get_intent_system_prompt(self, functions_list: str) -> str:
         """
@@ -84,27 +93,6 @@ class IntentProvider(IntentProviderBase):
         )
         return prompt
 
-    def clean_cache(self):
-        """清理过期缓存"""
-        now = time.time()
-        # 找出过期键
-        expired_keys = [
-            k
-            for k, v in self.intent_cache.items()
-            if now - v["timestamp"] > self.cache_expiry
-        ]
-        for key in expired_keys:
-            del self.intent_cache[key]
-
-        # 如果缓存太大，移除最旧的条目
-        if len(self.intent_cache) > self.cache_max_size:
-            # 按时间戳排序并保留最新的条目
-            sorted_items = sorted(
-                self.intent_cache.items(), key=lambda x: x[1]["timestamp"]
-            )
-            for key, _ in sorted_items[: len(sorted_items) - self.cache_max_size]:
-                del self.intent_cache[key]
-
     def replyResult(self, text: str, original_text: str):
         llm_result = self.llm.response_no_stream(
             system_prompt=text,
@@ -113,7 +101,20 @@ class IntentProvider(IntentProviderBase):
         )
         return llm_result
 
+    def fast_detect(self, conn, text: str):
+        """本地快速意图识别，不确定时返回None"""
+        if self.fast_path is None or not hasattr(conn, "func_handler"):
+            return None
+        start_time = time.time()
+        intent = self.fast_path.classify(text, conn.func_handler.get_functions())
+        if intent is not None:
+            logger.bind(tag=TAG).info(
+                f"快速意图识别: {intent}, 耗时: {time.time() - start_time:.4f}秒"
+            )
+        return intent
+
     async def detect_intent(self, conn, dialogue_history: List[Dict], text: str) -> str:
+        """LLM意图识别，调用方已经先用fast_detect判断过，这里不再重复"""
         if not self.llm:
             raise ValueError("LLM provider not set")
 
@@ -125,37 +126,29 @@ class IntentProvider(IntentProviderBase):
         logger.bind(tag=TAG).debug(f"使用意图识别模型: {model_info}")
 
         # 计算缓存键
-        cache_key = hashlib.md5(text.encode()).hexdigest()
+        functions = (
+            conn.func_handler.get_functions() if hasattr(conn, "func_handler") else None
+        )
+        cache_key = self.intent_cache.make_key(text, functions, dialogue_history)
 
         # 检查缓存
-        if cache_key in self.intent_cache:
-            cache_entry = self.intent_cache[cache_key]
-            # 检查缓存是否过期
-            if time.time() - cache_entry["timestamp"] <= self.cache_expiry:
-                cache_time = time.time() - total_start_time
-                logger.bind(tag=TAG).debug(
-                    f"使用缓存的意图: {cache_key} -> {cache_entry['intent']}, 耗时: {cache_time:.4f}秒"
-                )
-                return cache_entry["intent"]
-
-        # 清理缓存
-        self.clean_cache()
-
-        if self.promot == "":
-            if hasattr(conn, "func_handler"):
-                functions = conn.func_handler.get_functions()
-                self.promot = self.get_intent_system_prompt(functions)
+        cached_intent = self.intent_cache.get(cache_key)
+        if cached_intent is not None:
+            cache_time = time.time() - total_start_time
+            logger.bind(tag=TAG).debug(
+                f"使用缓存的意图: {cache_key} -> {cached_intent}, 耗时: {cache_time:.4f}秒, "
+                f"缓存统计: {self.intent_cache.stats()}"
+            )
+            return cached_intent
 
         music_config = initialize_music_handler(conn)
-        music_file_names = music_config["music_file_names"]
-        prompt_music = f"{self.promot}\n<musicNames>{music_file_names}\n</musicNames>"
-
-        devices = conn.config["plugins"]["home_assistant"].get("devices", [])
-        if len(devices) > 0:
-            hass_prompt = "\n下面是我家智能设备列表（位置，设备名，entity_id），可以通过homeassistant控制\n"
-            for device in devices:
-                hass_prompt += device + "\n"
-            prompt_music += hass_prompt
+        devices = conn.config["plugins"].get("home_assistant", {}).get("devices", [])
+        prompt_music = self.prompt_compiler.compile(
+            functions,
+            music_config["music_file_names"],
+            music_config["version"],
+            devices,
+        )
 
         logger.bind(tag=TAG).debug(f"User prompt: {prompt_music}")
 
@@ -219,10 +212,7 @@ class IntentProvider(IntentProviderBase):
                 )
 
                 # 添加到缓存
-                self.intent_cache[cache_key] = {
-                    "intent": intent,
-                    "timestamp": time.time(),
-                }
+                self.intent_cache.put(cache_key, intent)
 
                 # 后处理时间
                 postprocess_time = time.time() - postprocess_start_time
@@ -232,10 +222,7 @@ class IntentProvider(IntentProviderBase):
                 return intent
             else:
                 # 添加到缓存
-                self.intent_cache[cache_key] = {
-                    "intent": intent,
-                    "timestamp": time.time(),
-                }
+                self.intent_cache.put(cache_key, intent)
 
                 # 后处理时间
                 postprocess_time = time.time() - postprocess_start_time
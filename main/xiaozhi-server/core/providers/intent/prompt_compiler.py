@@ -0,0 +1,79 @@
+"""
+意图识别系统提示词编译
+
+提示词由函数说明、音乐列表和Home Assistant设备列表拼接而成。按
+(函数集合签名, 音乐库版本, 设备列表版本) 缓存编译结果，三者都不变时直接复用；
+函数签名包含每个函数的完整说明和参数，同名函数的说明不同时不会共用提示词。
+音乐目录每refresh_time秒重新扫描，文件有变化或设备配置变化时重新编译。
+音乐较多时只列出前max_music_names首，避免提示词过长。
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from config.logger import setup_logging
+from .intent_cache import functions_fingerprint
+
+TAG = __name__
+logger = setup_logging()
+
+
+def devices_fingerprint(devices):
+    return hashlib.md5("\n".join(devices).encode("utf-8")).hexdigest()[:12]
+
+
+class IntentPromptCompiler:
+    def __init__(self, build_functions_prompt, config=None):
+        config = config or {}
+        # 根据函数列表生成提示词主体的方法
+        self.build_functions_prompt = build_functions_prompt
+        # 提示词中最多列出的歌曲数，0表示不限制
+        self.max_music_names = int(config.get("max_music_names", 50))
+        # 最多保留的编译结果数（不同连接可能加载了不同的插件）
+        self.max_entries = int(config.get("max_entries", 16))
+        self.compiled = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _music_prompt(self, music_file_names):
+        names = list(music_file_names or [])
+        if self.max_music_names > 0 and len(names) > self.max_music_names:
+            listed = names[: self.max_music_names]
+            return (
+                f"\n<musicNames>{listed}\n</musicNames>\n"
+                f"（音乐库共{len(names)}首，以上只列出部分；"
+                f"用户点播的歌曲不在列表中时，直接使用用户说的歌名）"
+            )
+        return f"\n<musicNames>{names}\n</musicNames>"
+
+    @staticmethod
+    def _devices_prompt(devices):
+        if not devices:
+            return ""
+        hass_prompt = "\n下面是我家智能设备列表（位置，设备名，entity_id），可以通过homeassistant控制\n"
+        for device in devices:
+            hass_prompt += device + "\n"
+        return hass_prompt
+
+    def compile(self, functions, music_file_names, music_version, devices):
+        """返回编译好的系统提示词，签名不变时直接返回缓存"""
+        key = (functions_fingerprint(functions), music_version, devices_fingerprint(devices))
+        with self.lock:
+            prompt = self.compiled.get(key)
+            if prompt is not None:
+                self.compiled.move_to_end(key)
+                return prompt
+
+        prompt = (
+            self.build_functions_prompt(functions or [])
+            + self._music_prompt(music_file_names)
+            + self._devices_prompt(devices)
+        )
+        with self.lock:
+            self.compiled[key] = prompt
+            while len(self.compiled) > self.max_entries:
+                self.compiled.popitem(last=False)
+        logger.bind(tag=TAG).info(
+            f"意图识别提示词已重新编译: 函数 {key[0]}, 音乐库版本 {music_version}, "
+            f"设备 {key[2]}, 长度 {len(prompt)}"
+        )
+        return prompt
@@ -24,23 +24,24 @@ class LLMProvider(LLMProviderBase):
         self.user_id = str(config.get("user_id"))
         self.session_conversation_map = {}  # 存储session_id和conversation_id的映射
         check_model_key("CozeLLM", self.personal_access_token)
+        # 复用同一个客户端，保持与coze服务的长连接
+        self.coze = Coze(
+            auth=TokenAuth(token=self.personal_access_token),
+            base_url=COZE_CN_BASE_URL,
+        )
 
     def response(self, session_id, dialogue):
-        coze_api_token = self.personal_access_token
-        coze_api_base = COZE_CN_BASE_URL
-
         last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
 
-        coze = Coze(auth=TokenAuth(token=coze_api_token), base_url=coze_api_base)
         conversation_id = self.session_conversation_map.get(session_id)
 
         # 如果没有找到conversation_id，则创建新的对话
         if not conversation_id:
-            conversation = coze.conversations.create(messages=[])
+            conversation = self.coze.conversations.create(messages=[])
             conversation_id = conversation.id
             self.session_conversation_map[session_id] = conversation_id  # 更新映射
 
-        for event in coze.chat.stream(
+        for event in self.coze.chat.stream(
             bot_id=self.bot_id,
             user_id=self.user_id,
             additional_messages=[
@@ -58,14 +59,17 @@ class LLMProvider(LLMProviderBase):
             last_msg = dialogue[-1]["content"]
             function_str = json.dumps(functions, ensure_ascii=False)
             modify_msg = get_system_prompt_for_function(function_str) + last_msg
-            dialogue[-1]["content"] = modify_msg
+            dialogue[-1] = {**dialogue[-1], "content": modify_msg}
 
         # 如果最后一个是 role="tool"，附加到user上
         if len(dialogue) > 1 and dialogue[-1]["role"] == "tool":
             assistant_msg = "\ntool call result: " + dialogue[-1]["content"] + "\n\n"
             while len(dialogue) > 1:
                 if dialogue[-1]["role"] == "user":
-                    dialogue[-1]["content"] = assistant_msg + dialogue[-1]["content"]
+                    dialogue[-1] = {
+                        **dialogue[-1],
+                        "content": assistant_msg + dialogue[-1]["content"],
+                    }
                     break
                 dialogue.pop()
 
@@ -1,8 +1,8 @@
 import json
 from config.logger import setup_logging
-import requests
 from core.providers.llm.base import LLMProviderBase
 from core.utils.util import check_model_key
+from core.utils.http_pool import get_session
 
 TAG = __name__
 logger = setup_logging()
@@ -14,6 +14,7 @@ class LLMProvider(LLMProviderBase):
         self.base_url = config.get("base_url")
         self.detail = config.get("detail", False)
         self.variables = config.get("variables", {})
+        self.http_session = get_session(self.base_url, overrides=config.get("http_pool"))
         check_model_key("FastGPTLLM", self.api_key)
 
     def response(self, session_id, dialogue):
@@ -22,7 +23,7 @@ class LLMProvider(LLMProviderBase):
             last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
 
             # 发起流式请求
-            with requests.post(
+            with self.http_session.post(
                 f"{self.base_url}/chat/completions",
                 headers={"Authorization": f"Bearer {self.api_key}"},
                 json={
@@ -1,6 +1,7 @@
 import google.generativeai as genai
 from core.utils.util import check_model_key
 from core.providers.llm.base import LLMProviderBase
+from core.utils.http_pool import get_session
 from config.logger import setup_logging
 import requests
 import json
@@ -16,6 +17,7 @@ class LLMProvider(LLMProviderBase):
         self.api_key = config.get("api_key")
         self.http_proxy = config.get("http_proxy")
         self.https_proxy = config.get("https_proxy")
+        self.http_pool = config.get("http_pool")
         have_key = check_model_key("LLM", self.api_key)
 
         if not have_key:
@@ -86,12 +88,14 @@ class LLMProvider(LLMProviderBase):
 
             # 发送POST请求,经测试手动 request 无法使用 stream 模式
             if self.proxies:
-                response = requests.post(
+                http_session = get_session(
+                    url, proxies=self.proxies, overrides=self.http_pool
+                )
+                response = http_session.post(
                     url,
                     headers=headers,
                     json=request_body,
                     stream=False,
-                    proxies=self.proxies,
                 )
                 try:
                     data = response.json()  # 直接解析JSON
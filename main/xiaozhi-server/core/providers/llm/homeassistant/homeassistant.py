@@ -1,7 +1,7 @@
-import requests
 from requests.exceptions import RequestException
 from config.logger import setup_logging
 from core.providers.llm.base import LLMProviderBase
+from core.utils.http_pool import get_session
 
 TAG = __name__
 logger = setup_logging()
@@ -13,6 +13,7 @@ class LLMProvider(LLMProviderBase):
         self.api_key = config.get("api_key")
         self.base_url = config.get("base_url", config.get("url"))  # 默认使用 base_url
         self.api_url = f"{self.base_url}/api/conversation/process"  # 拼接完整的 API URL
+        self.http_session = get_session(self.base_url, overrides=config.get("http_pool"))
 
     def response(self, session_id, dialogue):
         try:
@@ -40,7 +41,7 @@ class LLMProvider(LLMProviderBase):
             }
 
             # 发起 POST 请求
-            response = requests.post(self.api_url, json=payload, headers=headers)
+            response = self.http_session.post(self.api_url, json=payload, headers=headers)
 
             # 检查请求是否成功
             response.raise_for_status()
@@ -0,0 +1,39 @@
+"""
+本地LLM保温
+
+后台线程定期调用LLM适配器的keep_warm方法，避免本地模型空闲后被卸载导致冷启动，
+同时用当前系统提示词预热推理后端的前缀缓存。
+"""
+
+import threading
+import weakref
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class KeepWarmPinger:
+    def __init__(self, provider, interval):
+        self.interval = interval
+        # 只持有弱引用，适配器被回收后线程自动退出
+        self._provider_ref = weakref.ref(provider)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="LLMKeepWarm", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            provider = self._provider_ref()
+            if provider is None:
+                break
+            try:
+                provider.keep_warm()
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"LLM保温请求失败: {e}")
+            del provider
+
+    def stop(self):
+        self._stop_event.set()
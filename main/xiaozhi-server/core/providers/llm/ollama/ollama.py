@@ -1,7 +1,10 @@
 from config.logger import setup_logging
 from openai import OpenAI
 import json
+import time
 from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.keep_warm import KeepWarmPinger
+from core.utils.http_pool import get_httpx_client
 
 TAG = __name__
 logger = setup_logging()
@@ -16,17 +19,65 @@ class LLMProvider(LLMProviderBase):
         if not self.base_url.endswith("/v1"):
             self.base_url = f"{self.base_url}/v1"
 
+        self.native_url = self.base_url[: -len("/v1")]
+        self.http_client = get_httpx_client(self.base_url, config.get("http_pool"))
+
         self.client = OpenAI(
             base_url=self.base_url,
-            api_key="ollama"  # Ollama doesn't need an API key but OpenAI client requires one
+            api_key="ollama",  # Ollama doesn't need an API key but OpenAI client requires one
+            http_client=self.http_client,
         )
 
+        # 模型在内存中的保留时间，避免空闲后被卸载导致冷启动
+        self.keep_alive = config.get("keep_alive", "30m")
+        # 保持系统提示词逐字节不变，ollama可以复用上一轮请求的前缀KV缓存
+        self.stable_prefix = config.get("stable_prefix", True)
+        self.last_system_prompt = None
+        self.last_request_time = 0.0
+        self.keep_warm_interval = int(config.get("keep_warm_interval", 0) or 0)
+        self.keep_warm_pinger = None
+        if self.keep_warm_interval > 0:
+            self.keep_warm_pinger = KeepWarmPinger(self, self.keep_warm_interval)
+
+    def _before_request(self, dialogue):
+        self.last_request_time = time.time()
+        if dialogue and dialogue[0]["role"] == "system":
+            self.last_system_prompt = dialogue[0]["content"]
+
+    def _extra_body(self):
+        if self.keep_alive is None:
+            return None
+        return {"keep_alive": self.keep_alive}
+
+    def keep_warm(self):
+        """保温：刷新模型的keep_alive，空闲时用系统提示词预热前缀缓存"""
+        # 不带prompt的generate请求只会加载模型并刷新keep_alive，不影响已有的KV缓存
+        payload = {"model": self.model_name}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        self.http_client.post(
+            f"{self.native_url}/api/generate", json=payload
+        ).raise_for_status()
+
+        # 正在对话时不预热，避免覆盖当前会话的缓存
+        idle = time.time() - self.last_request_time >= self.keep_warm_interval
+        if idle and self.last_system_prompt:
+            self.client.chat.completions.create(
+                model=self.model_name,
+                messages=[{"role": "system", "content": self.last_system_prompt}],
+                max_tokens=1,
+                extra_body=self._extra_body(),
+            )
+        logger.bind(tag=TAG).debug(f"Ollama模型保温完成: {self.model_name}")
+
     def response(self, session_id, dialogue):
         try:
+            self._before_request(dialogue)
             responses = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=dialogue,
-                stream=True
+                stream=True,
+                extra_body=self._extra_body(),
             )
             is_active=True
             for chunk in responses:
@@ -51,11 +102,13 @@ class LLMProvider(LLMProviderBase):
 
     def response_with_functions(self, session_id, dialogue, functions=None):
         try:
+            self._before_request(dialogue)
             stream = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=dialogue,
                 stream=True,
                 tools=functions,
+                extra_body=self._extra_body(),
             )
 
             for chunk in stream:
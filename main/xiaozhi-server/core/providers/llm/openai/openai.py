@@ -3,6 +3,7 @@ from openai.types import CompletionUsage
 from config.logger import setup_logging
 from core.utils.util import check_model_key
 from core.providers.llm.base import LLMProviderBase
+from core.utils.http_pool import get_httpx_client
 
 TAG = __name__
 logger = setup_logging()
@@ -27,7 +28,11 @@ class LLMProvider(LLMProviderBase):
         self.max_tokens = max_tokens
 
         check_model_key("LLM", self.api_key)
-        self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url)
+        self.client = openai.OpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=get_httpx_client(self.base_url, config.get("http_pool")),
+        )
 
     def response(self, session_id, dialogue):
         try:
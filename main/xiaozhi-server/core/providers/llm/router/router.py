@@ -0,0 +1,379 @@
+"""
+多LLM路由
+
+把请求发送给首字延迟最低且健康的后端LLM，如果在该后端的p90首字延迟内还没有收到首字，
+再向下一个后端发送一个对冲请求，先返回首字的一方胜出，另一方被取消。
+连续失败的后端会被熔断，冷却一段时间后放行一个试探请求，成功则恢复。
+"""
+
+import re
+import time
+import queue
+import threading
+from collections import deque
+from config.config_loader import load_config
+from config.logger import setup_logging
+from core.providers.llm.base import LLMProviderBase
+from core.utils import llm as llm_utils
+
+TAG = __name__
+logger = setup_logging()
+
+# 各LLM适配器出错时输出的提示文字，例如【OpenAI服务响应异常: ...】
+ERROR_PATTERN = re.compile(r"^【.*(异常|错误|无效|频繁|未正确初始化).*】$", re.S)
+
+
+class LatencyTracker:
+    """记录最近若干次首字延迟，计算分位数"""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def add(self, latency):
+        with self.lock:
+            self.samples.append(latency)
+
+    def percentile(self, p):
+        with self.lock:
+            if not self.samples:
+                return None
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[index]
+
+    def count(self):
+        return len(self.samples)
+
+
+class CircuitBreaker:
+    """熔断器：closed正常，open熔断，half_open放行一个试探请求"""
+
+    def __init__(self, failure_threshold, recovery_time):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.recovery_time:
+                    return False
+                self.state = "half_open"
+                return True
+            # half_open状态下已有试探请求在进行中
+            return False
+
+    def available(self):
+        """只查询是否可用，不改变状态"""
+        with self.lock:
+            if self.state == "open":
+                return time.monotonic() - self.opened_at >= self.recovery_time
+            return self.state == "closed"
+
+    def record_success(self):
+        with self.lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def release(self):
+        """试探请求被取消，没有结果，允许下一个请求继续试探"""
+        with self.lock:
+            if self.state == "half_open":
+                self.state = "open"
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+class Backend:
+    def __init__(self, name, llm, config):
+        self.name = name
+        self.llm = llm
+        self.latency = LatencyTracker(int(config.get("latency_window", 100)))
+        self.breaker = CircuitBreaker(
+            int(config.get("failure_threshold", 3)),
+            float(config.get("recovery_time", 30)),
+        )
+
+
+class Attempt:
+    """一次后端请求，在独立线程中读取后端输出并放入共用队列"""
+
+    def __init__(self, backend, call, output):
+        self.backend = backend
+        self.start = time.monotonic()
+        self.cancelled = threading.Event()
+        self.finished = False
+        # 首字之前收到的空内容，胜出后按顺序补发
+        self.pending = []
+        self._call = call
+        self._output = output
+        threading.Thread(
+            target=self._run, name=f"LLMRouter-{backend.name}", daemon=True
+        ).start()
+
+    def _run(self):
+        try:
+            responses = self._call(self.backend.llm)
+            try:
+                for chunk in responses:
+                    if self.cancelled.is_set():
+                        break
+                    self._output.put((self, "chunk", chunk))
+            finally:
+                close = getattr(responses, "close", None)
+                if close is not None:
+                    close()
+        except Exception as e:
+            self._output.put((self, "error", e))
+            return
+        self._output.put((self, "end", None))
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class LLMProvider(LLMProviderBase):
+    def __init__(self, config):
+        self.config = config
+        # 对冲延迟取当前后端首字延迟的分位数
+        self.hedge_percentile = float(config.get("hedge_percentile", 90))
+        # 样本不足时使用的对冲延迟(秒)
+        self.hedge_initial_delay = float(config.get("hedge_initial_delay", 2))
+        self.hedge_min_delay = float(config.get("hedge_min_delay", 0.3))
+        self.hedge_max_delay = float(config.get("hedge_max_delay", 5))
+        self.min_samples = int(config.get("min_samples", 5))
+        # 同时进行的对冲请求数上限，失败的对冲请求不计入
+        self.max_hedges = int(config.get("max_hedges", 1))
+        # 所有后端都没有返回首字的最长等待时间(秒)
+        self.first_token_timeout = float(config.get("first_token_timeout", 15))
+        # 选中后端后两段输出之间的最长等待时间(秒)
+        self.read_timeout = float(config.get("read_timeout", 120))
+
+        self.backends = []
+        llm_configs = None
+        for item in config.get("backends") or []:
+            if isinstance(item, dict):
+                name = item.get("name") or item.get("type")
+                backend_config = item
+            else:
+                if llm_configs is None:
+                    llm_configs = load_config().get("LLM", {})
+                name = item
+                backend_config = llm_configs.get(name)
+                if backend_config is None:
+                    raise ValueError(f"路由LLM的后端不存在: {name}")
+            backend_type = backend_config.get("type", name)
+            if backend_type == "router":
+                raise ValueError(f"路由LLM的后端不能是路由LLM: {name}")
+            llm = llm_utils.create_instance(backend_type, backend_config)
+            self.backends.append(Backend(name, llm, config))
+        if not self.backends:
+            raise ValueError("路由LLM至少需要配置一个后端backends")
+
+        # 所有后端都保持前缀稳定时，对话才按稳定前缀方式构建
+        self.stable_prefix = all(
+            getattr(b.llm, "stable_prefix", False) for b in self.backends
+        )
+        logger.bind(tag=TAG).info(
+            f"路由LLM后端: {[b.name for b in self.backends]}"
+        )
+
+    def stats(self):
+        """各后端的首字延迟分位数(毫秒)和熔断状态"""
+        result = {}
+        for b in self.backends:
+            p50 = b.latency.percentile(50)
+            p90 = b.latency.percentile(90)
+            result[b.name] = {
+                "p50_ms": None if p50 is None else round(p50 * 1000),
+                "p90_ms": None if p90 is None else round(p90 * 1000),
+                "samples": b.latency.count(),
+                "state": b.breaker.state,
+            }
+        return result
+
+    def _ranked_backends(self):
+        """健康的后端按p50首字延迟排序，没有样本的优先，以便尽快收集延迟数据"""
+        healthy = [b for b in self.backends if b.breaker.available()]
+        if not healthy:
+            # 全部熔断时仍然按顺序尝试，总比直接失败好
+            return list(self.backends)
+
+        def key(b):
+            p50 = b.latency.percentile(50)
+            return -1 if p50 is None else p50
+
+        return sorted(healthy, key=key)
+
+    def _hedge_delay(self, backend):
+        if backend.latency.count() < self.min_samples:
+            delay = self.hedge_initial_delay
+        else:
+            delay = backend.latency.percentile(self.hedge_percentile)
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, delay))
+
+    def _record_failure(self, backend, reason):
+        if backend.breaker.record_failure():
+            logger.bind(tag=TAG).warning(f"LLM后端 {backend.name} 已熔断: {reason}")
+        else:
+            logger.bind(tag=TAG).warning(f"LLM后端 {backend.name} 请求失败: {reason}")
+
+    def _route(self, call, has_token, is_error):
+        output = queue.Queue()
+        candidates = self._ranked_backends()
+        attempts = []
+
+        def launch():
+            while candidates:
+                backend = candidates.pop(0)
+                if backend.breaker.allow() or not any(
+                    b.breaker.available() for b in self.backends
+                ):
+                    attempt = Attempt(backend, call, output)
+                    attempts.append(attempt)
+                    return attempt
+            return None
+
+        winner = None
+        try:
+            start = time.monotonic()
+            hedge_at = start
+            while winner is None:
+                running = [a for a in attempts if not a.finished]
+                if not running:
+                    # 当前请求都失败了，立即切换到下一个后端
+                    attempt = launch()
+                    if attempt is None:
+                        break
+                    hedge_at = time.monotonic() + self._hedge_delay(attempt.backend)
+                    running = [attempt]
+                now = time.monotonic()
+                if now - start >= self.first_token_timeout:
+                    for a in running:
+                        self._record_failure(a.backend, "首字超时")
+                    break
+                can_hedge = len(running) <= self.max_hedges and candidates
+                if can_hedge and now >= hedge_at:
+                    attempt = launch()
+                    if attempt is not None:
+                        hedge_at = now + self._hedge_delay(attempt.backend)
+                        logger.bind(tag=TAG).info(
+                            f"LLM首字超过对冲延迟，发送对冲请求: {attempt.backend.name}"
+                        )
+                wait = start + self.first_token_timeout - now
+                if can_hedge:
+                    wait = min(wait, hedge_at - now)
+                try:
+                    attempt, kind, payload = output.get(timeout=max(0.01, wait))
+                except queue.Empty:
+                    continue
+                if attempt.finished:
+                    continue
+                if kind == "chunk":
+                    if is_error(payload):
+                        attempt.finished = True
+                        attempt.cancel()
+                        self._record_failure(attempt.backend, payload)
+                    elif has_token(payload):
+                        winner = attempt
+                        winner.pending.append(payload)
+                    else:
+                        attempt.pending.append(payload)
+                else:
+                    attempt.finished = True
+                    reason = payload if kind == "error" else "没有返回内容"
+                    self._record_failure(attempt.backend, reason)
+
+            if winner is None:
+                yield None
+                return
+
+            # 先到首字的一方胜出，取消其他请求
+            latency = time.monotonic() - winner.start
+            winner.backend.latency.add(latency)
+            winner.backend.breaker.record_success()
+            for a in attempts:
+                if a is not winner and not a.finished:
+                    # 落败的请求首字延迟至少为已等待的时间，记为样本，避免一直被当作未测量的后端优先选择
+                    a.backend.latency.add(time.monotonic() - a.start)
+                    a.cancel()
+            logger.bind(tag=TAG).debug(
+                f"LLM路由选中 {winner.backend.name}，首字延迟 {latency * 1000:.0f}ms"
+            )
+
+            for chunk in winner.pending:
+                yield chunk
+            while True:
+                try:
+                    attempt, kind, payload = output.get(timeout=self.read_timeout)
+                except queue.Empty:
+                    logger.bind(tag=TAG).error(
+                        f"LLM后端 {winner.backend.name} 超过 {self.read_timeout} 秒没有输出，结束本轮"
+                    )
+                    break
+                if attempt is not winner:
+                    continue
+                if kind == "chunk":
+                    yield payload
+                    continue
+                if kind == "error":
+                    logger.bind(tag=TAG).error(
+                        f"LLM后端 {winner.backend.name} 输出中断: {payload}"
+                    )
+                break
+        finally:
+            for a in attempts:
+                a.cancel()
+                if a is not winner and not a.finished:
+                    a.backend.breaker.release()
+
+    def response(self, session_id, dialogue):
+        def is_error(chunk):
+            return isinstance(chunk, str) and ERROR_PATTERN.match(chunk) is not None
+
+        # 每个请求使用对话的副本，部分适配器会修改传入的对话列表
+        for chunk in self._route(
+            lambda llm: llm.response(session_id, list(dialogue)), bool, is_error
+        ):
+            if chunk is None:
+                yield "【LLM服务响应异常】"
+                return
+            yield chunk
+
+    def response_with_functions(self, session_id, dialogue, functions=None):
+        def has_token(chunk):
+            content, tool_calls = chunk
+            return bool(content) or bool(tool_calls)
+
+        def is_error(chunk):
+            content, tool_calls = chunk
+            return (
+                tool_calls is None
+                and isinstance(content, str)
+                and ERROR_PATTERN.match(content) is not None
+            )
+
+        for chunk in self._route(
+            lambda llm: llm.response_with_functions(
+                session_id, list(dialogue), functions=functions
+            ),
+            has_token,
+            is_error,
+        ):
+            if chunk is None:
+                yield "【LLM服务响应异常】", None
+                return
+            yield chunk
@@ -1,7 +1,10 @@
 from config.logger import setup_logging
 from openai import OpenAI
 import json
+import time
 from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.keep_warm import KeepWarmPinger
+from core.utils.http_pool import get_httpx_client
 
 TAG = __name__
 logger = setup_logging()
@@ -21,16 +24,43 @@ class LLMProvider(LLMProviderBase):
         try:
             self.client = OpenAI(
                 base_url=self.base_url,
-                api_key="xinference"  # Xinference has a similar setup to Ollama where it doesn't need an actual key
+                api_key="xinference",  # Xinference has a similar setup to Ollama where it doesn't need an actual key
+                http_client=get_httpx_client(self.base_url, config.get("http_pool")),
             )
             logger.bind(tag=TAG).info("Xinference client initialized successfully")
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error initializing Xinference client: {e}")
             raise
 
+        # 保持系统提示词逐字节不变，开启前缀缓存的推理引擎（vLLM、SGLang等）可以复用KV缓存
+        self.stable_prefix = config.get("stable_prefix", True)
+        self.last_system_prompt = None
+        self.last_request_time = 0.0
+        self.keep_warm_interval = int(config.get("keep_warm_interval", 0) or 0)
+        self.keep_warm_pinger = None
+        if self.keep_warm_interval > 0:
+            self.keep_warm_pinger = KeepWarmPinger(self, self.keep_warm_interval)
+
+    def _before_request(self, dialogue):
+        self.last_request_time = time.time()
+        if dialogue and dialogue[0]["role"] == "system":
+            self.last_system_prompt = dialogue[0]["content"]
+
+    def keep_warm(self):
+        """保温：空闲时用系统提示词发送一个极短请求，保持模型和前缀缓存处于热状态"""
+        # 正在对话时不需要保温，也避免覆盖当前会话的缓存
+        if time.time() - self.last_request_time < self.keep_warm_interval:
+            return
+        messages = [{"role": "system", "content": self.last_system_prompt or ""}]
+        self.client.chat.completions.create(
+            model=self.model_name, messages=messages, max_tokens=1
+        )
+        logger.bind(tag=TAG).debug(f"Xinference模型保温完成: {self.model_name}")
+
     def response(self, session_id, dialogue):
         try:
             logger.bind(tag=TAG).debug(f"Sending request to Xinference with model: {self.model_name}, dialogue length: {len(dialogue)}")
+            self._before_request(dialogue)
             responses = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=dialogue,
@@ -62,7 +92,8 @@ class LLMProvider(LLMProviderBase):
             logger.bind(tag=TAG).debug(f"Sending function call request to Xinference with model: {self.model_name}, dialogue length: {len(dialogue)}")
             if functions:
                 logger.bind(tag=TAG).debug(f"Function calls enabled with: {[f.get('function', {}).get('name') for f in functions]}")
-                
+            self._before_request(dialogue)
+
             stream = self.client.chat.completions.create(
                 model=self.model_name,
                 messages=dialogue,
@@ -11,8 +11,12 @@ class MemoryProviderBase(ABC):
         self.llm = None
 
     @abstractmethod
-    async def save_memory(self, msgs):
-        """Save a new memory for specific role and return memory ID"""
+    async def save_memory(self, msgs, role_id=None, llm=None):
+        """Save a new memory for specific role and return memory ID
+
+        role_id/llm 未传入时使用init_memory设置的值；后台总结时显式传入，
+        不修改实例上的状态，多个设备可以共用同一个实例
+        """
         print("this is base func", msgs)
 
     @abstractmethod
@@ -20,6 +24,10 @@ class MemoryProviderBase(ABC):
         """Query memories for specific role based on similarity"""
         return "please implement query method"
 
+    async def prefetch_memory(self, role_id):
+        """连接建立时预取记忆，需要时由具体的记忆模块实现"""
+        return None
+
     def init_memory(self, role_id, llm):
         self.role_id = role_id    
         self.llm = llm
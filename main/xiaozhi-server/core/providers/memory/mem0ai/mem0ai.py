@@ -1,17 +1,58 @@
+import time
+import asyncio
+import threading
 import traceback
+from collections import OrderedDict
 
 from ..base import MemoryProviderBase, logger
 from mem0 import MemoryClient
 from core.utils.util import check_model_key
+from core.utils.embedding import HashingEmbedder
+
+try:
+    from mem0 import AsyncMemoryClient
+except ImportError:
+    AsyncMemoryClient = None
 
 TAG = __name__
 
+# 设备的记忆缓存在进程内共享，连接断开后仍保留，设备重连时可以直接复用，
+# 键为 (api_key, 设备ID)，按最近使用淘汰
+_device_caches = OrderedDict()
+_device_caches_lock = threading.Lock()
+# 正在后台刷新查询结果的设备，同一设备同时只刷新一次
+_refreshing = set()
+
+
+class DeviceMemoryCache:
+    """一个设备最近的记忆查询结果，以及连接建立时预取的全部记忆"""
+
+    __slots__ = ("queries", "snapshot", "snapshot_time")
+
+    def __init__(self):
+        # [(问题向量, 查询结果, 查询时间)]
+        self.queries = []
+        # [(记忆向量, 更新时间, 格式化后的记忆)]
+        self.snapshot = None
+        self.snapshot_time = 0.0
+
 
 class MemoryProvider(MemoryProviderBase):
     def __init__(self, config):
         super().__init__(config)
         self.api_key = config.get("api_key", "")
         self.api_version = config.get("api_version", "v1.1")
+        # 查询结果缓存时间，单位秒
+        self.cache_ttl = float(config.get("cache_ttl", 120))
+        # 与缓存中的问题相似度不低于该值时直接复用查询结果
+        self.cache_similarity = float(config.get("cache_similarity", 0.8))
+        self.cache_queries = int(config.get("cache_queries", 8))
+        # 没有可复用的查询结果时，从预取的记忆中取与问题最相似的几条，都不相似时再查询
+        self.snapshot_top_k = int(config.get("snapshot_top_k", 5))
+        self.snapshot_min_score = float(config.get("snapshot_min_score", 0.25))
+        self.cache_devices = int(config.get("cache_devices", 1000))
+        self.embedder = HashingEmbedder(256)
+        self.async_client = None
         have_key = check_model_key("Mem0ai", self.api_key)
         if not have_key:
             self.use_mem0 = False
@@ -20,15 +61,38 @@ class MemoryProvider(MemoryProviderBase):
             self.use_mem0 = True
         try:
             self.client = MemoryClient(api_key=self.api_key)
+            if AsyncMemoryClient is not None:
+                self.async_client = AsyncMemoryClient(api_key=self.api_key)
             logger.bind(tag=TAG).info("成功连接到 Mem0ai 服务")
         except Exception as e:
             logger.bind(tag=TAG).error(f"连接到 Mem0ai 服务时发生错误: {str(e)}")
             logger.bind(tag=TAG).error(f"详细错误: {traceback.format_exc()}")
             self.use_mem0 = False
 
-    async def save_memory(self, msgs):
+    def _device_cache(self, role_id):
+        """调用方需持有 _device_caches_lock"""
+        key = (self.api_key, role_id)
+        entry = _device_caches.get(key)
+        if entry is None:
+            entry = DeviceMemoryCache()
+            _device_caches[key] = entry
+            while len(_device_caches) > self.cache_devices:
+                _device_caches.popitem(last=False)
+        _device_caches.move_to_end(key)
+        return entry
+
+    async def _call(self, method, *args, **kwargs):
+        """优先使用异步客户端，没有时在线程池中调用同步客户端，不阻塞事件循环"""
+        if self.async_client is not None:
+            return await getattr(self.async_client, method)(*args, **kwargs)
+        return await asyncio.to_thread(
+            getattr(self.client, method), *args, **kwargs
+        )
+
+    async def save_memory(self, msgs, role_id=None, llm=None):
         if not self.use_mem0:
             return None
+        role_id = role_id if role_id is not None else self.role_id
         if len(msgs) < 2:
             return None
 
@@ -39,47 +103,154 @@ class MemoryProvider(MemoryProviderBase):
                 for message in msgs
                 if message.role != "system"
             ]
-            result = self.client.add(
-                messages, user_id=self.role_id, output_format=self.api_version
+            # 记忆总结在后台线程自己的事件循环中执行，这里使用同步客户端
+            result = await asyncio.to_thread(
+                self.client.add,
+                messages,
+                user_id=role_id,
+                output_format=self.api_version,
             )
+            # 记忆已变化，丢弃该设备缓存的查询结果
+            with _device_caches_lock:
+                _device_caches.pop((self.api_key, role_id), None)
             logger.bind(tag=TAG).debug(f"Save memory result: {result}")
         except Exception as e:
             logger.bind(tag=TAG).error(f"保存记忆失败: {str(e)}")
             return None
 
+    async def prefetch_memory(self, role_id):
+        """连接建立时预取设备的全部记忆，第一轮对话不需要等待查询"""
+        if not self.use_mem0 or role_id is None:
+            return
+        try:
+            results = await self._call(
+                "get_all", user_id=role_id, output_format=self.api_version
+            )
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"预取记忆失败: {str(e)}")
+            return
+        snapshot = [
+            (self.embedder.encode(memory), timestamp, line)
+            for timestamp, line, memory in self._parse_results(results)
+        ]
+        with _device_caches_lock:
+            entry = self._device_cache(role_id)
+            entry.snapshot = snapshot
+            entry.snapshot_time = time.monotonic()
+        logger.bind(tag=TAG).debug(f"已预取设备 {role_id} 的记忆")
+
+    async def _search(self, role_id, query, vector):
+        results = await self._call(
+            "search", query, user_id=role_id, output_format=self.api_version
+        )
+        memories_str = self._format_results(results)
+        with _device_caches_lock:
+            entry = self._device_cache(role_id)
+            entry.queries.append((vector, memories_str, time.monotonic()))
+            del entry.queries[: -self.cache_queries]
+        return memories_str
+
+    async def _refresh(self, role_id, query, vector):
+        try:
+            await self._search(role_id, query, vector)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"查询记忆失败: {str(e)}")
+        finally:
+            with _device_caches_lock:
+                _refreshing.discard((self.api_key, role_id))
+
+    def _lookup(self, role_id, vector, now):
+        with _device_caches_lock:
+            entry = _device_caches.get((self.api_key, role_id))
+            if entry is None:
+                return None, None
+            entry.queries = [
+                q for q in entry.queries if now - q[2] < self.cache_ttl
+            ]
+            queries, snapshot_time = entry.queries, entry.snapshot_time
+            snapshot = entry.snapshot
+        best, best_score = None, self.cache_similarity
+        for cached_vector, memories_str, _ in queries:
+            score = float(cached_vector @ vector)
+            if score >= best_score:
+                best, best_score = memories_str, score
+        if snapshot is not None and now - snapshot_time >= self.cache_ttl:
+            snapshot = None
+        return best, snapshot
+
+    def _snapshot_top(self, snapshot, vector):
+        """预取的记忆中与问题最相似的top_k条，按更新时间从新到旧排列；没有足够相似的记忆时返回None"""
+        scored = [
+            (float(memory_vector @ vector), timestamp, line)
+            for memory_vector, timestamp, line in snapshot
+        ]
+        scored = [m for m in scored if m[0] >= self.snapshot_min_score]
+        if not scored:
+            return None
+        scored.sort(key=lambda m: m[0], reverse=True)
+        top = sorted(scored[: self.snapshot_top_k], key=lambda m: m[1], reverse=True)
+        return "\n".join(f"- {line}" for _, _, line in top)
+
     async def query_memory(self, query: str) -> str:
         if not self.use_mem0:
             return ""
-        try:
-            results = self.client.search(
-                query, user_id=self.role_id, output_format=self.api_version
-            )
-            if not results or "results" not in results:
+        role_id = self.role_id
+        vector = self.embedder.encode(query or "")
+        cached, snapshot = self._lookup(role_id, vector, time.monotonic())
+        if cached is not None:
+            logger.bind(tag=TAG).debug(f"使用缓存的记忆查询结果: {query}")
+            return cached
+        if snapshot is not None:
+            if not snapshot:
+                # 设备还没有任何记忆
                 return ""
-
-            # Format each memory entry with its update time up to minutes
-            memories = []
-            for entry in results["results"]:
-                timestamp = entry.get("updated_at", "")
-                if timestamp:
-                    try:
-                        # Parse and reformat the timestamp
-                        dt = timestamp.split(".")[0]  # Remove milliseconds
-                        formatted_time = dt.replace("T", " ")
-                    except:
-                        formatted_time = timestamp
-                memory = entry.get("memory", "")
-                if timestamp and memory:
-                    # Store tuple of (timestamp, formatted_string) for sorting
-                    memories.append((timestamp, f"[{formatted_time}] {memory}"))
-
-            # Sort by timestamp in descending order (newest first)
-            memories.sort(key=lambda x: x[0], reverse=True)
-
-            # Extract only the formatted strings
-            memories_str = "\n".join(f"- {memory[1]}" for memory in memories)
-            logger.bind(tag=TAG).debug(f"Query results: {memories_str}")
-            return memories_str
+            memories_str = self._snapshot_top(snapshot, vector)
+            if memories_str is not None:
+                # 先返回预取记忆中相关的几条，后台查询本轮问题，供之后相似的问题使用
+                key = (self.api_key, role_id)
+                with _device_caches_lock:
+                    refresh = key not in _refreshing
+                    _refreshing.add(key)
+                if refresh:
+                    asyncio.create_task(self._refresh(role_id, query, vector))
+                return memories_str
+        try:
+            return await self._search(role_id, query, vector)
         except Exception as e:
             logger.bind(tag=TAG).error(f"查询记忆失败: {str(e)}")
             return ""
+
+    def _parse_results(self, results):
+        """返回 [(更新时间, 带时间的记忆, 记忆)]，按更新时间从新到旧排列"""
+        if isinstance(results, list):
+            results = {"results": results}
+        if not results or "results" not in results:
+            return []
+
+        # Format each memory entry with its update time up to minutes
+        memories = []
+        for entry in results["results"]:
+            timestamp = entry.get("updated_at", "")
+            if timestamp:
+                try:
+                    # Parse and reformat the timestamp
+                    dt = timestamp.split(".")[0]  # Remove milliseconds
+                    formatted_time = dt.replace("T", " ")
+                except:
+                    formatted_time = timestamp
+            memory = entry.get("memory", "")
+            if timestamp and memory:
+                # Store tuple of (timestamp, formatted_string, memory) for sorting
+                memories.append((timestamp, f"[{formatted_time}] {memory}", memory))
+
+        # Sort by timestamp in descending order (newest first)
+        memories.sort(key=lambda x: x[0], reverse=True)
+        return memories
+
+    def _format_results(self, results):
+        # Extract only the formatted strings
+        memories_str = "\n".join(
+            f"- {memory[1]}" for memory in self._parse_results(results)
+        )
+        logger.bind(tag=TAG).debug(f"Query results: {memories_str}")
+        return memories_str
@@ -2,8 +2,11 @@ from ..base import MemoryProviderBase, logger
 import time
 import json
 import os
-import yaml
+import re
 from config.config_loader import get_project_dir
+from core.utils.context_window import estimate_tokens
+from ..store import get_memory_store
+from ..memory_patch import memory_patch_prompt, load_memory_json, digest, apply_patch
 
 
 short_term_memory_prompt = """
@@ -96,7 +99,14 @@ class MemoryProvider(MemoryProviderBase):
     def __init__(self, config):
         super().__init__(config)
         self.short_momery = ""
+        # 旧版所有设备共用的yaml文件，第一次启动时自动导入到数据库
         self.memory_path = get_project_dir() + "data/.memory.yaml"
+        db_path = config.get("db_path") or "data/.memory.db"
+        if not os.path.isabs(db_path):
+            db_path = get_project_dir() + db_path
+        self.store = get_memory_store(db_path, self.memory_path)
+        # 增量模式：只发送本次会话的对话和压缩后的记忆，由LLM返回JSON Patch
+        self.incremental = config.get("incremental", False)
         self.load_memory()
 
     def init_memory(self, role_id, llm):
@@ -104,57 +114,110 @@ class MemoryProvider(MemoryProviderBase):
         self.load_memory()
 
     def load_memory(self):
-        all_memory = {}
-        if os.path.exists(self.memory_path):
-            with open(self.memory_path, "r", encoding="utf-8") as f:
-                all_memory = yaml.safe_load(f) or {}
-        if self.role_id in all_memory:
-            self.short_momery = all_memory[self.role_id]
+        self.short_momery = self.store.get(self.role_id)
 
     def save_memory_to_file(self):
-        all_memory = {}
-        if os.path.exists(self.memory_path):
-            with open(self.memory_path, "r", encoding="utf-8") as f:
-                all_memory = yaml.safe_load(f) or {}
-        all_memory[self.role_id] = self.short_momery
-        with open(self.memory_path, "w", encoding="utf-8") as f:
-            yaml.dump(all_memory, f, allow_unicode=True)
-
-    async def save_memory(self, msgs):
-        if self.llm is None:
-            logger.bind(tag=TAG).error("LLM is not set for memory provider")
-            return None
-
-        if len(msgs) < 2:
-            return None
+        self.store.put(self.role_id, self.short_momery)
 
+    def _format_messages(self, msgs):
         msgStr = ""
         for msg in msgs:
             if msg.role == "user":
                 msgStr += f"User: {msg.content}\n"
             elif msg.role == "assistant":
                 msgStr += f"Assistant: {msg.content}\n"
-        if len(self.short_momery) > 0:
+        return msgStr
+
+    def _full_input(self, msgs, time_str, short_memory):
+        msgStr = self._format_messages(msgs)
+        if len(short_memory) > 0:
             msgStr += "历史记忆：\n"
-            msgStr += self.short_momery
+            msgStr += short_memory
+        msgStr += f"当前时间：{time_str}"
+        return msgStr
+
+    def _save_incremental(self, msgs, time_str, role_id, llm, short_memory):
+        """只发送本次会话的对话和压缩后的记忆，合并LLM返回的JSON Patch；失败时返回None
+
+        记忆在会话结束时总结一次，已有记忆里只有之前会话的内容，
+        所以本次会话的全部对话都是新对话
+        """
+        new_msgs = [m for m in msgs if m.role in ("user", "assistant")]
+        if not any(m.role == "user" for m in new_msgs):
+            return short_memory
+        try:
+            memory = load_memory_json(short_memory)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"已有记忆无法解析，改用全量总结: {e}")
+            return None
+
+        msgStr = f"当前记忆：{digest(memory)}\n新的对话：\n"
+        msgStr += self._format_messages(new_msgs)
+        msgStr += f"当前时间：{time_str}"
+        full_tokens = estimate_tokens(short_term_memory_prompt) + estimate_tokens(
+            self._full_input(msgs, time_str, short_memory)
+        )
+        incremental_tokens = estimate_tokens(memory_patch_prompt) + estimate_tokens(
+            msgStr
+        )
+        logger.bind(tag=TAG).info(
+            f"记忆增量更新 - Role: {role_id}, 输入token（估算）："
+            f"全量 {full_tokens}，增量 {incremental_tokens}"
+        )
+
+        result = llm.response_no_stream(memory_patch_prompt, msgStr)
+        try:
+            patch_str = extract_json_data(result) or result
+            match = re.search(r"\[.*\]", patch_str, re.DOTALL)
+            patch = json.loads(match.group(0) if match else patch_str)
+            memory = apply_patch(memory, patch)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"记忆增量更新失败，改用全量总结: {e}")
+            return None
+        return json.dumps(memory, ensure_ascii=False)
+
+    def _store_memory(self, role_id, short_memory):
+        self.store.put(role_id, short_memory)
+        # 总结的是当前连接的设备时同步更新，其他设备的记忆只写入数据库
+        if role_id == self.role_id:
+            self.short_momery = short_memory
+        logger.bind(tag=TAG).info(f"Save memory successful - Role: {role_id}")
+        return short_memory
+
+    async def save_memory(self, msgs, role_id=None, llm=None):
+        role_id = role_id if role_id is not None else self.role_id
+        llm = llm or self.llm
+        if llm is None:
+            logger.bind(tag=TAG).error("LLM is not set for memory provider")
+            return None
+
+        if len(msgs) < 2:
+            return None
 
         # 当前时间
         time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        msgStr += f"当前时间：{time_str}"
+        # 从数据库读取，不依赖实例上当前加载的是哪个设备的记忆
+        short_memory = self.store.get(role_id)
+
+        if self.incremental:
+            result = self._save_incremental(
+                msgs, time_str, role_id, llm, short_memory
+            )
+            if result is not None:
+                return self._store_memory(role_id, result)
 
-        result = self.llm.response_no_stream(short_term_memory_prompt, msgStr)
+        msgStr = self._full_input(msgs, time_str, short_memory)
+
+        result = llm.response_no_stream(short_term_memory_prompt, msgStr)
 
         json_str = extract_json_data(result)
         try:
             json_data = json.loads(json_str)  # 检查json格式是否正确
-            self.short_momery = json_str
+            short_memory = json_str
         except Exception as e:
             print("Error:", e)
 
-        self.save_memory_to_file()
-        logger.bind(tag=TAG).info(f"Save memory successful - Role: {self.role_id}")
-
-        return self.short_momery
+        return self._store_memory(role_id, short_memory)
 
     async def query_memory(self, query: str) -> str:
         return self.short_momery
@@ -0,0 +1,118 @@
+"""
+本地向量记忆
+
+会话结束时由LLM从对话中提取关于用户的事实，每条事实用本地CPU向量模型向量化后保存到
+本地向量索引；每轮对话按用户的问题查询最相关的几条记忆。数据不会上传到服务器。
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+from ..base import MemoryProviderBase, logger
+from ..vector_index import get_vector_index
+from config.config_loader import get_project_dir
+from core.utils.embedding import get_embedder
+
+TAG = __name__
+
+fact_extraction_prompt = """
+你是记忆提取助手。从对话中提取关于user的、以后聊天时有用的事实，例如名字、喜好、家人、计划、重要经历。
+- 每条事实是一句简短完整的话，以“用户”开头，例如“用户的名字叫小明”“用户喜欢恐龙”
+- 只从对话中提取，不要猜测，不要记录助手说的话
+- 只输出JSON字符串数组，没有值得记录的事实时输出[]
+"""
+
+
+class MemoryProvider(MemoryProviderBase):
+    def __init__(self, config):
+        super().__init__(config)
+        # 向量模型按配置在进程内共用，每个连接的记忆实例不再重复加载
+        self.embedder = get_embedder(config)
+        dim = int(self.embedder.encode("测试").shape[0])
+        data_dir = config.get("data_dir") or "data/memory_vector"
+        if not os.path.isabs(data_dir):
+            data_dir = get_project_dir() + data_dir
+        self.index = get_vector_index(
+            data_dir,
+            dim,
+            cache_devices=int(config.get("cache_devices", 1000)),
+            compact_ratio=float(config.get("compact_ratio", 0.3)),
+        )
+        # 每轮对话返回的记忆条数，以及最低相似度
+        self.top_k = int(config.get("top_k", 5))
+        self.min_score = float(config.get("min_score", 0.3))
+        # 与已有记忆相似度不低于该值时视为同一事实的更新，替换旧的记忆
+        self.duplicate_score = float(config.get("duplicate_score", 0.85))
+        # 每个设备最多保存的记忆条数，超出时删除最早的记忆
+        self.max_facts = int(config.get("max_facts_per_device", 200))
+
+    def _extract_facts(self, msgs, llm):
+        msgStr = ""
+        for msg in msgs:
+            if msg.role == "user":
+                msgStr += f"User: {msg.content}\n"
+            elif msg.role == "assistant":
+                msgStr += f"Assistant: {msg.content}\n"
+        result = llm.response_no_stream(fact_extraction_prompt, msgStr)
+        match = re.search(r"\[.*\]", result or "", re.DOTALL)
+        if match is None:
+            raise ValueError(f"无法解析记忆提取结果: {result}")
+        facts = json.loads(match.group(0))
+        return [f.strip() for f in facts if isinstance(f, str) and f.strip()]
+
+    async def save_memory(self, msgs, role_id=None, llm=None):
+        role_id = role_id if role_id is not None else self.role_id
+        llm = llm or self.llm
+        if llm is None:
+            logger.bind(tag=TAG).error("LLM is not set for memory provider")
+            return None
+        if len(msgs) < 2 or role_id is None:
+            return None
+
+        try:
+            facts = self._extract_facts(msgs, llm)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"提取记忆失败: {e}")
+            return None
+        if not facts:
+            return None
+
+        role_id = str(role_id)
+        vectors = [self.embedder.encode(f) for f in facts]
+        existing, matrix = self.index.facts_with_vectors(role_id)
+        replaced = []
+        if matrix is not None:
+            # 与已有记忆高度相似时替换旧的记忆，例如名字、喜好发生变化
+            for vector in vectors:
+                scores = matrix @ vector
+                i = int(scores.argmax())
+                if scores[i] >= self.duplicate_score and existing.ids[i] not in replaced:
+                    replaced.append(existing.ids[i])
+        overflow = len(existing.ids) - len(replaced) + len(facts) - self.max_facts
+        if overflow > 0:
+            oldest = [i for i in existing.ids if i not in replaced][:overflow]
+            replaced.extend(oldest)
+        self.index.add(role_id, facts, vectors)
+        self.index.delete(role_id, replaced)
+        logger.bind(tag=TAG).info(
+            f"Save memory successful - Role: {role_id}, 新增 {len(facts)} 条，替换 {len(replaced)} 条"
+        )
+        return facts
+
+    def _search(self, role_id, query):
+        return self.index.search(
+            role_id, self.embedder.encode(query), self.top_k, self.min_score
+        )
+
+    async def query_memory(self, query: str) -> str:
+        if self.role_id is None or not query:
+            return ""
+        # 向量化、读取SQLite和矩阵乘法都在线程池中进行，不阻塞事件循环
+        results = await asyncio.to_thread(self._search, str(self.role_id), query)
+        memories = [
+            f"- [{time.strftime('%Y-%m-%d %H:%M', time.localtime(created_at))}] {text}"
+            for _, text, created_at in results
+        ]
+        return "\n".join(memories)
@@ -0,0 +1,160 @@
+"""
+记忆增量更新
+
+全量总结每次都要把完整对话和完整记忆发给LLM。增量模式只发送上次总结之后的新对话和压缩后的记忆，
+LLM返回JSON Patch（RFC 6902的add/replace/remove子集），在本地合并并按记忆结构校验。
+"""
+
+import copy
+import json
+
+# 记忆的基本结构，与short_term_memory_prompt中的格式一致
+EMPTY_MEMORY = {
+    "时空档案": {"身份图谱": {"现用名": "", "特征标记": []}, "记忆立方": []},
+    "关系网络": {"高频话题": {}, "暗线联系": []},
+    "待响应": {"紧急事项": [], "潜在关怀": []},
+    "高光语录": [],
+}
+
+# 路径 -> 类型，合并后的记忆必须满足
+MEMORY_SCHEMA = {
+    ("时空档案",): dict,
+    ("时空档案", "身份图谱"): dict,
+    ("时空档案", "身份图谱", "特征标记"): list,
+    ("时空档案", "记忆立方"): list,
+    ("关系网络",): dict,
+    ("关系网络", "高频话题"): dict,
+    ("关系网络", "暗线联系"): list,
+    ("待响应",): dict,
+    ("待响应", "紧急事项"): list,
+    ("待响应", "潜在关怀"): list,
+    ("高光语录",): list,
+}
+
+memory_patch_prompt = """
+你是记忆维护助手。根据新的对话，更新user的记忆。只输出JSON Patch数组，不要解释。
+- 操作只能是add、replace、remove，path使用JSON Pointer，例如"/时空档案/身份图谱/现用名"
+- 向列表末尾追加用"/列表路径/-"，例如{"op": "add", "path": "/高光语录/-", "value": "user的原话"}
+- 只记录新对话中出现的重要信息，没有需要更新的内容时输出[]
+- 记忆总字数接近900时，用remove删除不重要或过期的条目
+记忆结构：时空档案{身份图谱{现用名,特征标记[]},记忆立方[{事件,时间戳,情感值,关联项[],保鲜期}]}，
+关系网络{高频话题{话题:次数},暗线联系[]}，待响应{紧急事项[],潜在关怀[]}，高光语录[]
+"""
+
+
+class PatchError(ValueError):
+    pass
+
+
+def load_memory_json(text):
+    """解析已有记忆，缺少的部分用基本结构补全"""
+    memory = copy.deepcopy(EMPTY_MEMORY)
+    if not text:
+        return memory
+    data = json.loads(text)
+    if not isinstance(data, dict):
+        raise PatchError("记忆不是JSON对象")
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(memory.get(key), dict):
+            memory[key].update(value)
+        else:
+            memory[key] = value
+    return memory
+
+
+def digest(memory):
+    """压缩后的记忆，去掉空值和多余空白"""
+
+    def prune(value):
+        if isinstance(value, dict):
+            pruned = {k: prune(v) for k, v in value.items()}
+            return {k: v for k, v in pruned.items() if v not in ("", [], {}, None)}
+        if isinstance(value, list):
+            return [prune(v) for v in value if v not in ("", [], {}, None)]
+        return value
+
+    return json.dumps(prune(memory), ensure_ascii=False, separators=(",", ":"))
+
+
+def _parse_path(path):
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise PatchError(f"无效的路径: {path}")
+    return [p.replace("~1", "/").replace("~0", "~") for p in path[1:].split("/")]
+
+
+def _resolve(doc, parts):
+    target = doc
+    for part in parts:
+        if isinstance(target, dict):
+            target = target.setdefault(part, {})
+        elif isinstance(target, list):
+            try:
+                target = target[int(part)]
+            except (ValueError, IndexError):
+                raise PatchError(f"列表下标无效: {part}")
+        else:
+            raise PatchError(f"路径无法访问: {part}")
+    return target
+
+
+def apply_patch(memory, patch):
+    """在记忆副本上应用JSON Patch，返回新的记忆"""
+    if not isinstance(patch, list):
+        raise PatchError("JSON Patch必须是数组")
+    doc = copy.deepcopy(memory)
+    for op in patch:
+        if not isinstance(op, dict):
+            raise PatchError(f"无效的操作: {op}")
+        name = op.get("op")
+        parts = _parse_path(op.get("path"))
+        parent, key = _resolve(doc, parts[:-1]), parts[-1]
+        if name in ("add", "replace"):
+            if "value" not in op:
+                raise PatchError(f"缺少value: {op}")
+            value = op["value"]
+            if isinstance(parent, dict):
+                parent[key] = value
+            elif isinstance(parent, list):
+                if key == "-":
+                    parent.append(value)
+                else:
+                    try:
+                        index = int(key)
+                    except ValueError:
+                        raise PatchError(f"列表下标无效: {key}")
+                    if name == "add":
+                        parent.insert(index, value)
+                    elif 0 <= index < len(parent):
+                        parent[index] = value
+                    else:
+                        raise PatchError(f"列表下标越界: {key}")
+            else:
+                raise PatchError(f"路径无法写入: {op['path']}")
+        elif name == "remove":
+            try:
+                if isinstance(parent, dict):
+                    del parent[key]
+                elif isinstance(parent, list):
+                    del parent[int(key)]
+                else:
+                    raise PatchError(f"路径无法删除: {op['path']}")
+            except (KeyError, ValueError, IndexError):
+                raise PatchError(f"要删除的路径不存在: {op['path']}")
+        else:
+            raise PatchError(f"不支持的操作: {name}")
+    validate(doc)
+    return doc
+
+
+def validate(memory):
+    """按MEMORY_SCHEMA检查记忆结构"""
+    if not isinstance(memory, dict):
+        raise PatchError("记忆不是JSON对象")
+    for path, expected in MEMORY_SCHEMA.items():
+        value = memory
+        for key in path:
+            if not isinstance(value, dict) or key not in value:
+                raise PatchError(f"记忆缺少字段: {'/'.join(path)}")
+            value = value[key]
+        if not isinstance(value, expected):
+            raise PatchError(f"记忆字段类型错误: {'/'.join(path)}")
@@ -9,7 +9,7 @@ class MemoryProvider(MemoryProviderBase):
     def __init__(self, config):
         super().__init__(config)
       
-    async def save_memory(self, msgs):
+    async def save_memory(self, msgs, role_id=None, llm=None):
         logger.bind(tag=TAG).debug("nomem mode: No memory saving is performed.")
         return None
 
@@ -0,0 +1,130 @@
+"""
+按设备存储的记忆库
+
+每个设备（role_id）一行，保存在SQLite中（WAL模式）：
+- 读取单个设备的记忆走主键索引，不需要加载其他设备的数据
+- 写入是单条语句的事务，多个连接同时断开也不会互相覆盖
+- WAL模式下读写互不阻塞，多个工作进程可以共用同一个数据库文件
+
+旧版本的 data/.memory.yaml 在第一次打开数据库时自动导入，也可以手动迁移：
+    python -m core.providers.memory.store data/.memory.yaml data/.memory.db
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+import yaml
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class MemoryStore:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS memory ("
+            "role_id TEXT PRIMARY KEY, content TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        db.commit()
+
+    def _db(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def get(self, role_id):
+        """读取一个设备的记忆，不存在时返回空字符串"""
+        if role_id is None:
+            return ""
+        row = (
+            self._db()
+            .execute("SELECT content FROM memory WHERE role_id = ?", (str(role_id),))
+            .fetchone()
+        )
+        return row[0] if row else ""
+
+    def put(self, role_id, content):
+        """原子地写入一个设备的记忆"""
+        db = self._db()
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO memory (role_id, content, updated_at) VALUES (?, ?, ?)",
+                (str(role_id), content or "", time.time()),
+            )
+
+    def put_many(self, items):
+        """在一个事务中写入多个设备的记忆，用于迁移"""
+        now = time.time()
+        db = self._db()
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO memory (role_id, content, updated_at) VALUES (?, ?, ?)",
+                ((str(k), v or "", now) for k, v in items),
+            )
+
+    def count(self):
+        return self._db().execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+
+    def migrate_yaml(self, yaml_path, force=False):
+        """导入旧版 .memory.yaml，已导入过的文件不会重复导入，返回导入的设备数"""
+        if not os.path.exists(yaml_path):
+            return 0
+        db = self._db()
+        key = f"migrated:{os.path.abspath(yaml_path)}"
+        if not force and db.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+            return 0
+        with open(yaml_path, "r", encoding="utf-8") as f:
+            all_memory = yaml.safe_load(f) or {}
+        items = [(k, v) for k, v in all_memory.items() if isinstance(v, str)]
+        self.put_many(items)
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (key, str(time.time())),
+            )
+        logger.bind(tag=TAG).info(f"已从 {yaml_path} 导入 {len(items)} 个设备的记忆")
+        return len(items)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_memory_store(path, legacy_yaml_path=None):
+    """同一个数据库文件在进程内只打开一次，第一次打开时导入旧版yaml记忆"""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = MemoryStore(path)
+            if legacy_yaml_path:
+                try:
+                    store.migrate_yaml(legacy_yaml_path)
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"导入旧版记忆失败: {e}")
+            _stores[path] = store
+        return store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("用法: python -m core.providers.memory.store <旧版.memory.yaml> <记忆数据库.db>")
+        sys.exit(1)
+    count = MemoryStore(sys.argv[2]).migrate_yaml(sys.argv[1], force=True)
+    print(f"已导入 {count} 个设备的记忆到 {sys.argv[2]}")
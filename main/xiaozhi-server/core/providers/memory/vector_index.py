@@ -0,0 +1,284 @@
+"""
+本地向量记忆索引
+
+所有设备的记忆向量保存在一个内存映射的float16矩阵文件中，每条记忆占一行，
+记忆文本、所属设备和行号保存在SQLite中。
+- 查询只读取该设备所在的行，用numpy矩阵乘法计算相似度，常驻内存的只有操作系统缓存的页面
+  和最近使用设备的行号列表
+- 删除的记忆只在SQLite中删除，矩阵中的行留作空洞；空洞比例过高时在后台压缩，
+  同一设备的记忆重新排列到相邻的行，减少查询时读取的页面。压缩时复制向量不持有锁，
+  只在最后替换矩阵和行号时加锁，期间有新增或删除时重新压缩
+同一个索引目录只能由一个服务进程使用。
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class DeviceFacts:
+    __slots__ = ("ids", "rows", "texts", "times")
+
+    def __init__(self, records):
+        self.ids = [r[0] for r in records]
+        self.rows = np.array([r[1] for r in records], dtype=np.int64)
+        self.texts = [r[2] for r in records]
+        self.times = [r[3] for r in records]
+
+
+class VectorIndex:
+    def __init__(self, directory, dim, cache_devices=1000, compact_ratio=0.3):
+        os.makedirs(directory, exist_ok=True)
+        self.dim = dim
+        self.db_path = os.path.join(directory, "facts.db")
+        self.directory = directory
+        # 最多缓存行号列表的设备数，限制常驻内存
+        self.cache_devices = cache_devices
+        # 空洞行占比超过该值时后台压缩
+        self.compact_ratio = compact_ratio
+        self.local = threading.local()
+        self.lock = threading.RLock()
+        self.cache = OrderedDict()
+        self.compacting = False
+        # 每次新增、删除或压缩后加一，压缩完成时据此判断复制期间记忆是否有变化
+        self.generation = 0
+
+        db = self._db()
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS facts (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "role_id TEXT NOT NULL, row INTEGER NOT NULL, text TEXT NOT NULL, "
+            "created_at REAL NOT NULL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS idx_facts_role ON facts(role_id)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        db.commit()
+        stored_dim = self._meta("dim")
+        if stored_dim is None:
+            self._set_meta("dim", dim)
+        elif int(stored_dim) != dim:
+            raise ValueError(
+                f"向量维度 {dim} 与已有索引的维度 {stored_dim} 不一致，请更换data_dir或删除旧索引"
+            )
+        self.size = int(self._meta("size") or 0)
+        # 压缩时写入新的向量文件，文件名与行号在同一个事务中更新
+        self.vectors_path = os.path.join(
+            directory, self._meta("vectors_file") or "vectors.f16"
+        )
+        capacity = max(1024, self.size)
+        if os.path.exists(self.vectors_path):
+            capacity = max(capacity, os.path.getsize(self.vectors_path) // (2 * dim))
+        self._open(capacity)
+
+    def _db(self):
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def _meta(self, key):
+        row = self._db().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value, db=None):
+        (db or self._db()).execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+        )
+        if db is None:
+            self._db().commit()
+
+    def _open(self, capacity, path=None):
+        path = path or self.vectors_path
+        with open(path, "ab") as f:
+            if f.tell() < capacity * self.dim * 2:
+                f.truncate(capacity * self.dim * 2)
+        matrix = np.memmap(path, dtype=np.float16, mode="r+", shape=(capacity, self.dim))
+        if path == self.vectors_path:
+            self.matrix = matrix
+        return matrix
+
+    def facts(self, role_id):
+        """设备的全部记忆，最近使用的设备缓存在内存中"""
+        with self.lock:
+            facts = self.cache.get(role_id)
+            if facts is not None:
+                self.cache.move_to_end(role_id)
+                return facts
+            records = (
+                self._db()
+                .execute(
+                    "SELECT id, row, text, created_at FROM facts WHERE role_id = ? ORDER BY id",
+                    (role_id,),
+                )
+                .fetchall()
+            )
+            facts = DeviceFacts(records)
+            self.cache[role_id] = facts
+            while len(self.cache) > self.cache_devices:
+                self.cache.popitem(last=False)
+            return facts
+
+    def vectors(self, facts):
+        with self.lock:
+            return np.asarray(self.matrix[facts.rows], dtype=np.float32)
+
+    def facts_with_vectors(self, role_id):
+        """在同一次加锁中读取设备的记忆和向量，避免两次读取之间压缩改变了行号"""
+        with self.lock:
+            facts = self.facts(role_id)
+            if not facts.ids:
+                return facts, None
+            return facts, self.vectors(facts)
+
+    def add(self, role_id, texts, vectors):
+        if not texts:
+            return
+        with self.lock:
+            needed = self.size + len(texts)
+            if needed > self.matrix.shape[0]:
+                self.matrix.flush()
+                self._open(max(needed, self.matrix.shape[0] * 2))
+            rows = range(self.size, needed)
+            self.matrix[self.size : needed] = np.asarray(vectors, dtype=np.float16)
+            self.matrix.flush()
+            now = time.time()
+            db = self._db()
+            with db:
+                db.executemany(
+                    "INSERT INTO facts (role_id, row, text, created_at) VALUES (?, ?, ?, ?)",
+                    [(role_id, row, text, now) for row, text in zip(rows, texts)],
+                )
+                self._set_meta("size", needed, db)
+            self.size = needed
+            self.generation += 1
+            self.cache.pop(role_id, None)
+
+    def delete(self, role_id, ids):
+        if not ids:
+            return
+        with self.lock:
+            db = self._db()
+            with db:
+                db.executemany("DELETE FROM facts WHERE id = ?", [(i,) for i in ids])
+            self.generation += 1
+            self.cache.pop(role_id, None)
+        self._maybe_compact()
+
+    def search(self, role_id, vector, top_k, min_score):
+        """返回 [(相似度, 文本, 创建时间)]，按相似度从高到低排列"""
+        facts, matrix = self.facts_with_vectors(role_id)
+        if matrix is None:
+            return []
+        scores = matrix @ np.asarray(vector, dtype=np.float32)
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            (float(scores[i]), facts.texts[i], facts.times[i])
+            for i in best
+            if scores[i] >= min_score
+        ]
+
+    def _maybe_compact(self):
+        with self.lock:
+            if self.compacting or self.size < 1024:
+                return
+            live = self._db().execute("SELECT COUNT(*) FROM facts").fetchone()[0]
+            if (self.size - live) / self.size < self.compact_ratio:
+                return
+            self.compacting = True
+        threading.Thread(target=self.compact, name="VectorIndexCompact", daemon=True).start()
+
+    def compact(self, max_attempts=3):
+        """去掉空洞行，同一设备的记忆排列到相邻的行"""
+        try:
+            for _ in range(max_attempts):
+                if self._compact_once():
+                    return
+            logger.bind(tag=TAG).info("向量记忆索引压缩期间记忆持续变化，稍后再压缩")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"向量记忆索引压缩失败: {e}")
+        finally:
+            self.compacting = False
+
+    def _compact_once(self):
+        """复制向量和计算新行号时不加锁，替换时记忆有变化则放弃本次结果，返回是否完成"""
+        db = self._db()
+        with self.lock:
+            generation = self.generation
+            old_matrix = self.matrix
+        # 读取之后的新增或删除会改变generation，替换前会检查
+        records = db.execute("SELECT id, row FROM facts ORDER BY role_id, id").fetchall()
+
+        # 已写入的行不会再被修改，可以在不加锁的情况下从旧矩阵复制
+        vectors_file = f"vectors.{time.time_ns()}.f16"
+        new_path = os.path.join(self.directory, vectors_file)
+        matrix = self._open(max(1024, len(records)), new_path)
+        old_rows = np.array([r[1] for r in records], dtype=np.int64)
+        for start in range(0, len(records), 4096):
+            chunk = old_rows[start : start + 4096]
+            matrix[start : start + len(chunk)] = old_matrix[chunk]
+        matrix.flush()
+        db.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS compact_rows (id INTEGER PRIMARY KEY, row INTEGER)"
+        )
+        with db:
+            db.execute("DELETE FROM compact_rows")
+            db.executemany(
+                "INSERT INTO compact_rows (id, row) VALUES (?, ?)",
+                [(r[0], new_row) for new_row, r in enumerate(records)],
+            )
+
+        with self.lock:
+            if self.generation != generation:
+                del matrix
+                os.remove(new_path)
+                return False
+            # 行号由一条语句从临时表更新，持锁时间不随Python循环增长
+            with db:
+                db.execute(
+                    "UPDATE facts SET row = "
+                    "(SELECT row FROM compact_rows WHERE compact_rows.id = facts.id)"
+                )
+                self._set_meta("size", len(records), db)
+                self._set_meta("vectors_file", vectors_file, db)
+            removed = self.size - len(records)
+            old_path = self.vectors_path
+            self.vectors_path = new_path
+            self.matrix = matrix
+            self.size = len(records)
+            self.generation += 1
+            self.cache.clear()
+        del old_matrix
+        try:
+            os.remove(old_path)
+        except OSError as e:
+            logger.bind(tag=TAG).warning(f"删除旧的向量文件失败: {e}")
+        logger.bind(tag=TAG).info(f"向量记忆索引压缩完成，回收 {removed} 行")
+        return True
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_vector_index(directory, dim, **kwargs):
+    """同一个目录的索引在进程内只打开一次"""
+    directory = os.path.abspath(directory)
+    with _indexes_lock:
+        index = _indexes.get(directory)
+        if index is None:
+            index = VectorIndex(directory, dim, **kwargs)
+            _indexes[directory] = index
+        return index
@@ -20,8 +20,6 @@ class VADProvider(VADProviderBase):
         )
         (get_speech_timestamps, _, _, _, _) = self.utils
 
-        self.decoder = opuslib_next.Decoder(16000, 1)
-
         # 处理空字符串的情况
         threshold = config.get("threshold", "0.5")
         min_silence_duration_ms = config.get("min_silence_duration_ms", "1000")
@@ -33,7 +31,9 @@ class VADProvider(VADProviderBase):
 
     def is_vad(self, conn, opus_packet):
         try:
-            pcm_frame = self.decoder.decode(opus_packet, 960)
+            if conn.vad_decoder is None:
+                conn.vad_decoder = opuslib_next.Decoder(16000, 1)
+            pcm_frame = conn.vad_decoder.decode(opus_packet, 960)
             conn.client_audio_buffer.extend(pcm_frame)  # 将新数据加入缓冲区
 
             # 处理缓冲区中的完整帧（每次处理512采样点）
@@ -0,0 +1,201 @@
+"""
+对话上下文窗口
+
+按token预算裁剪发送给LLM的对话：始终保留系统提示词、记忆和最近几轮对话，
+更早的对话在后台线程中由LLM折叠成滚动摘要，不占用对话的响应时间。
+"""
+
+import re
+import threading
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+summary_prompt = """
+你是一个对话摘要助手。请把【已有摘要】和【新的对话】合并成一段新的摘要。
+要求：
+1. 保留用户的身份信息、偏好、提出过的问题和尚未完成的事项
+2. 保留助手做出的承诺和给出的关键结论
+3. 使用简洁的陈述句，不要评论，不要编造
+4. 只返回摘要正文，不要包含任何其他文字
+"""
+
+CJK_PATTERN = re.compile(
+    r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]"
+)
+
+# 每条消息的固定开销（角色、分隔符等）
+MESSAGE_TOKEN_OVERHEAD = 4
+
+
+def estimate_tokens(text):
+    """粗略估算token数：中日文字符按1个token，其余字符按4个字符1个token"""
+    if not text:
+        return 0
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def create_token_counter(config):
+    """根据配置创建token计数函数"""
+    tokenizer = config.get("tokenizer", "char")
+    if tokenizer == "tiktoken":
+        try:
+            import tiktoken
+
+            encoding = tiktoken.get_encoding(
+                config.get("tiktoken_encoding", "cl100k_base")
+            )
+            return lambda text: len(encoding.encode(text)) if text else 0
+        except Exception as e:
+            logger.bind(tag=TAG).warning(
+                f"加载tiktoken失败，改用字符估算token: {e}"
+            )
+    return estimate_tokens
+
+
+class ContextWindow:
+    def __init__(self, config, llm=None, submit=None):
+        self.max_tokens = int(config.get("max_tokens", 2000))
+        self.keep_turns = int(config.get("keep_turns", 6))
+        self.summary_max_tokens = int(config.get("summary_max_tokens", 300))
+        self.summarize = bool(config.get("summarize", True))
+        self.count_tokens = create_token_counter(config)
+        self.llm = llm
+        # 后台执行摘要的方法，一般传入连接的线程池submit
+        self.submit = submit
+
+        self.summary = ""
+        # dialogue中该下标之前的消息已经折叠进摘要
+        self.summarized_upto = 0
+        self._summarizing = False
+        self._lock = threading.Lock()
+
+    def message_tokens(self, message):
+        return self.count_tokens(message.content) + MESSAGE_TOKEN_OVERHEAD
+
+    def build_context(self, memory_str, summary):
+        """拼接摘要和记忆，由Dialogue决定放在系统提示词后面还是单独成一条消息"""
+        parts = []
+        if summary:
+            parts.append(f"之前的对话摘要：\n{summary}")
+        if memory_str:
+            parts.append(f"相关记忆：\n{memory_str}")
+        return "\n\n".join(parts)
+
+    def build_dialogue(self, dialogue, memory_str=None):
+        """
+        生成在token预算内的LLM对话
+        Args:
+            dialogue: Dialogue对象
+            memory_str: 记忆内容
+        Returns:
+            发送给LLM的消息列表
+        """
+        with self._lock:
+            summary = self.summary
+            summarized_upto = self.summarized_upto
+
+        messages = dialogue.dialogue
+        system_message = next((m for m in messages if m.role == "system"), None)
+        system_content = system_message.content if system_message else ""
+        context_str = self.build_context(memory_str, summary)
+        prompt_tokens = self.count_tokens(system_content) + self.count_tokens(
+            context_str
+        )
+        budget = self.max_tokens - prompt_tokens
+
+        start = summarized_upto
+        while start < len(messages) and messages[start].role == "system":
+            start += 1
+
+        # 从最新的消息往前，以user消息为界按轮次收集，当前这一轮始终保留
+        kept_start = len(messages)
+        kept_turns = 0
+        used = 0
+        turn_tokens = 0
+        for i in range(len(messages) - 1, start - 1, -1):
+            if messages[i].role == "system":
+                continue
+            turn_tokens += self.message_tokens(messages[i])
+            if messages[i].role != "user" and i != start:
+                continue
+            if kept_turns > 0 and (
+                kept_turns >= self.keep_turns or used + turn_tokens > budget
+            ):
+                break
+            used += turn_tokens
+            kept_start = i
+            kept_turns += 1
+            turn_tokens = 0
+
+        if kept_start > start:
+            self._fold(messages[start:kept_start], kept_start)
+
+        result = []
+        if system_message is not None:
+            result.append({"role": "system", "content": system_content})
+        for m in dialogue.get_llm_dialogue(kept_start):
+            if m["role"] != "system":
+                result.append(m)
+
+        logger.bind(tag=TAG).debug(
+            f"上下文窗口: 保留{kept_turns}轮, 约{used + prompt_tokens} tokens"
+        )
+        return dialogue.attach_context(result, context_str)
+
+    def _fold(self, messages, end):
+        """把窗口外的旧对话折叠进摘要"""
+        if not self.summarize or self.llm is None or self.submit is None:
+            # 不做摘要，直接丢弃窗口外的对话
+            with self._lock:
+                self.summarized_upto = max(self.summarized_upto, end)
+            return
+
+        with self._lock:
+            if self._summarizing:
+                return
+            self._summarizing = True
+        try:
+            self.submit(self._summarize, list(messages), end)
+        except RuntimeError as e:
+            # 连接关闭后线程池不再接受任务
+            logger.bind(tag=TAG).debug(f"提交对话摘要任务失败: {e}")
+            with self._lock:
+                self._summarizing = False
+
+    def _summarize(self, messages, end):
+        try:
+            transcript = ""
+            for m in messages:
+                if m.role in ("user", "assistant") and m.content:
+                    transcript += f"{m.role}: {m.content}\n"
+
+            new_summary = self.summary
+            if transcript:
+                user_prompt = ""
+                if self.summary:
+                    user_prompt += f"【已有摘要】\n{self.summary}\n\n"
+                user_prompt += f"【新的对话】\n{transcript}"
+                result = self.llm.response_no_stream(summary_prompt, user_prompt)
+                if not result or "服务响应异常" in result:
+                    logger.bind(tag=TAG).warning(f"生成对话摘要失败: {result}")
+                    return
+                new_summary = self._truncate(result.strip())
+
+            with self._lock:
+                self.summary = new_summary
+                self.summarized_upto = max(self.summarized_upto, end)
+            logger.bind(tag=TAG).debug(f"对话摘要已更新: {new_summary}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"生成对话摘要出错: {e}")
+        finally:
+            with self._lock:
+                self._summarizing = False
+
+    def _truncate(self, text):
+        """把摘要截断到summary_max_tokens以内"""
+        while text and self.count_tokens(text) > self.summary_max_tokens:
+            text = text[: int(len(text) * 0.9)]
+        return text
@@ -4,6 +4,8 @@ from datetime import datetime
 
 
 class Message:
+    __slots__ = ("_uniq_id", "role", "content", "tool_calls", "tool_call_id")
+
     def __init__(
         self,
         role: str,
@@ -12,76 +14,117 @@ class Message:
         tool_calls=None,
         tool_call_id=None,
     ):
-        self.uniq_id = uniq_id if uniq_id is not None else str(uuid.uuid4())
+        # uniq_id在首次访问时才生成，避免每条消息都调用uuid4
+        self._uniq_id = uniq_id
         self.role = role
         self.content = content
         self.tool_calls = tool_calls
         self.tool_call_id = tool_call_id
 
+    @property
+    def uniq_id(self):
+        if self._uniq_id is None:
+            self._uniq_id = str(uuid.uuid4())
+        return self._uniq_id
+
 
 class Dialogue:
     def __init__(self):
         self.dialogue: List[Message] = []
+        # 与dialogue一一对应的LLM消息格式缓存，只追加，不重复构建
+        self._llm_messages: List[Dict] = []
         # 获取当前时间
         self.current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # 上下文窗口，为None时发送全部对话
+        self.context_window = None
+        # 保持系统提示词和历史消息逐字节不变，记忆等动态内容附加在最后一条user消息末尾，
+        # 使本地模型（ollama、xinference）可以复用上一轮请求的前缀KV缓存
+        self.stable_prefix = False
 
     def put(self, message: Message):
         self.dialogue.append(message)
+        self.getMessages(message, self._llm_messages)
+
+    def remove(self, message: Message) -> bool:
+        """按对象删除一条消息，用于撤回被取消的乐观聊天提前写入的用户消息"""
+        for index in range(len(self.dialogue) - 1, -1, -1):
+            if self.dialogue[index] is message:
+                del self.dialogue[index]
+                del self._llm_messages[index]
+                return True
+        return False
 
     def getMessages(self, m, dialogue):
         if m.tool_calls is not None:
             dialogue.append({"role": m.role, "tool_calls": m.tool_calls})
         elif m.role == "tool":
+            if m.tool_call_id is None:
+                m.tool_call_id = str(uuid.uuid4())
             dialogue.append(
                 {
                     "role": m.role,
-                    "tool_call_id": (
-                        str(uuid.uuid4()) if m.tool_call_id is None else m.tool_call_id
-                    ),
+                    "tool_call_id": m.tool_call_id,
                     "content": m.content,
                 }
             )
         else:
             dialogue.append({"role": m.role, "content": m.content})
 
-    def get_llm_dialogue(self) -> List[Dict[str, str]]:
-        dialogue = []
-        for m in self.dialogue:
-            self.getMessages(m, dialogue)
-        return dialogue
+    def get_llm_dialogue(self, start: int = 0) -> List[Dict[str, str]]:
+        """返回从start开始的LLM消息，列表可以随意增删，消息字典与缓存共用，修改前请先复制"""
+        return self._llm_messages[start:]
 
     def update_system_message(self, new_content: str):
         """更新或添加系统消息"""
         # 查找第一个系统消息
-        system_msg = next((msg for msg in self.dialogue if msg.role == "system"), None)
-        if system_msg:
-            system_msg.content = new_content
-        else:
-            self.put(Message(role="system", content=new_content))
+        for index, msg in enumerate(self.dialogue):
+            if msg.role == "system":
+                msg.content = new_content
+                self._llm_messages[index] = {"role": "system", "content": new_content}
+                return
+        self.put(Message(role="system", content=new_content))
 
     def get_llm_dialogue_with_memory(
         self, memory_str: str = None
     ) -> List[Dict[str, str]]:
+        if self.context_window is not None:
+            return self.context_window.build_dialogue(self, memory_str)
+
         if memory_str is None or len(memory_str) == 0:
             return self.get_llm_dialogue()
 
+        return self.attach_context(self.get_llm_dialogue(), f"相关记忆：\n{memory_str}")
+
+    def attach_context(self, messages: List[Dict], context_str: str) -> List[Dict]:
+        """把记忆、摘要等动态内容加入发送给LLM的消息列表"""
+        if not context_str:
+            return messages
+
+        if self.stable_prefix:
+            # 附加在最后一条user消息末尾，前面的系统提示词和历史对话与上一轮请求完全一致
+            for i in range(len(messages) - 1, -1, -1):
+                if messages[i]["role"] == "user":
+                    messages[i] = {
+                        "role": "user",
+                        "content": f"{messages[i]['content']}\n\n{context_str}",
+                    }
+                    return messages
+            messages.append({"role": "system", "content": context_str})
+            return messages
+
         # 构建带记忆的对话
         dialogue = []
 
         # 添加系统提示和记忆
-        system_message = next(
-            (msg for msg in self.dialogue if msg.role == "system"), None
-        )
+        system_message = next((m for m in messages if m["role"] == "system"), None)
 
         if system_message:
-            enhanced_system_prompt = (
-                f"{system_message.content}\n\n" f"相关记忆：\n{memory_str}"
-            )
+            enhanced_system_prompt = f"{system_message['content']}\n\n{context_str}"
             dialogue.append({"role": "system", "content": enhanced_system_prompt})
 
         # 添加用户和助手的对话
-        for m in self.dialogue:
-            if m.role != "system":  # 跳过原始的系统消息
-                self.getMessages(m, dialogue)
+        for m in messages:
+            if m["role"] != "system":  # 跳过原始的系统消息
+                dialogue.append(m)
 
         return dialogue
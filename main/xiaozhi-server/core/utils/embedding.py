@@ -0,0 +1,80 @@
+"""
+本地文本向量
+
+语义回复缓存和本地记忆共用的CPU向量模型：
+- hashing：字符一元、二元组哈希向量，不需要下载模型
+- sentence_transformers：本地向量模型，需要 pip install sentence-transformers
+向量模型在进程内按配置只加载一次，所有连接共用。
+"""
+
+import hashlib
+import threading
+import numpy as np
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class HashingEmbedder:
+    """字符一元、二元组哈希向量，不需要下载模型，适合短句的近似匹配"""
+
+    def __init__(self, dim=512):
+        self.dim = dim
+
+    def _index(self, gram):
+        digest = hashlib.md5(gram.encode("utf-8")).digest()
+        return int.from_bytes(digest[:4], "little") % self.dim
+
+    def encode(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        chars = [c for c in text if not c.isspace()]
+        for c in chars:
+            vector[self._index(c)] += 1.0
+        for a, b in zip(chars, chars[1:]):
+            vector[self._index(a + b)] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+
+class SentenceTransformerEmbedder:
+    """sentence-transformers本地向量模型，需要 pip install sentence-transformers"""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, text):
+        return self.model.encode(text, normalize_embeddings=True).astype(np.float32)
+
+
+def create_embedder(config):
+    embedding = config.get("embedding", "hashing")
+    if embedding == "sentence_transformers":
+        try:
+            return SentenceTransformerEmbedder(
+                config.get("model_name", "BAAI/bge-small-zh-v1.5")
+            )
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"加载向量模型失败，改用字符哈希向量: {e}")
+    return HashingEmbedder(int(config.get("dim", 512)))
+
+
+_embedders = {}
+_embedders_lock = threading.Lock()
+
+
+def get_embedder(config):
+    """按 (embedding, model_name, dim) 获取进程内共用的向量模型"""
+    key = (
+        config.get("embedding", "hashing"),
+        config.get("model_name", "BAAI/bge-small-zh-v1.5"),
+        int(config.get("dim", 512)),
+    )
+    with _embedders_lock:
+        embedder = _embedders.get(key)
+        if embedder is None:
+            embedder = create_embedder(config)
+            _embedders[key] = embedder
+        return embedder
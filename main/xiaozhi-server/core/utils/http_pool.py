@@ -0,0 +1,206 @@
+"""
+LLM共用的HTTP连接池
+
+按 (协议, 主机, 端口) 复用长连接，避免每轮对话都重新进行TCP/TLS握手：
+- 基于requests的适配器（dify、fastgpt、gemini、homeassistant）使用 get_session
+- 基于openai SDK的适配器（openai、ollama、xinference）使用 get_httpx_client
+
+连接池参数读取配置文件中的 llm_http_pool，单个LLM也可以通过 http_pool 字段覆盖
+"""
+
+import importlib.util
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import EmptyPoolError
+from urllib3.poolmanager import ProxyManager, PoolManager, pool_classes_by_scheme
+from config.config_loader import load_config
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_POOL_CONFIG = {
+    # 单个主机最大连接数
+    "max_connections": 100,
+    # 单个主机保持的空闲长连接数，仅对openai SDK类适配器生效；
+    # requests的连接池不区分两者，最多保持max_connections个连接
+    "max_keepalive_connections": 20,
+    # 空闲长连接保持时间(秒)
+    "keepalive_expiry": 60,
+    # 建立连接超时时间(秒)
+    "connect_timeout": 10,
+    # 读取超时时间(秒)，流式输出时为两个数据块之间的最大间隔
+    "read_timeout": 120,
+    # 连接数达到max_connections时等待空闲连接的最长时间(秒)，超时后请求失败
+    "pool_timeout": 30,
+    # 是否启用HTTP/2，需要安装h2，仅对openai SDK类适配器生效
+    "http2": False,
+}
+
+_sessions = {}
+_httpx_clients = {}
+_lock = threading.Lock()
+
+
+class PooledSession(requests.Session):
+    """带默认超时的requests会话，同一主机的请求复用底层连接"""
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.default_timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.default_timeout)
+        return super().request(method, url, **kwargs)
+
+
+class _BoundedPoolMixin:
+    """urllib3连接池在pool_block模式下默认无限等待空闲连接，这里改为最多等待pool_timeout秒"""
+
+    pool_timeout = None
+
+    def _get_conn(self, timeout=None):
+        return super()._get_conn(self.pool_timeout if timeout is None else timeout)
+
+
+class BoundedHTTPAdapter(HTTPAdapter):
+    """并发连接不超过pool_maxsize，等待空闲连接超时后抛出ConnectionError"""
+
+    __attrs__ = HTTPAdapter.__attrs__ + ["pool_timeout"]
+
+    def __init__(self, pool_timeout, **kwargs):
+        self.pool_timeout = pool_timeout
+        super().__init__(**kwargs)
+
+    def _bound(self, manager):
+        # SOCKS代理使用自己的连接池类，保持原样
+        if type(manager) in (PoolManager, ProxyManager):
+            manager.pool_classes_by_scheme = {
+                scheme: type(
+                    cls.__name__,
+                    (_BoundedPoolMixin, cls),
+                    {"pool_timeout": self.pool_timeout},
+                )
+                for scheme, cls in pool_classes_by_scheme.items()
+            }
+        return manager
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self._bound(self.poolmanager)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        if proxy in self.proxy_manager:
+            return self.proxy_manager[proxy]
+        return self._bound(super().proxy_manager_for(proxy, **proxy_kwargs))
+
+    def send(self, request, **kwargs):
+        try:
+            return super().send(request, **kwargs)
+        except EmptyPoolError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+
+
+def get_pool_config(overrides=None):
+    """合并默认值、全局配置和单个LLM的覆盖配置"""
+    pool_config = dict(DEFAULT_POOL_CONFIG)
+    try:
+        pool_config.update(load_config().get("llm_http_pool") or {})
+    except Exception as e:
+        logger.bind(tag=TAG).warning(f"读取llm_http_pool配置失败，使用默认值: {e}")
+    if overrides:
+        pool_config.update(overrides)
+    return pool_config
+
+
+def _host_key(url):
+    """提取 (协议, 主机, 端口) 作为连接池的键"""
+    if not url:
+        return ("", "", 0)
+    parts = urlsplit(url)
+    scheme = parts.scheme or "http"
+    port = parts.port or (443 if scheme == "https" else 80)
+    return (scheme, parts.hostname or "", port)
+
+
+def _options_key(pool_config, proxies=None):
+    proxies_key = tuple(sorted((proxies or {}).items()))
+    return tuple(sorted(pool_config.items())) + proxies_key
+
+
+def get_session(url, proxies=None, overrides=None):
+    """获取指定主机共用的requests会话"""
+    pool_config = get_pool_config(overrides)
+    key = (_host_key(url), _options_key(pool_config, proxies))
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = PooledSession(
+                (pool_config["connect_timeout"], pool_config["read_timeout"])
+            )
+            # urllib3只有一个上限：pool_block使并发连接不超过max_connections，
+            # 超出时最多等待pool_timeout秒的空闲连接
+            adapter = BoundedHTTPAdapter(
+                float(pool_config["pool_timeout"]),
+                pool_connections=1,
+                pool_maxsize=int(pool_config["max_connections"]),
+                pool_block=True,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            if proxies:
+                session.proxies.update(proxies)
+            _sessions[key] = session
+            logger.bind(tag=TAG).debug(f"创建HTTP长连接会话: {key[0]}")
+        return session
+
+
+def _http2_available(pool_config):
+    if not pool_config.get("http2"):
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.bind(tag=TAG).warning("未安装h2，HTTP/2已禁用，请执行 pip install h2")
+        return False
+    return True
+
+
+def get_httpx_client(url, overrides=None):
+    """获取指定主机共用的httpx客户端，可传给openai SDK的http_client参数"""
+    pool_config = get_pool_config(overrides)
+    key = (_host_key(url), _options_key(pool_config))
+    with _lock:
+        client = _httpx_clients.get(key)
+        if client is None:
+            client = httpx.Client(
+                http2=_http2_available(pool_config),
+                limits=httpx.Limits(
+                    max_connections=int(pool_config["max_connections"]),
+                    max_keepalive_connections=int(
+                        pool_config["max_keepalive_connections"]
+                    ),
+                    keepalive_expiry=float(pool_config["keepalive_expiry"]),
+                ),
+                timeout=httpx.Timeout(
+                    float(pool_config["read_timeout"]),
+                    connect=float(pool_config["connect_timeout"]),
+                    pool=float(pool_config["pool_timeout"]),
+                ),
+            )
+            _httpx_clients[key] = client
+            logger.bind(tag=TAG).debug(f"创建HTTP长连接客户端: {key[0]}")
+        return client
+
+
+def close_all():
+    """关闭所有连接池，程序退出时调用"""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        for client in _httpx_clients.values():
+            client.close()
+        _sessions.clear()
+        _httpx_clients.clear()
@@ -0,0 +1,191 @@
+"""
+后台记忆总结
+
+设备断开连接时不再在事件循环中等待记忆总结（一次同步的LLM调用），而是把本次对话放入队列，
+由后台工作线程调用记忆模块的save_memory：
+- 队列有上限，满了以后丢弃最早等待的任务
+- 同一设备还在排队的多次会话合并成一个任务，只调用一次LLM
+- 失败后按指数退避重试
+- 服务退出时等待队列中的总结完成，最多等待shutdown_timeout秒
+"""
+
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from config.logger import setup_logging
+from core.utils.provider_pool import provider_key
+
+TAG = __name__
+logger = setup_logging()
+
+
+def job_key(memory, role_id):
+    """记忆模块每个连接单独创建，按模块类型和配置区分，同一设备不同连接的会话使用同一个键"""
+    return (provider_key("Memory", type(memory).__module__, memory.config), role_id)
+
+
+class SummaryJob:
+    __slots__ = ("key", "memory", "role_id", "llm", "messages", "sessions", "attempts")
+
+    def __init__(self, key, memory, role_id, llm, messages):
+        self.key = key
+        self.memory = memory
+        self.role_id = role_id
+        self.llm = llm
+        self.messages = list(messages)
+        self.sessions = 1
+        self.attempts = 0
+
+    def merge(self, llm, messages):
+        """合并同一设备的下一次会话，系统提示词只保留一份"""
+        self.llm = llm
+        self.messages.extend(m for m in messages if m.role != "system")
+        self.sessions += 1
+
+
+class MemorySummarizer:
+    def __init__(self, config):
+        self.max_pending = int(config.get("max_pending", 1000))
+        self.max_retries = int(config.get("max_retries", 2))
+        self.retry_delay = float(config.get("retry_delay", 2))
+        self.shutdown_timeout = float(config.get("shutdown_timeout", 30))
+        # 等待中的任务，键为 (记忆模块配置, 设备)，同一设备的会话在这里合并
+        self.pending = OrderedDict()
+        self.cond = threading.Condition()
+        # 正在总结的 (记忆模块, 设备)，同一设备同时只由一个线程总结，避免写入的记忆互相覆盖
+        self.running = set()
+        self.completed = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+        for i in range(max(1, int(config.get("workers", 2)))):
+            threading.Thread(
+                target=self._worker, name=f"MemorySummarizer-{i}", daemon=True
+            ).start()
+
+    def submit(self, memory, role_id, llm, messages):
+        """放入总结队列，立即返回"""
+        key = job_key(memory, role_id)
+        with self.cond:
+            job = self.pending.get(key)
+            if job is not None:
+                job.merge(llm, messages)
+                self.coalesced += 1
+                return
+            if len(self.pending) >= self.max_pending:
+                _, dropped = self.pending.popitem(last=False)
+                self.dropped += 1
+                logger.bind(tag=TAG).warning(
+                    f"记忆总结队列已满，丢弃设备 {dropped.role_id} 的待总结对话"
+                )
+            self.pending[key] = SummaryJob(key, memory, role_id, llm, messages)
+            self.cond.notify()
+
+    def _take(self):
+        with self.cond:
+            while True:
+                key = next((k for k in self.pending if k not in self.running), None)
+                if key is not None:
+                    self.running.add(key)
+                    return key, self.pending.pop(key)
+                self.cond.wait()
+
+    def _done(self, key):
+        with self.cond:
+            self.running.discard(key)
+            # 同一设备在总结期间又提交的任务可以开始了，close()也在等待
+            self.cond.notify_all()
+
+    def _worker(self):
+        loop = asyncio.new_event_loop()
+        while True:
+            key, job = self._take()
+            try:
+                self._run(loop, job)
+            finally:
+                self._done(key)
+
+    def _run(self, loop, job):
+        try:
+            # 显式传入设备和LLM，不修改多个连接共用的记忆模块实例上的状态
+            loop.run_until_complete(
+                job.memory.save_memory(job.messages, role_id=job.role_id, llm=job.llm)
+            )
+            with self.cond:
+                self.completed += 1
+            if job.sessions > 1:
+                logger.bind(tag=TAG).info(
+                    f"设备 {job.role_id} 的 {job.sessions} 次会话已合并总结"
+                )
+        except Exception as e:
+            job.attempts += 1
+            if job.attempts > self.max_retries:
+                with self.cond:
+                    self.failed += 1
+                logger.bind(tag=TAG).error(
+                    f"设备 {job.role_id} 记忆总结失败，已放弃: {e}"
+                )
+                return
+            logger.bind(tag=TAG).warning(
+                f"设备 {job.role_id} 记忆总结失败，第{job.attempts}次重试: {e}"
+            )
+            time.sleep(self.retry_delay * (2 ** (job.attempts - 1)))
+            self._retry(job)
+
+    def _retry(self, job):
+        key = job.key
+        with self.cond:
+            newer = self.pending.pop(key, None)
+            if newer is not None:
+                # 重试期间同一设备又有新的会话，合并到一起
+                job.merge(newer.llm, newer.messages)
+                job.sessions += newer.sessions - 1
+            self.pending[key] = job
+            self.pending.move_to_end(key, last=False)
+            self.cond.notify()
+
+    def close(self):
+        """服务退出时等待队列中和正在进行的总结完成，超时后放弃剩下的任务"""
+        deadline = time.monotonic() + self.shutdown_timeout
+        with self.cond:
+            while self.pending or self.running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.bind(tag=TAG).warning(
+                        f"等待记忆总结超时，放弃 {len(self.pending) + len(self.running)} 个设备的总结"
+                    )
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+    def stats(self):
+        with self.cond:
+            return {
+                "pending": len(self.pending),
+                "completed": self.completed,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+
+_summarizer = None
+_summarizer_lock = threading.Lock()
+
+
+def get_memory_summarizer(config):
+    """获取所有连接共用的后台记忆总结服务，未开启时返回None"""
+    global _summarizer
+    summarizer_config = config.get("memory_summarizer") or {}
+    if not summarizer_config.get("enabled", True):
+        return None
+    with _summarizer_lock:
+        if _summarizer is None:
+            _summarizer = MemorySummarizer(summarizer_config)
+        return _summarizer
+
+
+def close_memory_summarizer():
+    if _summarizer is not None:
+        _summarizer.close()
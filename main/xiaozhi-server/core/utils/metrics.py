@@ -0,0 +1,388 @@
+"""
+运行指标
+
+以Prometheus文本格式输出服务的运行指标，不依赖prometheus_client：
+- 计数器和直方图在事件循环和工作线程中都可以直接记录，每次记录只是一次加锁的加法
+- 连接数、队列长度、线程池使用率、缓存命中率在抓取时才计算，平时没有开销
+- 接口默认挂在OTA服务的/metrics上；配置了metrics.port时单独监听，从manager-api读取配置时也可用
+
+各阶段耗时（xiaozhi_stage_latency_seconds的stage标签）：
+- vad_endpoint：最后一帧有声音到判定说完一句话
+- asr：语音识别
+- intent：意图识别
+- memory：记忆查询
+- llm_first_token：请求大模型到收到第一段输出
+- tts_first_byte：本轮第一句话的语音合成
+- first_audio_frame：说完一句话（文字输入时为开始处理）到向设备发出第一帧音频
+"""
+
+import time
+import bisect
+import asyncio
+import threading
+from aiohttp import web
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.children = {}
+
+    def labels(self, *values):
+        """按标签取子指标，调用频繁的地方可以保存返回值避免重复查找"""
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(
+                f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}"
+            )
+        return lines
+
+
+class _Value:
+    __slots__ = ("lock", "value")
+
+    def __init__(self, lock):
+        self.lock = lock
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _Value(self.lock)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        with self.lock:
+            items = [(values, child.value) for values, child in self.children.items()]
+        return [("", self.labelnames, values, value) for values, value in items]
+
+
+class _HistogramValue:
+    __slots__ = ("lock", "bounds", "counts", "sum")
+
+    def __init__(self, lock, bounds):
+        self.lock = lock
+        self.bounds = bounds
+        # 每个桶单独计数，输出时再累加
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.lock, self.bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def samples(self):
+        with self.lock:
+            items = [
+                (values, list(child.counts), child.sum)
+                for values, child in self.children.items()
+            ]
+        names = self.labelnames + ("le",)
+        result = []
+        for values, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += count
+                result.append(("_bucket", names, values + (_format_value(bound),), cumulative))
+            result.append(("_sum", self.labelnames, values, total))
+            result.append(("_count", self.labelnames, values, cumulative))
+        return result
+
+
+class CallbackGauge(Metric):
+    """抓取时调用callback计算的指标，callback返回[(标签值元组, 数值)]"""
+
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames, callback):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def samples(self):
+        return [("", self.labelnames, tuple(values), value) for values, value in self.callback()]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in list(self.metrics):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"指标 {metric.name} 计算失败: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(
+    Histogram(
+        "xiaozhi_stage_latency_seconds",
+        "Latency of each stage of a conversation turn",
+        ("stage",),
+    )
+)
+PROVIDER_REQUESTS = REGISTRY.register(
+    Counter(
+        "xiaozhi_provider_requests_total",
+        "Provider calls by module and result",
+        ("module", "result"),
+    )
+)
+CACHE_REQUESTS = REGISTRY.register(
+    Counter(
+        "xiaozhi_cache_requests_total",
+        "Cache lookups by cache and result",
+        ("cache", "result"),
+    )
+)
+
+
+def observe_stage(stage, seconds):
+    STAGE_LATENCY.labels(stage).observe(seconds)
+
+
+def record_provider(module, ok):
+    PROVIDER_REQUESTS.labels(module, "ok" if ok else "error").inc()
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def observe_first(iterable, stage, module=None):
+    """包装流式输出，记录从调用到第一段输出的耗时，传入module时同时记录成功或失败"""
+    start = time.monotonic()
+
+    def wrapper():
+        first = True
+        try:
+            for item in iterable:
+                if first:
+                    first = False
+                    observe_stage(stage, time.monotonic() - start)
+                yield item
+        except Exception:
+            if module:
+                record_provider(module, False)
+            raise
+        if module:
+            record_provider(module, True)
+
+    return wrapper()
+
+
+def _cache_hit_ratio():
+    with CACHE_REQUESTS.lock:
+        totals = {}
+        for (cache, result), child in CACHE_REQUESTS.children.items():
+            hits, count = totals.get(cache, (0.0, 0.0))
+            totals[cache] = (hits + (child.value if result == "hit" else 0), count + child.value)
+    return [((cache,), hits / count) for cache, (hits, count) in totals.items() if count]
+
+
+REGISTRY.register(
+    CallbackGauge(
+        "xiaozhi_cache_hit_ratio",
+        "Cache hit ratio since start",
+        ("cache",),
+        _cache_hit_ratio,
+    )
+)
+
+_connections = None
+
+
+def track_connections(connections):
+    """登记WebSocket服务的活动连接集合，抓取时统计连接数、队列长度和线程池使用率"""
+    global _connections
+    _connections = connections
+
+
+def _snapshot():
+    return list(_connections) if _connections is not None else []
+
+
+def _active_connections():
+    return [((), len(_snapshot()))]
+
+
+def _queue_depth():
+    depth = {"tts_queue": 0, "audio_play_queue": 0}
+    for conn in _snapshot():
+        for name in depth:
+            q = getattr(conn, name, None)
+            if q is not None:
+                depth[name] += q.qsize()
+    return [((name,), value) for name, value in depth.items()]
+
+
+def _executor_stats():
+    workers = busy = pending = 0
+    for conn in _snapshot():
+        executor = getattr(conn, "executor", None)
+        if executor is None:
+            continue
+        workers += executor._max_workers
+        threads = len(getattr(executor, "_threads", ()))
+        idle = getattr(getattr(executor, "_idle_semaphore", None), "_value", 0)
+        busy += max(0, threads - idle)
+        pending += executor._work_queue.qsize()
+    return workers, busy, pending
+
+
+def _executor_metrics():
+    workers, busy, pending = _executor_stats()
+    return [
+        (("workers",), workers),
+        (("busy",), busy),
+        (("pending",), pending),
+    ]
+
+
+def _executor_utilization():
+    workers, busy, _ = _executor_stats()
+    return [((), busy / workers if workers else 0.0)]
+
+
+REGISTRY.register(
+    CallbackGauge(
+        "xiaozhi_active_connections", "Active websocket connections", (), _active_connections
+    )
+)
+REGISTRY.register(
+    CallbackGauge(
+        "xiaozhi_queue_depth", "Items waiting in per-connection queues", ("queue",), _queue_depth
+    )
+)
+REGISTRY.register(
+    CallbackGauge(
+        "xiaozhi_executor_threads",
+        "Per-connection thread pool workers, busy workers and pending tasks",
+        ("state",),
+        _executor_metrics,
+    )
+)
+REGISTRY.register(
+    CallbackGauge(
+        "xiaozhi_executor_utilization",
+        "Busy workers divided by max workers across connections",
+        (),
+        _executor_utilization,
+    )
+)
+
+
+def render():
+    return REGISTRY.render()
+
+
+async def handle_metrics(request):
+    return web.Response(
+        body=render().encode("utf-8"),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+def metrics_path(config):
+    return (config.get("metrics") or {}).get("path", "/metrics")
+
+
+def metrics_port(config):
+    """单独监听的端口，0表示挂在OTA服务上"""
+    metrics_config = config.get("metrics") or {}
+    if not metrics_config.get("enabled", True):
+        return 0
+    return int(metrics_config.get("port") or 0)
+
+
+async def start_metrics_server(config):
+    """在单独的端口上提供指标接口"""
+    host = (config.get("metrics") or {}).get("ip") or config["server"].get("ip", "0.0.0.0")
+    port = metrics_port(config)
+    app = web.Application()
+    app.add_routes([web.get(metrics_path(config), handle_metrics)])
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await runner.cleanup()
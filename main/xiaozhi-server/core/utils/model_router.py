@@ -0,0 +1,195 @@
+"""
+按问题复杂度选择模型
+
+根据问题长度、关键词、是否可能调用工具和一个本地线性打分器判断问题复杂度：
+简单的闲聊交给小模型，知识问答、需要调用工具的问题交给大模型。
+每条路由的首字延迟和估算费用会定期汇总输出到日志。
+"""
+
+import re
+import time
+import threading
+from collections import deque
+from config.logger import setup_logging
+from core.utils.context_window import estimate_tokens
+
+TAG = __name__
+logger = setup_logging()
+
+ROUTE_SMALL = "small"
+ROUTE_LARGE = "large"
+
+PUNCTUATION_PATTERN = re.compile(r"[\s，。！？、,.!?~～…]+")
+
+# 直接使用小模型的简单短语
+DEFAULT_SIMPLE_PHRASES = [
+    "你好", "您好", "嗨", "哈喽", "在吗", "好的", "好", "嗯", "嗯嗯", "谢谢",
+    "谢谢你", "知道了", "晚安", "早上好", "拜拜", "再见", "哈哈", "是的", "对",
+    "不是", "没事", "你是谁", "你叫什么名字",
+]
+
+# 需要知识或推理的问题，交给大模型
+DEFAULT_COMPLEX_KEYWORDS = [
+    "为什么", "怎么", "如何", "原理", "解释", "区别", "分析", "比较", "总结",
+    "翻译", "计算", "写一", "编程", "代码", "步骤", "历史", "推荐", "建议",
+]
+
+# 可能触发工具调用的词，小模型的函数调用能力较弱，交给大模型
+DEFAULT_TOOL_KEYWORDS = [
+    "播放", "音乐", "歌", "天气", "新闻", "打开", "关闭", "调高", "调低",
+    "设置", "提醒", "闹钟", "音量", "退出", "角色", "切换", "查询", "搜索",
+]
+
+# 本地线性打分器的默认权重，得分大于0判定为复杂问题
+DEFAULT_CLASSIFIER_WEIGHTS = {
+    "bias": -1.5,
+    # 每个有效字符
+    "length": 0.08,
+    # 包含问号
+    "question": 0.4,
+    # 包含数字
+    "digit": 0.5,
+    # 包含英文单词
+    "latin": 0.5,
+    # 包含多个分句
+    "clauses": 0.6,
+}
+
+
+class RouteStats:
+    """记录每条路由的首字延迟和估算费用，全部连接共用"""
+
+    def __init__(self, window=200):
+        self.lock = threading.Lock()
+        self.window = window
+        self.routes = {}
+        self.turns = 0
+
+    def record(self, route, model, latency, tokens, cost):
+        with self.lock:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = {
+                    "model": model,
+                    "count": 0,
+                    "tokens": 0,
+                    "cost": 0.0,
+                    "latencies": deque(maxlen=self.window),
+                }
+                self.routes[route] = stats
+            stats["count"] += 1
+            stats["tokens"] += tokens
+            stats["cost"] += cost
+            if latency is not None:
+                stats["latencies"].append(latency)
+            self.turns += 1
+            return self.turns
+
+    def summary(self):
+        with self.lock:
+            result = {}
+            for route, stats in self.routes.items():
+                ordered = sorted(stats["latencies"])
+
+                def percentile(p):
+                    if not ordered:
+                        return None
+                    index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+                    return round(ordered[index] * 1000)
+
+                result[route] = {
+                    "model": stats["model"],
+                    "count": stats["count"],
+                    "p50_ms": percentile(50),
+                    "p90_ms": percentile(90),
+                    "tokens": stats["tokens"],
+                    "cost": round(stats["cost"], 4),
+                }
+            return result
+
+
+route_stats = RouteStats()
+
+
+class ModelRouter:
+    def __init__(self, config, large_llm, small_llm, large_name, small_name):
+        self.llms = {ROUTE_LARGE: large_llm, ROUTE_SMALL: small_llm}
+        self.models = {ROUTE_LARGE: large_name, ROUTE_SMALL: small_name}
+        # 不超过该字数的问题才可能交给小模型
+        self.max_simple_length = int(config.get("max_simple_length", 15))
+        self.simple_phrases = set(config.get("simple_phrases") or DEFAULT_SIMPLE_PHRASES)
+        self.complex_keywords = config.get("complex_keywords") or DEFAULT_COMPLEX_KEYWORDS
+        self.tool_keywords = config.get("tool_keywords") or DEFAULT_TOOL_KEYWORDS
+        self.weights = dict(DEFAULT_CLASSIFIER_WEIGHTS)
+        self.weights.update(config.get("classifier_weights") or {})
+        # 每千token的价格，用于估算费用
+        prices = config.get("price_per_1k_tokens") or {}
+        self.prices = {
+            ROUTE_LARGE: float(prices.get(ROUTE_LARGE, 0)),
+            ROUTE_SMALL: float(prices.get(ROUTE_SMALL, 0)),
+        }
+        # 每隔多少轮对话输出一次路由统计，0表示不输出
+        self.report_interval = int(config.get("report_interval", 50))
+
+    def classify(self, query, tool_call=False):
+        """返回small或large"""
+        # 工具调用结果需要大模型继续处理
+        if tool_call or not query:
+            return ROUTE_LARGE
+        text = PUNCTUATION_PATTERN.sub("", query)
+        if text in self.simple_phrases:
+            return ROUTE_SMALL
+        if len(text) > self.max_simple_length:
+            return ROUTE_LARGE
+        if any(keyword in query for keyword in self.complex_keywords):
+            return ROUTE_LARGE
+        if any(keyword in query for keyword in self.tool_keywords):
+            return ROUTE_LARGE
+        return ROUTE_LARGE if self.score(query, text) > 0 else ROUTE_SMALL
+
+    def score(self, query, text):
+        """本地线性打分器，得分越高问题越复杂"""
+        w = self.weights
+        clauses = len([s for s in re.split(r"[，,。；;]", query) if s.strip()])
+        return (
+            w["bias"]
+            + w["length"] * len(text)
+            + w["question"] * ("?" in query or "？" in query or "吗" in query)
+            + w["digit"] * bool(re.search(r"\d", query))
+            + w["latin"] * bool(re.search(r"[A-Za-z]{2,}", query))
+            + w["clauses"] * (clauses > 1)
+        )
+
+    def select(self, query, tool_call=False):
+        """返回 (路由名称, LLM实例)"""
+        route = self.classify(query, tool_call)
+        logger.bind(tag=TAG).debug(f"模型路由: {route} <- {query}")
+        return route, self.llms[route]
+
+    def track(self, route, responses, dialogue):
+        """包装LLM的流式输出，统计首字延迟和估算费用"""
+        start = time.monotonic()
+        first_token = None
+        output_tokens = 0
+        try:
+            for chunk in responses:
+                if isinstance(chunk, tuple):
+                    content, tool_calls = chunk
+                else:
+                    content, tool_calls = chunk, None
+                if first_token is None and (content or tool_calls):
+                    first_token = time.monotonic() - start
+                if isinstance(content, str):
+                    output_tokens += estimate_tokens(content)
+                yield chunk
+        finally:
+            prompt_tokens = sum(
+                estimate_tokens(m.get("content") or "") for m in dialogue
+            )
+            tokens = prompt_tokens + output_tokens
+            cost = tokens / 1000 * self.prices[route]
+            turns = route_stats.record(
+                route, self.models[route], first_token, tokens, cost
+            )
+            if self.report_interval > 0 and turns % self.report_interval == 0:
+                logger.bind(tag=TAG).info(f"模型路由统计: {route_stats.summary()}")
@@ -0,0 +1,150 @@
+"""
+模块实例池
+
+设备的差异化配置相同时（例如同一个智能体下的多个设备）共用同一组TTS、LLM、ASR、VAD和
+意图识别实例，不再每个连接重新创建，本地ASR、VAD模型也只加载一次。
+记忆实例保存了所属设备的记忆，仍然每个连接单独创建。
+- 实例按模块类型和配置内容的哈希查找，配置任何一项不同都会创建新的实例
+- 每个连接通过ProviderLease借用实例，连接关闭时归还；没有连接使用的实例保留idle_ttl秒，
+  空闲实例超过max_idle个时先回收最久没有使用的
+- 同一配置的实例同时只创建一次，其他连接等待创建完成
+共用的实例和服务启动时创建的默认实例一样，不能保存单个连接的状态。
+"""
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from config.logger import setup_logging
+from core.utils.metrics import record_cache
+
+TAG = __name__
+logger = setup_logging()
+
+
+def provider_key(module, provider_type, config, *extra):
+    """模块实例的键，由模块类型、实现类型、配置和其他构造参数的规范化JSON计算"""
+    canonical = json.dumps(
+        [module, provider_type, config, extra],
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return f"{module}:{provider_type}:" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class PoolEntry:
+    __slots__ = ("instance", "refs", "last_used", "ready", "error")
+
+    def __init__(self):
+        self.instance = None
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.ready = threading.Event()
+        self.error = None
+
+
+class ProviderPool:
+    def __init__(self, config):
+        pool_config = config.get("provider_pool") or {}
+        self.enabled = bool(pool_config.get("enabled", True))
+        self.idle_ttl = float(pool_config.get("idle_ttl", 600))
+        self.max_idle = int(pool_config.get("max_idle", 32))
+        self.lock = threading.Lock()
+        self.entries = {}
+        # 没有连接使用的实例，按最近使用时间排列
+        self.idle = OrderedDict()
+        self.stats = {"created": 0, "reused": 0, "evicted": 0}
+
+    def acquire(self, key, factory):
+        if not self.enabled:
+            return factory()
+        with self.lock:
+            entry = self.entries.get(key)
+            creator = entry is None
+            if creator:
+                entry = PoolEntry()
+                self.entries[key] = entry
+            entry.refs += 1
+            self.idle.pop(key, None)
+        if creator:
+            try:
+                entry.instance = factory()
+                self.stats["created"] += 1
+                record_cache("provider_pool", False)
+            except Exception as e:
+                entry.error = e
+                with self.lock:
+                    self.entries.pop(key, None)
+                raise
+            finally:
+                entry.ready.set()
+        else:
+            entry.ready.wait()
+            if entry.error is not None:
+                raise entry.error
+            self.stats["reused"] += 1
+            record_cache("provider_pool", True)
+            logger.bind(tag=TAG).debug(f"复用模块实例: {key}")
+        return entry.instance
+
+    def release(self, key):
+        if not self.enabled:
+            return
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            entry.refs -= 1
+            if entry.refs <= 0:
+                entry.refs = 0
+                entry.last_used = time.monotonic()
+                self.idle[key] = entry
+            self._evict_idle()
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        while self.idle:
+            key, entry = next(iter(self.idle.items()))
+            if len(self.idle) <= self.max_idle and now - entry.last_used < self.idle_ttl:
+                break
+            del self.idle[key]
+            del self.entries[key]
+            self.stats["evicted"] += 1
+            logger.bind(tag=TAG).info(f"回收空闲的模块实例: {key}")
+
+    def lease(self):
+        return ProviderLease(self)
+
+
+class ProviderLease:
+    """一个连接从实例池借用的实例，连接关闭时一起归还"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.keys = []
+
+    def acquire(self, key, factory):
+        instance = self.pool.acquire(key, factory)
+        self.keys.append(key)
+        return instance
+
+    def release(self):
+        keys, self.keys = self.keys, []
+        for key in keys:
+            self.pool.release(key)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_provider_pool(config):
+    """获取进程内共用的模块实例池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProviderPool(config)
+        return _pool
@@ -0,0 +1,356 @@
+"""
+聊天记录上报
+
+所有连接共用一个后台上报器，把ASR、TTS的聊天记录批量上报到manager-api：
+- 有上限的队列，积压超过高水位时按策略降级：只报文字不报音频、按比例采样或直接丢弃；
+  队列满时丢弃最早的记录
+- 多条记录合并成一次请求；manager-api不支持批量接口时逐条上报
+- 上报失败短暂重试，仍然失败时写入磁盘，服务恢复后补报
+- 音频编码和网络请求都在后台线程的事件循环中进行，不占用连接的线程
+- audio_format为ogg时音频原样封装成Ogg/Opus，以multipart二进制上传，不做base64编码；
+  manager-api不支持multipart或批量接口时改为WAV的base64上报
+"""
+
+import os
+import json
+import time
+import random
+import base64
+import asyncio
+import threading
+from collections import deque
+import httpx
+from config.logger import setup_logging
+from config.config_loader import get_project_dir
+from core.utils.ogg_opus import ogg_to_opus
+
+TAG = __name__
+logger = setup_logging()
+
+REPORT_ENDPOINT = "agent/chat-history/report"
+BATCH_ENDPOINT = "agent/chat-history/report/batch"
+
+
+class UploadError(Exception):
+    pass
+
+
+class ChatHistoryUploader:
+    def __init__(self, config, encode_audio, fallback_encode=None):
+        api_config = config.get("manager-api") or {}
+        report_config = config.get("chat_history_report") or {}
+        # 把opus数据包列表编码为上报的音频字节
+        self.encode_audio = encode_audio
+        # manager-api不支持multipart时改用的编码（WAV），Ogg音频也会转换成该格式再上报
+        self.fallback_encode = fallback_encode
+        self.audio_format = report_config.get("audio_format", "wav")
+        self.base_url = api_config.get("url", "")
+        self.secret = api_config.get("secret", "")
+        self.timeout = float(api_config.get("timeout", 30))
+        self.batch_size = int(report_config.get("batch_size", 20))
+        self.batch_interval = float(report_config.get("batch_interval", 1.0))
+        self.max_pending = int(report_config.get("max_pending", 2000))
+        self.high_watermark = float(report_config.get("high_watermark", 0.8))
+        # 积压超过高水位时的策略：drop_audio只报文字，sample按sample_rate采样，drop丢弃新记录
+        self.overload_policy = report_config.get("overload_policy", "drop_audio")
+        self.sample_rate = float(report_config.get("sample_rate", 0.2))
+        self.max_retries = int(report_config.get("max_retries", 2))
+        self.retry_delay = float(report_config.get("retry_delay", 1.0))
+        spill_dir = report_config.get("spill_dir") or "data/report_spill"
+        if not os.path.isabs(spill_dir):
+            spill_dir = get_project_dir() + spill_dir
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = int(float(report_config.get("max_spill_mb", 200)) * 1024 * 1024)
+        self.replay_interval = float(report_config.get("replay_interval", 30))
+
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.batch_supported = True
+        # 旧版manager-api不支持multipart上报时改用base64 JSON
+        self.multipart_supported = self.audio_format == "ogg"
+        self.stats = {"sent": 0, "dropped": 0, "degraded": 0, "sampled_out": 0, "spilled": 0}
+
+        self.loop = asyncio.new_event_loop()
+        self.wakeup = None
+        ready = threading.Event()
+        threading.Thread(
+            target=self._run_loop, args=(ready,), name="ChatHistoryUploader", daemon=True
+        ).start()
+        ready.wait()
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.wakeup = asyncio.Event()
+        self.loop.call_soon(ready.set)
+        self.loop.run_until_complete(self._run())
+
+    def submit(self, mac_address, session_id, chat_type, content, opus_data):
+        """加入上报队列，可以在任意线程调用"""
+        if not content:
+            return
+        item = {
+            "macAddress": mac_address,
+            "sessionId": session_id,
+            "chatType": chat_type,
+            "content": content,
+            "opus": opus_data or None,
+        }
+        with self.lock:
+            size = len(self.pending)
+            if size >= self.max_pending:
+                self.pending.popleft()
+                self.stats["dropped"] += 1
+            elif size >= self.max_pending * self.high_watermark:
+                if self.overload_policy == "drop_audio":
+                    item["opus"] = None
+                    self.stats["degraded"] += 1
+                elif self.overload_policy == "sample":
+                    if random.random() >= self.sample_rate:
+                        self.stats["sampled_out"] += 1
+                        return
+                elif self.overload_policy == "drop":
+                    self.stats["dropped"] += 1
+                    return
+            self.pending.append(item)
+            notify = len(self.pending) >= self.batch_size
+        if notify:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    def _take_batch(self):
+        with self.lock:
+            count = min(self.batch_size, len(self.pending))
+            return [self.pending.popleft() for _ in range(count)]
+
+    def _encode(self, batch):
+        """opus转为上报的音频格式，在线程池中执行"""
+        payload = []
+        for item in batch:
+            audio = None
+            if item["opus"]:
+                try:
+                    audio = self.encode_audio(item["opus"])
+                except Exception as e:
+                    logger.bind(tag=TAG).warning(f"上报音频编码失败，只上报文字: {e}")
+            payload.append(
+                {
+                    "macAddress": item["macAddress"],
+                    "sessionId": item["sessionId"],
+                    "chatType": item["chatType"],
+                    "content": item["content"],
+                    "audio": audio,
+                }
+            )
+        return payload
+
+    @staticmethod
+    def _to_json(record):
+        record = dict(record)
+        audio = record.pop("audio")
+        record["audioBase64"] = base64.b64encode(audio).decode("utf-8") if audio else None
+        return record
+
+    def _fallback_audio(self, record):
+        """不支持multipart的manager-api只接受WAV，已经封装为Ogg的音频转换后再上报"""
+        audio = record["audio"]
+        if audio and audio[:4] == b"OggS" and self.fallback_encode is not None:
+            try:
+                record["audio"] = self.fallback_encode(ogg_to_opus(audio))
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"上报音频转换失败，只上报文字: {e}")
+                record["audio"] = None
+        return record
+
+    def _disable_multipart(self):
+        if self.multipart_supported:
+            self.multipart_supported = False
+            if self.fallback_encode is not None:
+                self.encode_audio = self.fallback_encode
+
+    @staticmethod
+    def _from_json(record):
+        audio = record.pop("audioBase64", None)
+        record["audio"] = base64.b64decode(audio) if audio else None
+        return record
+
+    def _multipart(self, payload):
+        """每条记录的音频作为一个文件字段，记录列表作为JSON字段"""
+        reports, files = [], []
+        for i, record in enumerate(payload):
+            report = {k: v for k, v in record.items() if k != "audio"}
+            if record["audio"]:
+                report["audioPart"] = f"audio{i}"
+                files.append((f"audio{i}", (f"audio{i}.ogg", record["audio"], "audio/ogg")))
+            reports.append(report)
+        reports = json.dumps(reports, ensure_ascii=False).encode("utf-8")
+        return [("reports", (None, reports, "application/json"))] + files
+
+    async def _post(self, client, endpoint, body):
+        response = None
+        if endpoint == BATCH_ENDPOINT and self.multipart_supported:
+            response = await client.post(endpoint, files=self._multipart(body))
+            if response.status_code == 415:
+                logger.bind(tag=TAG).info("manager-api不支持multipart上报，改为base64上报")
+                self._disable_multipart()
+                response = None
+        if response is None:
+            if endpoint == BATCH_ENDPOINT:
+                body = [self._to_json(self._fallback_audio(record)) for record in body]
+            else:
+                body = self._to_json(self._fallback_audio(body))
+            response = await client.post(endpoint, json=body)
+        if response.status_code == 404 and endpoint == BATCH_ENDPOINT:
+            raise FileNotFoundError(endpoint)
+        if response.status_code in (408, 429) or response.status_code >= 500:
+            raise UploadError(f"HTTP {response.status_code}")
+        response.raise_for_status()
+        result = response.json()
+        if result.get("code") != 0:
+            # 业务错误（例如设备未绑定智能体）重试也不会成功，直接放弃
+            logger.bind(tag=TAG).warning(f"聊天记录上报被拒绝: {result.get('msg')}")
+
+    async def _send(self, client, payload):
+        """上报一批记录，网络错误重试max_retries次后抛出UploadError"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self.batch_supported:
+                    try:
+                        await self._post(client, BATCH_ENDPOINT, payload)
+                        return
+                    except FileNotFoundError:
+                        logger.bind(tag=TAG).info("manager-api不支持批量上报，改为逐条上报")
+                        self.batch_supported = False
+                        # 逐条上报的接口只接受base64 JSON
+                        self._disable_multipart()
+                # 逐条上报时跳过已经成功的记录，重试只发送剩下的
+                while payload:
+                    await self._post(client, REPORT_ENDPOINT, payload[0])
+                    payload = payload[1:]
+                return
+            except (httpx.TransportError, UploadError) as e:
+                if attempt >= self.max_retries:
+                    raise UploadError(str(e))
+                await asyncio.sleep(self.retry_delay * (2**attempt))
+            except httpx.HTTPStatusError as e:
+                logger.bind(tag=TAG).warning(f"聊天记录上报失败，已放弃: {e}")
+                return
+
+    def _spill_size(self):
+        try:
+            return sum(
+                os.path.getsize(os.path.join(self.spill_dir, f))
+                for f in os.listdir(self.spill_dir)
+            )
+        except FileNotFoundError:
+            return 0
+
+    def _spill_data(self, payload):
+        return "".join(
+            json.dumps(self._to_json(p), ensure_ascii=False) + "\n" for p in payload
+        )
+
+    @staticmethod
+    def _write_spill(path, data):
+        """先写临时文件再替换，中途退出不会留下不完整的暂存文件"""
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+
+    def _spill(self, payload):
+        """上报失败的记录写入磁盘，服务恢复后补报"""
+        data = self._spill_data(payload)
+        if self._spill_size() + len(data) > self.max_spill_bytes:
+            self.stats["dropped"] += len(payload)
+            logger.bind(tag=TAG).error(f"上报暂存目录已满，丢弃 {len(payload)} 条聊天记录")
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = os.path.join(self.spill_dir, f"spill-{time.time_ns()}.jsonl")
+        self._write_spill(path, data)
+        self.stats["spilled"] += len(payload)
+        logger.bind(tag=TAG).warning(f"聊天记录上报失败，{len(payload)} 条已暂存到磁盘")
+
+    async def _replay(self, client):
+        """补报磁盘上暂存的记录，遇到失败时停止，下次再试"""
+        try:
+            files = sorted(f for f in os.listdir(self.spill_dir) if f.endswith(".jsonl"))
+        except FileNotFoundError:
+            return
+        for name in files:
+            path = os.path.join(self.spill_dir, name)
+            with open(path, "r", encoding="utf-8") as f:
+                payload = [self._from_json(json.loads(line)) for line in f if line.strip()]
+            total = len(payload)
+            while payload:
+                batch = payload[: self.batch_size]
+                await self._send(client, batch)
+                payload = payload[len(batch) :]
+                self.stats["sent"] += len(batch)
+                # 已经补报的记录立即从文件中去掉，中途失败时下次只补报剩下的，不会重复上报
+                if payload:
+                    await asyncio.to_thread(
+                        self._write_spill, path, self._spill_data(payload)
+                    )
+            os.remove(path)
+            logger.bind(tag=TAG).info(f"已补报暂存的 {total} 条聊天记录")
+
+    async def _run(self):
+        client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={
+                "User-Agent": f"PythonClient/2.0 (PID:{os.getpid()})",
+                "Accept": "application/json",
+                "Authorization": "Bearer " + self.secret,
+            },
+            timeout=self.timeout,
+        )
+        last_replay = 0.0
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.batch_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    break
+                payload = await asyncio.to_thread(self._encode, batch)
+                try:
+                    await self._send(client, payload)
+                    self.stats["sent"] += len(payload)
+                except UploadError:
+                    await asyncio.to_thread(self._spill, payload)
+                    break
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"聊天记录上报异常: {e}")
+            if time.monotonic() - last_replay >= self.replay_interval:
+                last_replay = time.monotonic()
+                try:
+                    await self._replay(client)
+                except Exception as e:
+                    logger.bind(tag=TAG).debug(f"补报暂存的聊天记录失败，稍后重试: {e}")
+
+    def close(self):
+        """服务退出时把队列中还没上报的记录写入磁盘"""
+        with self.lock:
+            batch = list(self.pending)
+            self.pending.clear()
+        if batch:
+            self._spill(self._encode(batch))
+
+
+_uploader = None
+_uploader_lock = threading.Lock()
+
+
+def get_chat_history_uploader(config, encode_audio=None, fallback_encode=None):
+    """获取所有连接共用的聊天记录上报器"""
+    global _uploader
+    with _uploader_lock:
+        if _uploader is None and encode_audio is not None:
+            _uploader = ChatHistoryUploader(config, encode_audio, fallback_encode)
+        return _uploader
+
+
+def close_chat_history_uploader():
+    if _uploader is not None:
+        _uploader.close()
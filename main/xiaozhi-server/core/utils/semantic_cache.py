@@ -0,0 +1,266 @@
+"""
+语义回复缓存
+
+很多设备会问同样的问题，例如“你是谁”“讲个笑话”。对白名单中的非个人化意图，
+用本地CPU向量模型把问题向量化，在 (问题, 回答, 音频) 缓存中查找相似问题，
+命中时直接播放缓存的回答音频，跳过LLM和TTS。
+
+- 按系统提示词、TTS音色和音频格式分区，不同角色之间不会串用回答
+- 每个条目有TTL，分区内超过上限时淘汰最久未使用的条目
+- 一个意图可以缓存多个不同的回答（例如笑话），命中时随机选择一个
+"""
+
+import hashlib
+import random
+import threading
+import time
+import numpy as np
+from config.logger import setup_logging
+from core.utils.metrics import record_cache
+from core.utils.embedding import get_embedder
+
+TAG = __name__
+logger = setup_logging()
+
+# 默认的白名单意图及示例问题，只包含与用户个人信息无关、回答不随时间变化的问题
+DEFAULT_INTENTS = {
+    "identity": {
+        "examples": ["你是谁", "你到底是谁", "你叫什么名字", "介绍一下你自己", "你是什么"],
+        "ttl": 86400,
+        "variants": 1,
+    },
+    "joke": {
+        "examples": ["讲个笑话", "说个笑话", "说一个笑话吧", "给我讲一个笑话", "来个笑话"],
+        "ttl": 86400,
+        "variants": 5,
+    },
+    "story": {
+        "examples": ["讲个故事", "给我讲一个故事", "说个故事"],
+        "ttl": 86400,
+        "variants": 3,
+    },
+}
+
+# 包含这些词的问题与用户个人信息或对话上下文有关，不使用缓存
+DEFAULT_PERSONAL_KEYWORDS = ["我叫", "我的", "我是", "我家", "记得", "上次", "刚才", "昨天"]
+
+
+class CacheEntry:
+    __slots__ = ("intent", "query", "vector", "segments", "created_at", "last_used")
+
+    def __init__(self, intent, query, vector, segments):
+        self.intent = intent
+        self.query = query
+        self.vector = vector
+        # [(文本, 音频数据列表)]，按播放顺序排列
+        self.segments = segments
+        self.created_at = time.time()
+        self.last_used = self.created_at
+
+    @property
+    def answer(self):
+        return "".join(text for text, _ in self.segments)
+
+
+class Partition:
+    """一个分区内的缓存条目和查询向量矩阵"""
+
+    def __init__(self):
+        self.entries = []
+        self.matrix = None
+
+    def set_entries(self, entries):
+        self.entries = entries
+        self.matrix = np.stack([e.vector for e in entries]) if entries else None
+
+
+class PendingEntry:
+    """本轮对话等待写入缓存的回答，TTS逐段完成后收集音频，全部完成后写入"""
+
+    def __init__(self, cache, partition_key, intent, query, vector):
+        self.cache = cache
+        self.partition_key = partition_key
+        self.intent = intent
+        self.query = query
+        self.vector = vector
+        self.segments = {}
+        self.first_index = None
+        self.last_index = None
+
+    def finish(self, first_index, last_index):
+        """LLM输出结束，记录本轮的分段范围"""
+        self.first_index = first_index
+        self.last_index = last_index
+        return self._try_commit()
+
+    def add_segment(self, text_index, text, audio_datas):
+        """TTS完成一个分段，返回是否已经写入缓存"""
+        if not audio_datas:
+            return False
+        self.segments[text_index] = (text, audio_datas)
+        return self._try_commit()
+
+    def _try_commit(self):
+        if self.last_index is None or self.first_index is None:
+            return False
+        if self.first_index < 0:
+            return True
+        indexes = range(self.first_index, self.last_index + 1)
+        if any(i not in self.segments for i in indexes):
+            return False
+        segments = [self.segments[i] for i in indexes]
+        self.cache.put(
+            self.partition_key, self.intent, self.query, self.vector, segments
+        )
+        return True
+
+
+class SemanticCache:
+    def __init__(self, config):
+        self.embedder = get_embedder(config)
+        # 问题与已知问题的相似度不低于该值时视为同一意图
+        self.threshold = float(config.get("threshold", 0.75))
+        # 每个分区最多缓存的回答数
+        self.max_entries = int(config.get("max_entries", 200))
+        # 最多保留的分区数（角色、音色的组合）
+        self.max_partitions = int(config.get("max_partitions", 50))
+        self.default_ttl = float(config.get("ttl", 86400))
+        self.personal_keywords = (
+            config.get("personal_keywords") or DEFAULT_PERSONAL_KEYWORDS
+        )
+
+        self.intents = {}
+        example_vectors, example_intents = [], []
+        for name, intent in (config.get("intents") or DEFAULT_INTENTS).items():
+            self.intents[name] = {
+                "ttl": float(intent.get("ttl", self.default_ttl)),
+                "variants": max(1, int(intent.get("variants", 1))),
+            }
+            for example in intent.get("examples") or []:
+                example_vectors.append(self.embedder.encode(example))
+                example_intents.append(name)
+        self.example_matrix = np.stack(example_vectors) if example_vectors else None
+        self.example_intents = example_intents
+
+        self.partitions = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def partition_key(*parts):
+        """用系统提示词、TTS音色等计算分区键"""
+        raw = "\x00".join("" if p is None else str(p) for p in parts)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _match_intent(self, partition, vector):
+        """在示例问题和已缓存问题中查找最相似的意图"""
+        best_intent, best_score = None, self.threshold
+        if self.example_matrix is not None:
+            scores = self.example_matrix @ vector
+            i = int(np.argmax(scores))
+            if scores[i] >= best_score:
+                best_intent, best_score = self.example_intents[i], scores[i]
+        if partition is not None and partition.matrix is not None:
+            scores = partition.matrix @ vector
+            i = int(np.argmax(scores))
+            if scores[i] >= best_score:
+                best_intent = partition.entries[i].intent
+        return best_intent
+
+    def _expire(self, partition, now):
+        alive = [
+            e
+            for e in partition.entries
+            if now - e.created_at < self.intents.get(e.intent, {}).get("ttl", self.default_ttl)
+        ]
+        if len(alive) != len(partition.entries):
+            partition.set_entries(alive)
+
+    def lookup(self, partition_key, query):
+        """
+        返回 (意图, 问题向量, 缓存条目)
+        意图为None表示问题不在白名单中，不使用缓存；条目为None表示未命中，本轮回答可以写入缓存
+        """
+        if any(keyword in query for keyword in self.personal_keywords):
+            return None, None, None
+        vector = self.embedder.encode(query)
+        now = time.time()
+        with self.lock:
+            partition = self.partitions.get(partition_key)
+            if partition is not None:
+                self._expire(partition, now)
+            intent = self._match_intent(partition, vector)
+            if intent is None:
+                return None, vector, None
+            candidates = (
+                [e for e in partition.entries if e.intent == intent]
+                if partition is not None
+                else []
+            )
+            # 回答数量不足时继续生成新的回答，让同一个意图有多种说法
+            if len(candidates) < self.intents[intent]["variants"]:
+                self.misses += 1
+                record_cache("semantic", False)
+                return intent, vector, None
+            entry = random.choice(candidates)
+            entry.last_used = now
+            self.hits += 1
+        record_cache("semantic", True)
+        logger.bind(tag=TAG).info(f"语义缓存命中: {intent} <- {query}")
+        return intent, vector, entry
+
+    def pending(self, partition_key, intent, query, vector):
+        return PendingEntry(self, partition_key, intent, query, vector)
+
+    def put(self, partition_key, intent, query, vector, segments):
+        entry = CacheEntry(intent, query, vector, segments)
+        with self.lock:
+            partition = self.partitions.get(partition_key)
+            if partition is None:
+                if len(self.partitions) >= self.max_partitions:
+                    self._evict_partition()
+                partition = Partition()
+                self.partitions[partition_key] = partition
+            entries = partition.entries + [entry]
+            if len(entries) > self.max_entries:
+                # 淘汰最久未使用的条目
+                entries.sort(key=lambda e: e.last_used)
+                entries = entries[len(entries) - self.max_entries :]
+            partition.set_entries(entries)
+        logger.bind(tag=TAG).info(f"语义缓存写入: {intent} <- {query}")
+
+    def _evict_partition(self):
+        """淘汰最久未使用的分区"""
+
+        def last_used(item):
+            entries = item[1].entries
+            return max((e.last_used for e in entries), default=0)
+
+        key, _ = min(self.partitions.items(), key=last_used)
+        del self.partitions[key]
+
+    def stats(self):
+        with self.lock:
+            return {
+                "partitions": len(self.partitions),
+                "entries": sum(len(p.entries) for p in self.partitions.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache(config):
+    """获取所有连接共用的语义缓存，未开启时返回None"""
+    global _cache
+    cache_config = config.get("semantic_cache") or {}
+    if not cache_config.get("enabled", False):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticCache(cache_config)
+        return _cache
@@ -0,0 +1,130 @@
+"""
+乐观聊天
+
+意图识别（LLM调用）进行的同时提前开始生成聊天回复，LLM的输出先缓存起来：
+- 意图为继续聊天时打开闸门，缓存的输出立即交给TTS，省去一次串行的LLM往返
+- 意图被函数处理时取消聊天，关闭LLM流，并统计多消耗的token
+"""
+
+import queue
+import threading
+from config.logger import setup_logging
+from core.utils.context_window import estimate_tokens
+
+TAG = __name__
+logger = setup_logging()
+
+_END = object()
+
+
+class ChatGate:
+    """意图识别完成前拦住聊天输出的闸门"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self.released = False
+        self.cancelled = False
+
+    def release(self):
+        """放行缓存的输出，闸门已被取消（例如等待超时）时返回False，需要重新发起聊天"""
+        with self._lock:
+            if self.cancelled:
+                return False
+            self.released = True
+        self._event.set()
+        return True
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+        self._event.set()
+
+    def wait(self, timeout=None):
+        """等待意图识别结果，返回是否继续聊天；超时视为取消"""
+        if not self._event.wait(timeout):
+            with self._lock:
+                # 超时和放行同时发生时以放行为准
+                timed_out = not self.released
+                if timed_out:
+                    self.cancelled = True
+            if timed_out:
+                logger.bind(tag=TAG).warning(f"等待意图识别超过 {timeout} 秒，取消乐观聊天")
+        return self.released and not self.cancelled
+
+
+class WasteStats:
+    """统计被取消的乐观聊天多消耗的token"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = 0
+        self.cancelled = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def record_start(self):
+        with self.lock:
+            self.started += 1
+
+    def record_cancel(self, prompt_tokens, completion_tokens):
+        with self.lock:
+            self.cancelled += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            return dict(
+                started=self.started,
+                cancelled=self.cancelled,
+                prompt_tokens=self.prompt_tokens,
+                completion_tokens=self.completion_tokens,
+            )
+
+
+waste_stats = WasteStats()
+
+
+def prefetch(responses, gate, dialogue):
+    """
+    在后台线程中立即开始读取LLM的流式输出并缓存，返回按顺序读取缓存的生成器。
+    闸门被取消时停止读取并关闭LLM流。
+    """
+    waste_stats.record_start()
+    buffer = queue.Queue()
+
+    def run():
+        completion_tokens = 0
+        try:
+            for chunk in responses:
+                if gate.cancelled:
+                    break
+                content = chunk[0] if isinstance(chunk, tuple) else chunk
+                if isinstance(content, str):
+                    completion_tokens += estimate_tokens(content)
+                buffer.put(chunk)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"乐观聊天读取LLM输出出错: {e}")
+        finally:
+            close = getattr(responses, "close", None)
+            if close is not None:
+                close()
+            buffer.put(_END)
+        if gate.cancelled:
+            prompt_tokens = sum(
+                estimate_tokens(m.get("content") or "") for m in dialogue
+            )
+            total = waste_stats.record_cancel(prompt_tokens, completion_tokens)
+            logger.bind(tag=TAG).info(
+                f"乐观聊天已取消，本轮多消耗token（估算）：输入 {prompt_tokens}，"
+                f"输出 {completion_tokens}；累计 {total}"
+            )
+
+    threading.Thread(target=run, name="OptimisticChat", daemon=True).start()
+
+    def drain():
+        while True:
+            chunk = buffer.get()
+            if chunk is _END:
+                break
+            yield chunk
+
+    return drain()
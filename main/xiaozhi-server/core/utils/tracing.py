@@ -0,0 +1,331 @@
+"""
+对话轮次追踪
+
+每轮对话（从说完一句话到播放结束）记录一条追踪，用于排查某个设备的某一轮为什么慢：
+- 根span为turn，下面依次是vad_endpoint、asr、intent、memory、llm（带first_token事件）、
+  每句话的tts和send_audio，设备收到第一帧音频时在turn上记录first_audio_frame事件
+- 按sample_rate采样，devices中的设备全部记录；未采样的轮次不创建任何对象
+- 每条追踪写为一行OTLP JSON（ExportTraceServiceRequest），可以直接导入支持OTLP的工具，
+  也可以用 python trace_summary.py 统计各阶段耗时和关键路径
+- 写文件在后台线程中进行，文件超过max_file_mb后轮转为.1
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import threading
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+SERVICE_NAME = "xiaozhi-server"
+
+
+def _attribute_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _attributes(attributes):
+    return [
+        {"key": key, "value": _attribute_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+class Span:
+    __slots__ = (
+        "trace",
+        "span_id",
+        "parent_id",
+        "name",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "events",
+        "error",
+    )
+
+    def __init__(self, trace, name, parent_id, start_ns=None, attributes=None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes or {}
+        self.events = []
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add_event(self, name, **attributes):
+        self.events.append((time.time_ns(), name, attributes))
+
+    def end(self, error=None, end_ns=None):
+        """结束span，重复调用只记录第一次"""
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        if error is not None:
+            self.error = str(error) or type(error).__name__
+        self.trace.add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end(exc)
+        return False
+
+    def to_otlp(self, trace_id):
+        span = {
+            "traceId": trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _attributes(self.attributes),
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 0},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.events:
+            span["events"] = [
+                {"timeUnixNano": str(ts), "name": name, "attributes": _attributes(attrs)}
+                for ts, name, attrs in self.events
+            ]
+        return span
+
+
+class _NoopSpan:
+    """未采样时使用，所有操作都不做任何事"""
+
+    def set(self, key, value):
+        pass
+
+    def add_event(self, name, **attributes):
+        pass
+
+    def end(self, error=None, end_ns=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, tracer, start_ns=None, **attributes):
+        self.tracer = tracer
+        self.trace_id = os.urandom(16).hex()
+        self.root = Span(self, "turn", None, start_ns, attributes)
+        self.spans = []
+        self.lock = threading.Lock()
+        self.finished = False
+
+    def span(self, name, start_ns=None, **attributes):
+        """在turn下开始一个span，调用end()或用with结束"""
+        return Span(self, name, self.root.span_id, start_ns, attributes)
+
+    def record(self, name, start_ns, end_ns, **attributes):
+        """记录已经结束的span"""
+        Span(self, name, self.root.span_id, start_ns, attributes).end(end_ns=end_ns)
+
+    def add(self, span):
+        with self.lock:
+            # 轮次结束后才结束的span（例如被打断的TTS）不再记录
+            if not self.finished and span is not self.root:
+                self.spans.append(span)
+
+    def finish(self, unfinished=False, **attributes):
+        with self.lock:
+            if self.finished:
+                return
+            self.finished = True
+            spans = list(self.spans)
+        self.root.attributes.update(attributes)
+        if unfinished:
+            # 没有收到播放结束（例如被下一轮打断、意图处理后没有回复），以最后一个span的结束为准
+            self.root.set("turn.unfinished", True)
+            end_ns = max((s.end_ns for s in spans), default=self.root.start_ns)
+        else:
+            end_ns = time.time_ns()
+        self.root.end_ns = end_ns
+        self.tracer.export(self.trace_id, [self.root] + spans)
+
+
+class Tracer:
+    def __init__(self, config):
+        trace_config = config.get("tracing") or {}
+        self.enabled = bool(trace_config.get("enabled", False))
+        self.sample_rate = float(trace_config.get("sample_rate", 0.1))
+        self.devices = set(trace_config.get("devices") or [])
+        self.path = trace_config.get("path", "tmp/traces.jsonl")
+        self.max_file_bytes = int(float(trace_config.get("max_file_mb", 100)) * 1024 * 1024)
+        self.queue = queue.Queue(maxsize=int(trace_config.get("max_pending", 1000)))
+        self.dropped = 0
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start_trace(self, device_id, session_id, start_ns=None, **attributes):
+        """按采样率决定是否追踪本轮，不追踪时返回None"""
+        if not self.enabled:
+            return None
+        if device_id not in self.devices and random.random() >= self.sample_rate:
+            return None
+        return Trace(
+            self, start_ns, **{"device.id": device_id, "session.id": session_id}, **attributes
+        )
+
+    def export(self, trace_id, spans):
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _attributes({"service.name": SERVICE_NAME})},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": TAG},
+                            "spans": [span.to_otlp(trace_id) for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(json.dumps(request, ensure_ascii=False))
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._write_loop, name="trace-writer", daemon=True
+                )
+                self.thread.start()
+
+    def _write_loop(self):
+        while True:
+            line = self.queue.get()
+            if line is None:
+                return
+            lines = [line]
+            # 一次写入已经排队的所有追踪
+            while True:
+                try:
+                    line = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if line is None:
+                    self._write(lines)
+                    return
+                lines.append(line)
+            self._write(lines)
+
+    def _write(self, lines):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_file_bytes:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"写入追踪文件失败: {e}")
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join(timeout=3)
+            self.thread = None
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer(config):
+    """获取进程内共用的追踪器"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(config)
+        return _tracer
+
+
+def close_tracer():
+    if _tracer is not None:
+        _tracer.close()
+
+
+def start_turn(conn, start_ns=None, **attributes):
+    """开始新一轮的追踪，上一轮还没有结束时先结束它"""
+    finish_turn(conn, unfinished=True)
+    conn.trace = get_tracer(conn.config).start_trace(
+        conn.headers.get("device-id"), conn.session_id, start_ns, **attributes
+    )
+    return conn.trace
+
+
+def finish_turn(conn, unfinished=False, **attributes):
+    trace, conn.trace = conn.trace, None
+    if trace is not None:
+        trace.finish(unfinished, **attributes)
+
+
+def discard_turn(conn):
+    """本轮不是一次对话（例如没有识别出文字），丢弃追踪"""
+    conn.trace = None
+
+
+def trace_span(conn, name, **attributes):
+    """在本轮追踪中开始一个span，本轮未采样时返回不做任何事的span"""
+    trace = conn.trace
+    if trace is None:
+        return NOOP_SPAN
+    return trace.span(name, **attributes)
+
+
+def trace_stream(conn, name, iterable, **attributes):
+    """包装流式输出，span覆盖整个输出过程，收到第一段输出时记录first_token事件"""
+    trace = conn.trace
+    if trace is None:
+        return iterable
+    span = trace.span(name, **attributes)
+
+    def wrapper():
+        first = True
+        try:
+            for item in iterable:
+                if first:
+                    first = False
+                    span.add_event("first_token")
+                yield item
+        except Exception as e:
+            span.end(e)
+            raise
+        finally:
+            span.end()
+
+    return wrapper()
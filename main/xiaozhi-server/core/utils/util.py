@@ -9,6 +9,7 @@ import opuslib_next
 from pydub import AudioSegment
 from typing import Dict, Any
 from core.utils import tts, llm, intent, memory, vad, asr
+from core.utils.provider_pool import provider_key
 
 TAG = __name__
 emoji_map = {
@@ -253,18 +254,27 @@ def initialize_modules(
     init_tts=False,
     init_memory=False,
     init_intent=False,
+    lease=None,
 ) -> Dict[str, Any]:
     """
     初始化所有模块组件
 
     Args:
         config: 配置字典
+        lease: 模块实例池的借用记录，传入时配置相同的模块共用实例
 
     Returns:
         Dict[str, Any]: 包含所有初始化后的模块的字典
     """
     modules = {}
 
+    def create(module, provider_type, module_config, factory, *extra):
+        if lease is None:
+            return factory()
+        return lease.acquire(
+            provider_key(module, provider_type, module_config, *extra), factory
+        )
+
     # 初始化TTS模块
     if init_tts:
         select_tts_module = config["selected_module"]["TTS"]
@@ -273,10 +283,15 @@ def initialize_modules(
             if "type" not in config["TTS"][select_tts_module]
             else config["TTS"][select_tts_module]["type"]
         )
-        modules["tts"] = tts.create_instance(
+        delete_audio = str(config.get("delete_audio", True)).lower() in ("true", "1", "yes")
+        modules["tts"] = create(
+            "TTS",
             tts_type,
             config["TTS"][select_tts_module],
-            str(config.get("delete_audio", True)).lower() in ("true", "1", "yes"),
+            lambda: tts.create_instance(
+                tts_type, config["TTS"][select_tts_module], delete_audio
+            ),
+            delete_audio,
         )
         logger.bind(tag=TAG).info(f"初始化组件: tts成功 {select_tts_module}")
 
@@ -288,9 +303,11 @@ def initialize_modules(
             if "type" not in config["LLM"][select_llm_module]
             else config["LLM"][select_llm_module]["type"]
         )
-        modules["llm"] = llm.create_instance(
+        modules["llm"] = create(
+            "LLM",
             llm_type,
             config["LLM"][select_llm_module],
+            lambda: llm.create_instance(llm_type, config["LLM"][select_llm_module]),
         )
         logger.bind(tag=TAG).info(f"初始化组件: llm成功 {select_llm_module}")
 
@@ -302,9 +319,18 @@ def initialize_modules(
             if "type" not in config["Intent"][select_intent_module]
             else config["Intent"][select_intent_module]["type"]
         )
-        modules["intent"] = intent.create_instance(
+        # 意图识别实例会绑定所用的LLM，所用LLM的配置不同时不能共用
+        intent_llm_name = config["Intent"][select_intent_module].get("llm")
+        if intent_llm_name not in config.get("LLM", {}):
+            intent_llm_name = config["selected_module"].get("LLM")
+        modules["intent"] = create(
+            "Intent",
             intent_type,
             config["Intent"][select_intent_module],
+            lambda: intent.create_instance(
+                intent_type, config["Intent"][select_intent_module]
+            ),
+            config.get("LLM", {}).get(intent_llm_name),
         )
         logger.bind(tag=TAG).info(f"初始化组件: intent成功 {select_intent_module}")
 
@@ -316,9 +342,9 @@ def initialize_modules(
             if "type" not in config["Memory"][select_memory_module]
             else config["Memory"][select_memory_module]["type"]
         )
+        # 记忆模块保存了所属设备的role_id和记忆内容，每个连接单独创建，不放入实例池
         modules["memory"] = memory.create_instance(
-            memory_type,
-            config["Memory"][select_memory_module],
+            memory_type, config["Memory"][select_memory_module]
         )
         logger.bind(tag=TAG).info(f"初始化组件: memory成功 {select_memory_module}")
 
@@ -330,9 +356,11 @@ def initialize_modules(
             if "type" not in config["VAD"][select_vad_module]
             else config["VAD"][select_vad_module]["type"]
         )
-        modules["vad"] = vad.create_instance(
+        modules["vad"] = create(
+            "VAD",
             vad_type,
             config["VAD"][select_vad_module],
+            lambda: vad.create_instance(vad_type, config["VAD"][select_vad_module]),
         )
         logger.bind(tag=TAG).info(f"初始化组件: vad成功 {select_vad_module}")
 
@@ -344,10 +372,15 @@ def initialize_modules(
             if "type" not in config["ASR"][select_asr_module]
             else config["ASR"][select_asr_module]["type"]
         )
-        modules["asr"] = asr.create_instance(
+        delete_audio = str(config.get("delete_audio", True)).lower() in ("true", "1", "yes")
+        modules["asr"] = create(
+            "ASR",
             asr_type,
             config["ASR"][select_asr_module],
-            str(config.get("delete_audio", True)).lower() in ("true", "1", "yes"),
+            lambda: asr.create_instance(
+                asr_type, config["ASR"][select_asr_module], delete_audio
+            ),
+            delete_audio,
         )
         logger.bind(tag=TAG).info(f"初始化组件: asr成功 {select_asr_module}")
     return modules
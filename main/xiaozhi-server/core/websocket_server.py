@@ -4,6 +4,7 @@ from config.logger import setup_logging
 from core.connection import ConnectionHandler
 from core.utils.util import initialize_modules, check_vad_update, check_asr_update
 from config.config_loader import get_config_from_api
+from core.utils.metrics import track_connections
 
 TAG = __name__
 
@@ -30,6 +31,7 @@ class WebSocketServer:
         self._intent = modules["intent"] if "intent" in modules else None
         self._memory = modules["memory"] if "memory" in modules else None
         self.active_connections = set()
+        track_connections(self.active_connections)
 
     async def start(self):
         server_config = self.config["server"]
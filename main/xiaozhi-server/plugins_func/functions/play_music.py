@@ -136,13 +136,28 @@ def initialize_music_handler(conn):
             MUSIC_CACHE["music_ext"] = (".mp3", ".wav", ".p3")
             MUSIC_CACHE["refresh_time"] = 60
         # 获取音乐文件列表
-        MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = get_music_files(
-            MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"]
-        )
-        MUSIC_CACHE["scan_time"] = time.time()
+        MUSIC_CACHE["version"] = 0
+        scan_music_files()
+    elif time.time() - MUSIC_CACHE["scan_time"] > MUSIC_CACHE["refresh_time"]:
+        # 意图识别每轮都会调用这里，音乐目录变化后提示词不用等到下次播放音乐才更新
+        scan_music_files()
     return MUSIC_CACHE
 
 
+def scan_music_files():
+    """重新扫描音乐目录，文件列表变化时递增版本号，意图识别提示词据此重新生成"""
+    music_files, music_file_names = get_music_files(
+        MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"]
+    )
+    if music_file_names != MUSIC_CACHE.get("music_file_names"):
+        MUSIC_CACHE["version"] += 1
+    MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = (
+        music_files,
+        music_file_names,
+    )
+    MUSIC_CACHE["scan_time"] = time.time()
+
+
 async def handle_music_command(conn, text):
     initialize_music_handler(conn)
     global MUSIC_CACHE
@@ -153,13 +168,6 @@ async def handle_music_command(conn, text):
 
     # 尝试匹配具体歌名
     if os.path.exists(MUSIC_CACHE["music_dir"]):
-        if time.time() - MUSIC_CACHE["scan_time"] > MUSIC_CACHE["refresh_time"]:
-            # 刷新音乐文件列表
-            MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = (
-                get_music_files(MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"])
-            )
-            MUSIC_CACHE["scan_time"] = time.time()
-
         potential_song = _extract_song_name(clean_text)
         if potential_song:
             best_match = _find_best_match(potential_song, MUSIC_CACHE["music_files"])
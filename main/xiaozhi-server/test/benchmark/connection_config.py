@@ -0,0 +1,117 @@
+"""
+连接配置开销测试
+
+对比每个连接深拷贝整份服务配置与共用服务配置、每个连接一层覆盖：
+- 每个连接常驻的内存
+- 连接建立时处理配置的耗时（创建连接配置、应用差异化配置、打印脱敏后的差异化配置），
+  按每秒1000个连接计算占用的CPU时间
+
+用法（在xiaozhi-server目录下执行）:
+    python test/benchmark/connection_config.py --connections 1000
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import argparse
+import tracemalloc
+import yaml
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+)
+
+from config.session_config import SessionConfig
+from core.connection import filter_sensitive_info
+
+
+def load_server_config():
+    with open("config.yaml", "r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
+def make_private_config(config):
+    """模拟manager-api返回的差异化配置"""
+    private_config = {"selected_module": {}}
+    for module in ("TTS", "LLM", "Memory", "Intent"):
+        name = config["selected_module"][module]
+        private_config[module] = {name: dict(config[module][name])}
+        private_config["selected_module"][module] = name
+    private_config["prompt"] = "你是一个叫小智的台湾女孩"
+    return private_config
+
+
+def apply(session, private_config, nested_write):
+    for module in ("TTS", "LLM", "Memory", "Intent"):
+        session[module] = private_config[module]
+        nested_write(session, module, private_config["selected_module"][module])
+    session["prompt"] = private_config["prompt"]
+    json.dumps(filter_sensitive_info(private_config), ensure_ascii=False)
+
+
+def deepcopy_setup(config, private_config):
+    session = copy.deepcopy(config)
+
+    def nested_write(s, module, value):
+        s["selected_module"][module] = value
+
+    apply(session, private_config, nested_write)
+    # 旧版脱敏前会再深拷贝一次
+    copy.deepcopy(private_config)
+    return session
+
+
+def overlay_setup(config, private_config):
+    session = SessionConfig(config)
+
+    def nested_write(s, module, value):
+        s.override(("selected_module", module), value)
+
+    apply(session, private_config, nested_write)
+    return session
+
+
+def measure(name, setup, config, private_config, connections):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = [setup(config, private_config) for _ in range(connections)]
+    retained = (tracemalloc.get_traced_memory()[0] - before) / connections
+    tracemalloc.stop()
+    del sessions
+
+    costs = []
+    for _ in range(connections):
+        start = time.perf_counter()
+        setup(config, private_config)
+        costs.append((time.perf_counter() - start) * 1000)
+    costs.sort()
+    total = sum(costs)
+    print(
+        f"{name:<10} 每个连接常驻: {retained / 1024:.1f}KB  "
+        f"平均: {total / connections:.3f}ms  p99: {costs[int(connections * 0.99) - 1]:.3f}ms  "
+        f"每秒{connections}个连接占用CPU: {total / 10:.1f}%"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="连接配置开销测试")
+    parser.add_argument("--connections", type=int, default=1000, help="每秒建立的连接数")
+    args = parser.parse_args()
+
+    config = load_server_config()
+    private_config = make_private_config(config)
+    print(f"服务配置JSON大小: {len(json.dumps(config, ensure_ascii=False)) / 1024:.0f}KB")
+    measure("deepcopy", deepcopy_setup, config, private_config, args.connections)
+    measure("overlay", overlay_setup, config, private_config, args.connections)
+
+    # 覆盖不能影响服务配置
+    session = overlay_setup(config, private_config)
+    session.override(("selected_module", "TTS"), "changed")
+    assert config["selected_module"]["TTS"] != "changed"
+    print(f"覆盖的配置项: {session.overridden()}")
+
+
+if __name__ == "__main__":
+    main()
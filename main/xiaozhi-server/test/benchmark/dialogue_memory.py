@@ -0,0 +1,59 @@
+"""
+对话存储内存与耗时测试
+
+模拟一次多轮对话会话，统计Dialogue占用的内存，以及每轮追加消息和生成LLM对话的耗时。
+
+用法（在xiaozhi-server目录下执行）:
+    python test/benchmark/dialogue_memory.py --turns 200
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+)
+
+from core.utils.dialogue import Dialogue, Message
+
+USER_TEXT = "今天天气怎么样，适合出去玩吗？"
+ASSISTANT_TEXT = "今天晴天，气温二十五度，很适合出去玩哦，记得带上水和帽子。"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对话存储内存与耗时测试")
+    parser.add_argument("--turns", type=int, default=200, help="对话轮数")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+
+    dialogue = Dialogue()
+    dialogue.update_system_message("你是小智，一个可爱的语音助手。" * 20)
+    put_cost = 0.0
+    get_cost = 0.0
+    for i in range(args.turns):
+        start = time.perf_counter()
+        dialogue.put(Message(role="user", content=f"{USER_TEXT}{i}"))
+        put_cost += time.perf_counter() - start
+
+        start = time.perf_counter()
+        dialogue.get_llm_dialogue()
+        get_cost += time.perf_counter() - start
+
+        dialogue.put(Message(role="assistant", content=f"{ASSISTANT_TEXT}{i}"))
+
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"对话轮数: {args.turns}")
+    print(f"会话内存占用: {(after - before) / 1024:.1f} KB")
+    print(f"平均每次追加消息: {put_cost / args.turns * 1e6:.2f} us")
+    print(f"平均每次生成LLM对话: {get_cost / args.turns * 1e6:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
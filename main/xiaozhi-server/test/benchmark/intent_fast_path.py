@@ -0,0 +1,112 @@
+"""
+本地快速意图识别准确率与耗时测试
+
+用标注好的测试集评估快速意图识别：
+- 精确率：快速识别给出结果时，函数名和参数都正确的比例
+- 召回率：需要调用函数的样本中，被快速识别正确处理的比例
+- 闲聊误判：应该继续聊天的样本被识别成函数调用的次数
+未被快速识别的样本会交给LLM，不算错误。
+
+用法（在xiaozhi-server目录下执行）:
+    python test/benchmark/intent_fast_path.py
+    python test/benchmark/intent_fast_path.py --cases test/benchmark/data/intent_cases.jsonl -v
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+)
+
+from core.providers.intent.fast_path import IntentFastPath
+from plugins_func.register import all_function_registry
+
+PLUGINS = [
+    "get_time",
+    "get_weather",
+    "get_news_from_newsnow",
+    "handle_device",
+    "handle_exit_intent",
+    "play_music",
+    "change_role",
+]
+
+
+def load_functions():
+    for plugin in PLUGINS:
+        try:
+            importlib.import_module(f"plugins_func.functions.{plugin}")
+        except Exception as e:
+            print(f"跳过插件 {plugin}: {e}")
+    return [item.description for item in all_function_registry.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地快速意图识别准确率与耗时测试")
+    parser.add_argument(
+        "--cases",
+        default=os.path.join(os.path.dirname(__file__), "data", "intent_cases.jsonl"),
+        help="标注测试集，每行一个JSON：text、function、arguments（可选）",
+    )
+    parser.add_argument("--threshold", type=float, default=0.45, help="n-gram相似度阈值")
+    parser.add_argument("-v", "--verbose", action="store_true", help="输出每条样本的结果")
+    args = parser.parse_args()
+
+    functions = load_functions()
+    names = {f["function"]["name"] for f in functions}
+    fast_path = IntentFastPath({"function_threshold": args.threshold})
+
+    with open(args.cases, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    total = len(cases)
+    cases = [c for c in cases if c["function"] == "continue_chat" or c["function"] in names]
+    if len(cases) < total:
+        print(f"注意: {total - len(cases)} 条样本的函数所在插件加载失败，未参与测试")
+
+    resolved = correct = positives = recalled = false_calls = 0
+    costs = []
+    for case in cases:
+        start = time.perf_counter()
+        result = fast_path.classify(case["text"], functions)
+        costs.append((time.perf_counter() - start) * 1000)
+
+        expected = case["function"]
+        if expected != "continue_chat":
+            positives += 1
+        if result is None:
+            status = "交给LLM"
+        else:
+            resolved += 1
+            call = json.loads(result)["function_call"]
+            ok = call["name"] == expected and all(
+                call.get("arguments", {}).get(k) == v
+                for k, v in (case.get("arguments") or {}).items()
+            )
+            if ok:
+                correct += 1
+                recalled += 1
+                status = "正确"
+            else:
+                status = f"错误 {call}"
+            if expected == "continue_chat":
+                false_calls += 1
+        if args.verbose:
+            print(f"{case['text']:<20} 期望: {expected:<24} {status}")
+
+    costs.sort()
+    print(f"样本数: {len(cases)}，需要调用函数: {positives}")
+    print(f"快速识别处理: {resolved}，精确率: {correct / max(resolved, 1):.1%}")
+    print(f"召回率: {recalled / max(positives, 1):.1%}，闲聊误判: {false_calls}")
+    print(
+        f"耗时 平均: {sum(costs) / len(costs):.3f}ms  "
+        f"p99: {costs[int(len(costs) * 0.99) - 1]:.3f}ms  最大: {costs[-1]:.3f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
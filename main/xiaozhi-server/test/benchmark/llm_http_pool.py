@@ -0,0 +1,98 @@
+"""
+LLM HTTP连接池基准测试
+
+在本地启动一个模拟LLM接口的HTTP服务，每个新连接额外等待 --handshake-ms 毫秒，
+模拟公网TCP+TLS握手的耗时，对比每次 requests.post 新建连接与连接池复用长连接的耗时。
+
+用法（在xiaozhi-server目录下执行）:
+    python test/benchmark/llm_http_pool.py --requests 50 --handshake-ms 60
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+)
+
+import requests
+from core.utils.http_pool import get_session, close_all
+
+
+class StandInLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = b"".join(
+            b"data: " + json.dumps({"answer": token}).encode() + b"\n\n"
+            for token in ["你好", "，", "我是", "小智"]
+        )
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SlowHandshakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    handshake_delay = 0.0
+
+    def get_request(self):
+        request = super().get_request()
+        # 每个新连接模拟一次握手耗时
+        time.sleep(self.handshake_delay)
+        return request
+
+
+def run(label, post, url, count):
+    costs = []
+    for _ in range(count):
+        start = time.perf_counter()
+        with post(url, json={"query": "你好"}, stream=True) as r:
+            for _ in r.iter_lines():
+                pass
+        costs.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{label:<12} 平均: {statistics.mean(costs):7.2f}ms  "
+        f"p50: {statistics.median(costs):7.2f}ms  "
+        f"p95: {sorted(costs)[int(len(costs) * 0.95) - 1]:7.2f}ms"
+    )
+    return statistics.mean(costs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM HTTP连接池基准测试")
+    parser.add_argument("--requests", type=int, default=50, help="请求次数")
+    parser.add_argument(
+        "--handshake-ms", type=float, default=60, help="模拟的每次握手耗时(毫秒)"
+    )
+    args = parser.parse_args()
+
+    server = SlowHandshakeServer(("127.0.0.1", 0), StandInLLMHandler)
+    server.handshake_delay = args.handshake_ms / 1000
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat-messages"
+
+    print(f"请求次数: {args.requests}, 模拟握手耗时: {args.handshake_ms}ms")
+    no_pool = run("每次新建连接", requests.post, url, args.requests)
+    pooled = run("连接池复用", get_session(url).post, url, args.requests)
+    print(f"每轮节省: {no_pool - pooled:.2f}ms")
+
+    close_all()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+本地LLM前缀缓存首字延迟测试
+
+使用配置文件中的本地LLM（OllamaLLM、XinferenceLLM等）模拟多轮对话，每轮带上变化的记忆内容，
+分别统计 stable_prefix 开启和关闭时的首字延迟。开启后系统提示词保持不变，记忆附加在最后一条
+用户消息末尾，推理后端可以复用上一轮请求的前缀KV缓存。
+
+用法（在xiaozhi-server目录下执行）:
+    python test/benchmark/llm_prefix_cache.py --llm OllamaLLM --turns 10
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+)
+
+from config.config_loader import load_config
+from core.utils import llm as llm_utils
+from core.utils.dialogue import Dialogue, Message
+
+QUESTIONS = [
+    "今天天气怎么样？",
+    "给我讲个笑话吧",
+    "你喜欢什么颜色？",
+    "帮我想一个周末的安排",
+    "推荐一本适合小朋友的书",
+]
+
+
+def run(llm, prompt, stable_prefix, turns):
+    dialogue = Dialogue()
+    dialogue.stable_prefix = stable_prefix
+    dialogue.update_system_message(prompt)
+    costs = []
+    for i in range(turns):
+        dialogue.put(Message(role="user", content=QUESTIONS[i % len(QUESTIONS)]))
+        # 每轮的记忆内容都不同，模拟记忆模块的检索结果
+        memory_str = f"用户第{i + 1}次提问，上一次提问时间是{i}分钟前"
+        messages = dialogue.get_llm_dialogue_with_memory(memory_str)
+
+        start = time.perf_counter()
+        first_token = None
+        answer = []
+        for content in llm.response("benchmark", messages):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            answer.append(content)
+        costs.append((first_token or time.perf_counter() - start) * 1000)
+        dialogue.put(Message(role="assistant", content="".join(answer)))
+    return costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地LLM前缀缓存首字延迟测试")
+    parser.add_argument("--llm", default="OllamaLLM", help="配置文件中LLM的名称")
+    parser.add_argument("--turns", type=int, default=10, help="对话轮数")
+    args = parser.parse_args()
+
+    config = load_config()
+    llm_config = config["LLM"][args.llm]
+    llm_type = llm_config.get("type", args.llm)
+    # 关闭后台保温，避免干扰测试
+    llm_config = dict(llm_config, keep_warm_interval=0)
+    llm = llm_utils.create_instance(llm_type, llm_config)
+
+    for stable_prefix in (False, True):
+        costs = run(llm, config["prompt"], stable_prefix, args.turns)
+        # 第一轮需要完整计算提示词，只统计后续轮次
+        later = costs[1:] or costs
+        print(
+            f"stable_prefix={str(stable_prefix):<5} "
+            f"首轮: {costs[0]:8.1f}ms  "
+            f"后续平均: {statistics.mean(later):8.1f}ms  "
+            f"后续p50: {statistics.median(later):8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+设备记忆存储耗时测试
+
+对比旧版所有设备共用一个yaml文件与按设备存储的SQLite记忆库：
+- 读取：连接建立时加载一个设备的记忆
+- 写入：连接断开时保存一个设备的记忆
+- 并发写入：多个线程同时保存不同设备的记忆，检查是否有更新丢失
+
+用法（在xiaozhi-server目录下执行）:
+    python test/benchmark/memory_store.py --devices 10000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import yaml
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+)
+
+from core.providers.memory.store import MemoryStore
+
+MEMORY = json.dumps(
+    {
+        "时空档案": {"身份图谱": {"现用名": "小明", "特征标记": ["学生", "喜欢恐龙"]}},
+        "高光语录": ["我最喜欢霸王龙了"],
+    },
+    ensure_ascii=False,
+)
+
+
+def yaml_load(path, role_id):
+    with open(path, "r", encoding="utf-8") as f:
+        all_memory = yaml.safe_load(f) or {}
+    return all_memory.get(role_id, "")
+
+
+def yaml_save(path, role_id, content):
+    with open(path, "r", encoding="utf-8") as f:
+        all_memory = yaml.safe_load(f) or {}
+    all_memory[role_id] = content
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.dump(all_memory, f, allow_unicode=True)
+
+
+def timed(func, samples):
+    costs = []
+    for args in samples:
+        start = time.perf_counter()
+        func(*args)
+        costs.append((time.perf_counter() - start) * 1000)
+    costs.sort()
+    return sum(costs) / len(costs), costs[int(len(costs) * 0.99) - 1]
+
+
+def concurrent_writes(save, load, role_ids, threads):
+    """多个线程同时写入不同设备，返回丢失的更新数"""
+    barrier = threading.Barrier(threads)
+
+    def worker(role_id):
+        barrier.wait()
+        try:
+            save(role_id, f"updated-{role_id}")
+        except Exception:
+            pass
+
+    workers = [threading.Thread(target=worker, args=(r,)) for r in role_ids[:threads]]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    lost = 0
+    for role_id in role_ids[:threads]:
+        try:
+            if load(role_id) != f"updated-{role_id}":
+                lost += 1
+        except Exception:
+            lost += 1
+    return lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description="设备记忆存储耗时测试")
+    parser.add_argument("--devices", type=int, default=10000, help="设备数")
+    parser.add_argument("--samples", type=int, default=20, help="yaml读写的采样次数")
+    parser.add_argument("--threads", type=int, default=8, help="并发写入的线程数")
+    args = parser.parse_args()
+
+    role_ids = [f"device-{i:06d}" for i in range(args.devices)]
+    with tempfile.TemporaryDirectory() as tmp:
+        yaml_path = os.path.join(tmp, ".memory.yaml")
+        db_path = os.path.join(tmp, ".memory.db")
+        with open(yaml_path, "w", encoding="utf-8") as f:
+            yaml.dump({r: MEMORY for r in role_ids}, f, allow_unicode=True)
+
+        start = time.perf_counter()
+        store = MemoryStore(db_path)
+        migrated = store.migrate_yaml(yaml_path)
+        print(
+            f"设备数: {args.devices}，yaml文件: {os.path.getsize(yaml_path) / 1024:.0f}KB，"
+            f"迁移 {migrated} 个设备耗时: {time.perf_counter() - start:.2f}秒"
+        )
+
+        picks = [random.choice(role_ids) for _ in range(args.samples)]
+        avg, p99 = timed(lambda r: yaml_load(yaml_path, r), [(r,) for r in picks])
+        print(f"yaml   读取 平均: {avg:.2f}ms  p99: {p99:.2f}ms")
+        avg, p99 = timed(lambda r: yaml_save(yaml_path, r, MEMORY), [(r,) for r in picks])
+        print(f"yaml   写入 平均: {avg:.2f}ms  p99: {p99:.2f}ms")
+
+        picks = [random.choice(role_ids) for _ in range(args.samples * 50)]
+        avg, p99 = timed(store.get, [(r,) for r in picks])
+        print(f"sqlite 读取 平均: {avg:.3f}ms  p99: {p99:.3f}ms")
+        avg, p99 = timed(lambda r: store.put(r, MEMORY), [(r,) for r in picks])
+        print(f"sqlite 写入 平均: {avg:.3f}ms  p99: {p99:.3f}ms")
+
+        lost = concurrent_writes(
+            lambda r, c: yaml_save(yaml_path, r, c),
+            lambda r: yaml_load(yaml_path, r),
+            role_ids,
+            args.threads,
+        )
+        print(f"yaml   并发写入 {args.threads} 个设备，丢失更新: {lost}")
+        lost = concurrent_writes(store.put, store.get, role_ids, args.threads)
+        print(f"sqlite 并发写入 {args.threads} 个设备，丢失更新: {lost}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+聊天记录上报音频格式对比
+
+把一段opus语音分别转换为WAV（base64 JSON上报）和Ogg/Opus（multipart二进制上报），
+统计每条记录的CPU耗时和请求体大小。
+
+用法（在xiaozhi-server目录下执行）:
+    python test/benchmark/report_audio.py --seconds 5 --reports 200
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import numpy as np
+import httpx
+import opuslib_next
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+)
+
+from core.handle.ttsReportHandle import opus_to_wav
+from core.utils.ogg_opus import opus_to_ogg
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 960  # 60ms
+
+
+def make_opus(seconds):
+    """生成一段类似语音的音频并编码为60ms的opus数据包"""
+    encoder = opuslib_next.Encoder(SAMPLE_RATE, 1, opuslib_next.APPLICATION_VOIP)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    signal = envelope * (np.sin(2 * np.pi * 220 * t) + 0.3 * np.sin(2 * np.pi * 660 * t))
+    signal += 0.05 * np.random.randn(len(t))
+    pcm = (signal / np.abs(signal).max() * 12000).astype(np.int16).tobytes()
+    frame_bytes = FRAME_SAMPLES * 2
+    return [
+        encoder.encode(pcm[i : i + frame_bytes], FRAME_SAMPLES)
+        for i in range(0, len(pcm) - frame_bytes + 1, frame_bytes)
+    ]
+
+
+def request_size(request):
+    return len(request.read()) + sum(len(k) + len(v) + 4 for k, v in request.headers.items())
+
+
+def wav_request(packets):
+    audio = base64.b64encode(opus_to_wav(packets)).decode("utf-8")
+    body = [{"macAddress": "00:11:22:33:44:55", "sessionId": "s", "chatType": 1,
+             "content": "你好", "audioBase64": audio}]
+    return httpx.Request("POST", "http://localhost/agent/chat-history/report/batch", json=body)
+
+
+def ogg_request(packets):
+    reports = [{"macAddress": "00:11:22:33:44:55", "sessionId": "s", "chatType": 1,
+                "content": "你好", "audioPart": "audio0"}]
+    files = [
+        ("reports", (None, json.dumps(reports).encode("utf-8"), "application/json")),
+        ("audio0", ("audio0.ogg", opus_to_ogg(packets), "audio/ogg")),
+    ]
+    return httpx.Request("POST", "http://localhost/agent/chat-history/report/batch", files=files)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="聊天记录上报音频格式对比")
+    parser.add_argument("--seconds", type=float, default=5, help="每条记录的语音时长")
+    parser.add_argument("--reports", type=int, default=200, help="上报次数")
+    args = parser.parse_args()
+
+    packets = make_opus(args.seconds)
+    opus_bytes = sum(len(p) for p in packets)
+    print(f"{args.seconds}秒语音，{len(packets)} 个opus数据包，共 {opus_bytes} 字节")
+    for name, build in (("WAV+base64 JSON", wav_request), ("Ogg/Opus multipart", ogg_request)):
+        start = time.process_time()
+        for _ in range(args.reports):
+            request = build(packets)
+            size = request_size(request)
+        cost = (time.process_time() - start) * 1000 / args.reports
+        print(f"{name:<20} 每条CPU耗时: {cost:.3f}ms  请求大小: {size / 1024:.1f}KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+本地向量记忆索引容量与耗时测试
+
+向索引写入多个设备的记忆，统计查询耗时、进程常驻内存和索引文件大小，
+再删除一部分记忆触发压缩，检查压缩后查询结果不变。
+
+用法（在xiaozhi-server目录下执行）:
+    python test/benchmark/vector_memory.py --devices 5000 --facts 50
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import resource
+import tempfile
+import numpy as np
+
+sys.path.insert(
+    0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+)
+
+from core.providers.memory.vector_index import VectorIndex
+from core.utils.embedding import HashingEmbedder
+
+FACTS = ["用户的名字叫{}", "用户喜欢{}", "用户养了一只{}", "用户住在{}", "用户下周要去{}"]
+WORDS = ["恐龙", "小明", "北京", "猫", "画画", "足球", "上海", "钢琴", "海边", "火车"]
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地向量记忆索引容量与耗时测试")
+    parser.add_argument("--devices", type=int, default=5000, help="设备数")
+    parser.add_argument("--facts", type=int, default=50, help="每个设备的记忆条数")
+    parser.add_argument("--queries", type=int, default=2000, help="查询次数")
+    parser.add_argument("--cache-devices", type=int, default=1000, help="缓存记忆列表的设备数")
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder(512)
+    texts = [f.format(w) for f in FACTS for w in WORDS]
+    vectors = np.stack([embedder.encode(t) for t in texts])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 关闭自动压缩，删除后手动压缩并计时
+        index = VectorIndex(tmp, 512, cache_devices=args.cache_devices, compact_ratio=2.0)
+        start = time.perf_counter()
+        for d in range(args.devices):
+            picks = np.random.randint(0, len(texts), args.facts)
+            index.add(f"device-{d}", [texts[i] for i in picks], vectors[picks])
+        print(
+            f"写入 {args.devices} 个设备 x {args.facts} 条记忆，耗时: "
+            f"{time.perf_counter() - start:.1f}秒，向量文件: "
+            f"{os.path.getsize(index.vectors_path) / 1024 / 1024:.0f}MB，常驻内存峰值: {rss_mb():.0f}MB"
+        )
+
+        query = embedder.encode("我喜欢什么")
+        costs = []
+        for _ in range(args.queries):
+            role_id = f"device-{random.randrange(args.devices)}"
+            t = time.perf_counter()
+            index.search(role_id, query, 5, 0.3)
+            costs.append((time.perf_counter() - t) * 1000)
+        costs.sort()
+        print(
+            f"查询 平均: {sum(costs) / len(costs):.3f}ms  "
+            f"p99: {costs[int(len(costs) * 0.99) - 1]:.3f}ms  常驻内存峰值: {rss_mb():.0f}MB"
+        )
+
+        role_id = "device-0"
+        before = index.search(role_id, query, 5, 0.3)
+        for d in range(1, args.devices, 2):
+            facts = index.facts(f"device-{d}")
+            index.delete(f"device-{d}", facts.ids)
+        start = time.perf_counter()
+        index.compact()
+        after = index.search(role_id, query, 5, 0.3)
+        print(
+            f"删除一半设备后压缩耗时: {time.perf_counter() - start:.1f}秒，向量文件: "
+            f"{os.path.getsize(index.vectors_path) / 1024 / 1024:.0f}MB，"
+            f"压缩前后查询结果一致: {[r[1] for r in before] == [r[1] for r in after]}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+对话轮次追踪统计
+
+读取 tracing.path 中的OTLP JSON行，输出：
+- 各阶段耗时的p50/p95/p99，以及该阶段在关键路径上的占比
+- 最慢的几轮对话及其关键路径
+- 指定追踪的全部span
+
+关键路径默认统计到设备收到第一帧音频为止（用户感受到的等待时间），
+--full 统计到播放结束（包含按实时速度发送音频的时间）。
+
+用法（在xiaozhi-server目录下执行）:
+    python trace_summary.py
+    python trace_summary.py tmp/traces.jsonl --device AA:BB:CC:DD:EE:FF --slowest 5
+    python trace_summary.py --trace 4bf92f3577b34da6a3ce929d0e0e4736
+"""
+
+import os
+import json
+import math
+import argparse
+from collections import defaultdict
+
+GAP = "(等待)"
+
+
+class SpanRecord:
+    __slots__ = ("span_id", "parent_id", "name", "start", "end", "attributes", "events", "error")
+
+    def __init__(self, span):
+        self.span_id = span["spanId"]
+        self.parent_id = span.get("parentSpanId")
+        self.name = span["name"]
+        # 统一换算为毫秒
+        self.start = int(span["startTimeUnixNano"]) / 1e6
+        self.end = int(span["endTimeUnixNano"]) / 1e6
+        self.attributes = {a["key"]: _value(a["value"]) for a in span.get("attributes", [])}
+        self.events = {e["name"]: int(e["timeUnixNano"]) / 1e6 for e in span.get("events", [])}
+        status = span.get("status") or {}
+        self.error = status.get("message") if status.get("code") == 2 else None
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+def _value(value):
+    if "intValue" in value:
+        return int(value["intValue"])
+    for key in ("stringValue", "doubleValue", "boolValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+class TurnTrace:
+    def __init__(self, trace_id, spans):
+        self.trace_id = trace_id
+        self.root = next(s for s in spans if s.parent_id is None)
+        self.children = sorted(
+            (s for s in spans if s is not self.root), key=lambda s: s.start
+        )
+
+    @property
+    def device(self):
+        return self.root.attributes.get("device.id")
+
+    @property
+    def first_audio(self):
+        """从本轮开始到设备收到第一帧音频的耗时，没有发出音频时为None"""
+        at = self.root.events.get("first_audio_frame")
+        return at - self.root.start if at is not None else None
+
+    def stage_durations(self):
+        durations = [(s.name, s.duration) for s in self.children]
+        for s in self.children:
+            if s.name == "llm" and "first_token" in s.events:
+                durations.append(("llm_first_token", s.events["first_token"] - s.start))
+        if self.first_audio is not None:
+            durations.append(("first_audio_frame", self.first_audio))
+        durations.append(("turn", self.root.duration))
+        return durations
+
+    def critical_path(self, full=False):
+        """
+        从结束时间往前找：每一步选结束得最晚的span（截断到当前时间），再跳到它的开始时间，
+        span之间没有被任何span覆盖的时间记为等待
+        """
+        end = self.root.end
+        if not full and self.first_audio is not None:
+            end = self.root.events["first_audio_frame"]
+        path = []
+        t = end
+        while t > self.root.start:
+            candidates = [s for s in self.children if s.start < t]
+            if not candidates:
+                break
+            best = max(candidates, key=lambda s: min(s.end, t))
+            segment_end = min(best.end, t)
+            if segment_end < t:
+                path.append((GAP, t - segment_end))
+            start = max(best.start, self.root.start)
+            path.append((best.name, segment_end - start))
+            t = start
+        if t > self.root.start:
+            path.append((GAP, t - self.root.start))
+        path.reverse()
+        return path, end - self.root.start
+
+
+def load_traces(paths, device=None):
+    traces = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                by_trace = defaultdict(list)
+                for resource in request.get("resourceSpans", []):
+                    for scope in resource.get("scopeSpans", []):
+                        for span in scope.get("spans", []):
+                            by_trace[span["traceId"]].append(SpanRecord(span))
+                for trace_id, spans in by_trace.items():
+                    try:
+                        trace = TurnTrace(trace_id, spans)
+                    except StopIteration:
+                        continue
+                    if device is None or trace.device == device:
+                        traces.append(trace)
+    return traces
+
+
+def percentile(values, p):
+    """最近秩法"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def format_path(path):
+    return " → ".join(f"{name} {ms:.0f}" for name, ms in path if ms >= 1)
+
+
+def print_table(headers, rows):
+    widths = [
+        max(len(str(h)), *(len(str(r[i])) for r in rows)) if rows else len(str(h))
+        for i, h in enumerate(headers)
+    ]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(row, widths)))
+
+
+def summarize(traces, full):
+    stages = defaultdict(list)
+    on_path = defaultdict(float)
+    path_total = 0.0
+    for trace in traces:
+        for name, ms in trace.stage_durations():
+            stages[name].append(ms)
+        path, total = trace.critical_path(full)
+        path_total += total
+        for name, ms in path:
+            on_path[name] += ms
+
+    unfinished = sum(1 for t in traces if t.root.attributes.get("turn.unfinished"))
+    print(f"共 {len(traces)} 轮对话，其中 {unfinished} 轮没有正常结束")
+    print()
+    rows = []
+    for name, values in sorted(stages.items(), key=lambda item: -percentile(item[1], 50)):
+        share = on_path.get(name, 0.0) / path_total * 100 if path_total else 0.0
+        rows.append(
+            [
+                name,
+                len(values),
+                f"{percentile(values, 50):.0f}",
+                f"{percentile(values, 95):.0f}",
+                f"{percentile(values, 99):.0f}",
+                f"{max(values):.0f}",
+                f"{share:.1f}%" if name in on_path else "-",
+            ]
+        )
+    if GAP in on_path and path_total:
+        rows.append([GAP, "-", "-", "-", "-", "-", f"{on_path[GAP] / path_total * 100:.1f}%"])
+    print_table(["阶段", "次数", "p50(ms)", "p95(ms)", "p99(ms)", "最大(ms)", "关键路径占比"], rows)
+
+
+def print_slowest(traces, count, full):
+    print()
+    print(f"最慢的 {count} 轮（关键路径，毫秒）:")
+    key = (lambda t: t.root.duration) if full else (lambda t: t.first_audio or t.root.duration)
+    for trace in sorted(traces, key=key, reverse=True)[:count]:
+        path, total = trace.critical_path(full)
+        print(f"  {trace.trace_id} 设备={trace.device} 耗时={total:.0f}ms")
+        print(f"    {format_path(path)}")
+
+
+def print_trace(trace):
+    root = trace.root
+    print(f"追踪 {trace.trace_id} 设备={trace.device} 会话={root.attributes.get('session.id')}")
+    first_audio = trace.first_audio
+    if first_audio is not None:
+        print(f"第一帧音频: {first_audio:.0f}ms")
+    print(f"{'开始(ms)':>9} {'耗时(ms)':>9}  span")
+    for span in [root] + trace.children:
+        attributes = ", ".join(
+            f"{k}={v}" for k, v in span.attributes.items() if k not in ("device.id", "session.id")
+        )
+        error = f" 错误: {span.error}" if span.error else ""
+        print(
+            f"{span.start - root.start:>9.0f} {span.duration:>9.0f}  {span.name} {attributes}{error}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对话轮次追踪统计")
+    parser.add_argument("paths", nargs="*", default=["tmp/traces.jsonl"], help="追踪文件")
+    parser.add_argument("--device", help="只统计该设备（device-id）")
+    parser.add_argument("--slowest", type=int, default=10, help="列出最慢的轮数")
+    parser.add_argument("--trace", help="输出指定追踪的全部span")
+    parser.add_argument("--full", action="store_true", help="关键路径统计到播放结束")
+    args = parser.parse_args()
+
+    traces = load_traces(args.paths, args.device)
+    if args.trace:
+        matched = [t for t in traces if t.trace_id == args.trace]
+        if not matched:
+            print(f"没有找到追踪 {args.trace}")
+            return
+        print_trace(matched[0])
+        path, total = matched[0].critical_path(args.full)
+        print(f"关键路径 {total:.0f}ms: {format_path(path)}")
+        return
+    if not traces:
+        print("没有追踪记录，请确认config.yaml中tracing.enabled已开启")
+        return
+    summarize(traces, args.full)
+    if args.slowest > 0:
+        print_slowest(traces, args.slowest, args.full)
+
+
+if __name__ == "__main__":
+    main()